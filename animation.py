@@ -1,5 +1,7 @@
 
 import bpy
+import numpy as np
+
 import config_para as cfg
 
 def add_shape_key(obj, name):
@@ -49,4 +51,124 @@ def animate_color_material_fade(mix_node, fade_start=240, fade_end=280):
     fac.default_value = 1.0
     fac.keyframe_insert("default_value", frame=fade_end)
 
-    print(f"[Animation] Material fade added from {fade_start} to {fade_end}")
\ No newline at end of file
+    print(f"[Animation] Material fade added from {fade_start} to {fade_end}")
+
+# bulk F-curve construction: one action and F-curve per property, every
+# keyframe written with keyframe_points.add + foreach_set instead of a
+# keyframe_insert (RNA path lookup + depsgraph tag) per point
+
+def _enum_value(prop, name):
+    return bpy.types.Keyframe.bl_rna.properties[prop].enum_items[name].value
+
+def _new_fcurve(action, id_data, data_path, index=0):
+    """F-curve for data_path on a fresh action (legacy or slotted action API)"""
+    if hasattr(action, "fcurve_ensure_for_datablock"):
+        return action.fcurve_ensure_for_datablock(id_data, data_path, index=index)
+    return action.fcurves.new(data_path, index=index)
+
+def action_fcurves(id_data):
+    """F-curves of the action animating id_data (legacy or slotted action API)"""
+    anim = id_data.animation_data
+    if anim is None or anim.action is None:
+        return []
+    action = anim.action
+    slot = getattr(anim, "action_slot", None)
+    if slot is None or not hasattr(action, "layers"):
+        return list(action.fcurves)
+    for layer in action.layers:
+        for strip in layer.strips:
+            channelbag = strip.channelbag(slot)
+            if channelbag is not None:
+                return list(channelbag.fcurves)
+    return []
+
+def ensure_action(id_data, name):
+    """Empty action assigned to id_data, replacing the previous one"""
+    anim = id_data.animation_data or id_data.animation_data_create()
+    old = anim.action
+    action = bpy.data.actions.new(name)
+    anim.action = action
+    if old is not None and old.users == 0:
+        bpy.data.actions.remove(old)
+    return action
+
+def set_fcurve_keys(fcurve, frames, values, interpolation="BEZIER", handle_type="AUTO_CLAMPED"):
+    """Replace fcurve's keyframes with (frames, values) in one pass"""
+    points = fcurve.keyframe_points
+    if len(points):
+        points.clear()
+    count = len(frames)
+    co = np.empty(count * 2, dtype=np.float32)
+    co[0::2] = frames
+    co[1::2] = values
+    points.add(count)
+    points.foreach_set("co", co)
+    points.foreach_set("interpolation", np.full(count, _enum_value("interpolation", interpolation), dtype=np.int32))
+    handle = np.full(count, _enum_value("handle_left_type", handle_type), dtype=np.int32)
+    points.foreach_set("handle_left_type", handle)
+    points.foreach_set("handle_right_type", handle)
+    fcurve.update()  # sorts points and recalculates the auto handles
+    return fcurve
+
+def stage_keyframes(start_frame, stage_length, fade):
+    """(frames, values) of one stage key as animate_shape_keys inserts them"""
+    keys = {}
+    keys[start_frame] = 0.0
+    keys[start_frame + fade] = 1.0         # a later insert on the same frame wins
+    keys[start_frame + stage_length] = 1.0
+    frames = sorted(keys)
+    return frames, [keys[frame] for frame in frames]
+
+def animate_shape_keys_bulk(obj, shape_key_list, start_frame=1, stage_length=40, fade=10, share_with=()):
+    """animate_shape_keys built directly as F-curves; share_with gets the same action"""
+    shape_keys = obj.data.shape_keys
+    action = ensure_action(shape_keys, f"{shape_keys.name}Action")
+
+    current_frame = start_frame
+    for key_name in shape_key_list:
+        frames, values = stage_keyframes(current_frame, stage_length, fade)
+        fcurve = _new_fcurve(action, shape_keys, f'key_blocks["{key_name}"].value')
+        set_fcurve_keys(fcurve, frames, values)
+        shape_keys.key_blocks[key_name].value = values[-1]
+        current_frame += stage_length
+
+    share_action(action, [other.data.shape_keys for other in share_with])
+    return action
+
+def share_action(action, id_datas):
+    """Assign one action to several datablocks (e.g. tiles with their own shape keys).
+
+    Linked duplicates already share the mesh and its shape keys, so they pick
+    the action up without this.
+    """
+    shared = 0
+    for id_data in id_datas:
+        if id_data is None:
+            continue
+        anim = id_data.animation_data or id_data.animation_data_create()
+        if anim.action is action:
+            continue
+        anim.action = action
+        if hasattr(anim, "action_slot") and len(action.slots):
+            anim.action_slot = action.slots[0]
+        shared += 1
+    if shared:
+        print(f"[Animation] Action {action.name} shared with {shared} more datablock(s)")
+    return shared
+
+def animate_color_material_fade_bulk(mix_node, fade_start=240, fade_end=280):
+    """animate_color_material_fade built directly as one F-curve on the node tree"""
+    tree = mix_node.id_data
+    fac = mix_node.inputs["Fac"]
+    index = list(mix_node.inputs).index(fac)
+    anim = tree.animation_data
+    action = anim.action if anim is not None and anim.action is not None else ensure_action(tree, f"{tree.name}Action")
+
+    data_path = f'nodes["{mix_node.name}"].inputs[{index}].default_value'
+    fcurve = next((fc for fc in getattr(action, "fcurves", ()) if fc.data_path == data_path), None)
+    if fcurve is None:
+        fcurve = _new_fcurve(action, tree, data_path)
+    set_fcurve_keys(fcurve, [fade_start, fade_end], [0.0, 1.0])
+    fac.default_value = 1.0
+
+    print(f"[Animation] Material fade added from {fade_start} to {fade_end}")
@@ -0,0 +1,115 @@
+"""Compare per-keyframe keyframe_insert animation with the bulk F-curve builder.
+
+    blender -b --factory-startup --python animation_benchmark.py -- --tiles 16 --keys 12
+
+Animates --keys stage keys on --tiles objects, each with its own shape-key
+datablock (the worst case; linked duplicates share one), three ways: the
+keyframe_insert path per tile, the bulk builder per tile, and the bulk
+builder once with the action shared across tiles. Reports the best time of
+each and the largest difference of the key value curves.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+import bpy
+import numpy as np
+
+import animation
+import config_para as cfg
+import create
+
+BENCHMARK_COLLECTION = "AnimationBenchmark"
+
+
+def _tiles(collection, tile_count, key_count, resolution):
+    names = [f"Stage{k}" for k in range(key_count)]
+    tiles = []
+    for t in range(tile_count):
+        obj = bpy.data.objects.new(f"AnimTile{t}", create.create_grid_mesh(f"AnimTile{t}Mesh", 1.0, resolution))
+        create.link_object_to_collection(collection, obj)
+        obj.shape_key_add(name=cfg.BASIS, from_mix=False)
+        for name in names:
+            obj.shape_key_add(name=name, from_mix=False)
+        tiles.append(obj)
+    return tiles, names
+
+def _clear(collection):
+    create.purge_collection_objects(collection)
+    for action in [a for a in bpy.data.actions if a.users == 0]:
+        bpy.data.actions.remove(action)
+
+def _curves(obj, names, frames):
+    fcurves = {fc.data_path: fc for fc in animation.action_fcurves(obj.data.shape_keys)}
+    return np.array([[fcurves[f'key_blocks["{name}"].value'].evaluate(f) for f in frames] for name in names])
+
+def run_benchmark(tile_count=16, key_count=12, resolution=8, repeat=3, stage_length=30, fade=20):
+    collection = create.ensure_collection(BENCHMARK_COLLECTION)
+    frames = np.arange(1, key_count * stage_length + fade + 1, 0.5)
+    timings = {"keyframe_insert": [], "bulk": [], "bulk_shared": []}
+    curves = {}
+
+    for _ in range(repeat):
+        _clear(collection)
+        tiles, names = _tiles(collection, tile_count, key_count, resolution)
+        start = time.perf_counter()
+        for obj in tiles:
+            animation.animate_shape_keys(obj, names, 1, stage_length, fade)
+        timings["keyframe_insert"].append(time.perf_counter() - start)
+        curves["keyframe_insert"] = _curves(tiles[-1], names, frames)
+
+        _clear(collection)
+        tiles, names = _tiles(collection, tile_count, key_count, resolution)
+        start = time.perf_counter()
+        for obj in tiles:
+            animation.animate_shape_keys_bulk(obj, names, 1, stage_length, fade)
+        timings["bulk"].append(time.perf_counter() - start)
+        curves["bulk"] = _curves(tiles[-1], names, frames)
+
+        _clear(collection)
+        tiles, names = _tiles(collection, tile_count, key_count, resolution)
+        start = time.perf_counter()
+        animation.animate_shape_keys_bulk(tiles[0], names, 1, stage_length, fade, share_with=tiles[1:])
+        timings["bulk_shared"].append(time.perf_counter() - start)
+        curves["bulk_shared"] = _curves(tiles[-1], names, frames)
+
+    _clear(collection)
+    bpy.data.collections.remove(collection)
+
+    reference = curves["keyframe_insert"]
+    report = {
+        "tiles": tile_count,
+        "keys": key_count,
+        "keyframes": tile_count * key_count * 3,
+        "best_seconds": {name: min(values) for name, values in timings.items()},
+        "max_abs_difference": {name: float(np.abs(curves[name] - reference).max()) for name in ("bulk", "bulk_shared")},
+    }
+    best = report["best_seconds"]
+    print(f"[Animation Benchmark] {report['keyframes']} keyframes on {tile_count} tiles, best of {repeat}")
+    for name, seconds in best.items():
+        print(f"  {name:<16} {seconds * 1000:8.1f} ms  ({best['keyframe_insert'] / max(seconds, 1e-9):.1f}x)")
+    for name, difference in report["max_abs_difference"].items():
+        print(f"  max |keyframe_insert - {name}| {difference:.2e}")
+    return report
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="keyframe_insert vs bulk F-curve benchmark")
+    parser.add_argument("--tiles", type=int, default=16)
+    parser.add_argument("--keys", type=int, default=12)
+    parser.add_argument("--resolution", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.tiles, args.keys, args.resolution, args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
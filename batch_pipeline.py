@@ -0,0 +1,261 @@
+"""Pipelined batch generation: compute, Blender load and output I/O overlap.
+
+    blender -b --factory-startup --python batch_pipeline.py -- jobs.json --output-dir terrain_batch
+    python batch_pipeline.py jobs.json --numpy-only     # no Blender: heightmaps only
+
+jobs.json holds a list of {"id": ..., "params": {config overrides}, "seed": ...}.
+Three phases run at once on different jobs:
+
+    compute  job N+1   process pool: terrain_core.stage_deltas under the job's overrides
+    load     job N     main thread: main.main(deltas=...) writes the keys, builds the
+                       scene and saves an uncompressed .blend snapshot
+    output   job N-1   I/O thread: gzip the snapshot into the final .blend, write
+                       the compressed heightmap and the job result
+
+Compute runs in processes, not threads: config overrides are module globals
+and the jitter loop holds the GIL. A job's estimated buffer bytes are taken
+from a memory gate before its compute is submitted and given back once its
+outputs are written, so finished-but-unwritten jobs throttle new compute.
+With the phases overlapped, throughput approaches the slowest phase.
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import queue
+import shutil
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+import numpy as np
+
+import config_para as cfg
+import memory_budget
+import terrain_core
+from terrain_worker import config_overrides
+
+PHASES = ("compute", "load", "output")
+
+
+def compute_job(job):
+    """Pool process: stage deltas of one job (no bpy)"""
+    start = time.perf_counter()
+    with config_overrides(job.get("params", {})):
+        deltas = terrain_core.stage_deltas(seed=job.get("seed"))
+    return deltas, time.perf_counter() - start
+
+def job_bytes(job):
+    """Estimated NumPy bytes one job holds from compute until its outputs are written"""
+    resolution = job.get("params", {}).get("TERRAIN_RESOLUTION", cfg.TERRAIN_RESOLUTION)
+    return memory_budget.estimate_run_bytes(resolution)
+
+
+class MemoryGate:
+    """Byte-counting semaphore; one job larger than the capacity still runs alone"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.used = 0
+        self.peak = 0
+        self.waits = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes):
+        with self._condition:
+            if self.used and self.used + nbytes > self.capacity:
+                self.waits += 1
+            while self.used and self.used + nbytes > self.capacity:
+                self._condition.wait()
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+
+    def release(self, nbytes):
+        with self._condition:
+            self.used -= nbytes
+            self._condition.notify_all()
+
+
+class BatchPipeline:
+    """Runs a list of jobs through the compute / load / output phases"""
+
+    def __init__(self, jobs, output_dir=cfg.BATCH_OUTPUT_DIR, compute_workers=cfg.BATCH_COMPUTE_WORKERS,
+                 memory_bytes=cfg.BATCH_MEMORY_BYTES, io_queue=cfg.BATCH_IO_QUEUE, numpy_only=False):
+        self.jobs = jobs
+        self.output_dir = os.path.abspath(output_dir)
+        self.compute_workers = compute_workers
+        self.gate = MemoryGate(memory_bytes)
+        self.numpy_only = numpy_only
+        self.computed = queue.Queue(maxsize=compute_workers + 1)  # futures in job order
+        self.outputs = queue.Queue(maxsize=io_queue)
+        self.results = {}
+        self.errors = []
+
+    # phases
+
+    def _feed(self, executor):
+        """Submit compute jobs in order, each once the memory gate admits it"""
+        try:
+            for job in self.jobs:
+                nbytes = 0
+                try:
+                    estimate = job_bytes(job)
+                    self.gate.acquire(estimate)
+                    nbytes = estimate
+                    future = executor.submit(compute_job, job)
+                except Exception as error:
+                    # Fails like its compute would; the main loop gives nbytes back
+                    future = Future()
+                    future.set_exception(error)
+                self.computed.put((job, nbytes, future))
+        finally:
+            self.computed.put(None)
+
+    def _load(self, job, deltas):
+        """Main thread: Blender scene from the deltas plus an uncompressed snapshot"""
+        if self.numpy_only:
+            return {"heights": terrain_core.accumulate(deltas)}
+
+        import bpy
+        import key_stack
+        import main as terrain_main
+
+        with config_overrides(job.get("params", {})):
+            terrain_main.main(progressive=False, deltas=deltas)
+            terrain = bpy.data.objects[cfg.TERRAIN_OBJECT_NAME]
+            heights = key_stack.get_stack(terrain).height_after()
+            side = terrain_core.grid_side(len(heights))
+            snapshot = os.path.join(self.output_dir, f"{job['id']}.blend.tmp")
+            bpy.ops.wm.save_as_mainfile(filepath=snapshot, copy=True, compress=False)
+        return {"heights": heights.reshape(side, side).copy(), "snapshot": snapshot}
+
+    def _write(self, job, loaded):
+        """I/O thread: compress and write one job's outputs"""
+        outputs = {}
+        heightmap_path = os.path.join(self.output_dir, f"{job['id']}_heightmap.npz")
+        np.savez_compressed(heightmap_path, heights=loaded["heights"])
+        outputs["heightmap"] = heightmap_path
+        snapshot = loaded.get("snapshot")
+        if snapshot:
+            # Blender reads gzip-compressed .blend files directly
+            blend_path = snapshot[:-len(".tmp")]
+            with open(snapshot, "rb") as source, \
+                    gzip.open(blend_path, "wb", compresslevel=cfg.BATCH_COMPRESS_LEVEL) as target:
+                shutil.copyfileobj(source, target, 1 << 20)
+            os.remove(snapshot)
+            outputs["blend"] = blend_path
+        return outputs
+
+    def _output_loop(self):
+        while True:
+            item = self.outputs.get()
+            if item is None:
+                return
+            job, nbytes, loaded = item
+            result = self.results[job["id"]]
+            start = time.perf_counter()
+            try:
+                result["outputs"] = self._write(job, loaded)
+            except Exception as error:
+                result["ok"] = False
+                result["error"] = f"{type(error).__name__}: {error}"
+            finally:
+                result["timings"]["output"] = time.perf_counter() - start
+                self.gate.release(nbytes)
+
+    # driver
+
+    def run(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        # spawn: pool processes must not inherit Blender's state
+        context = multiprocessing.get_context("spawn")
+        start = time.perf_counter()
+        writer = threading.Thread(target=self._output_loop, name="batch-output", daemon=True)
+        writer.start()
+        try:
+            with ProcessPoolExecutor(self.compute_workers, mp_context=context) as executor:
+                feeder = threading.Thread(target=self._feed, args=(executor,), name="batch-feed", daemon=True)
+                feeder.start()
+                while True:
+                    item = self.computed.get()
+                    if item is None:
+                        break
+                    job, nbytes, future = item
+                    result = self.results[job["id"]] = {"id": job["id"], "ok": True, "timings": {}}
+                    waited = time.perf_counter()
+                    try:
+                        deltas, result["timings"]["compute"] = future.result()
+                        result["timings"]["load_wait"] = time.perf_counter() - waited
+                        load_start = time.perf_counter()
+                        loaded = self._load(job, deltas)
+                        result["timings"]["load"] = time.perf_counter() - load_start
+                    except Exception as error:
+                        result.update(ok=False, error=f"{type(error).__name__}: {error}")
+                        self.errors.append(job["id"])
+                        self.gate.release(nbytes)
+                        continue
+                    del deltas
+                    self.outputs.put((job, nbytes, loaded))  # blocks while the writer is behind
+                    print(f"[Batch] {job['id']} loaded ({result['timings']['load']:.2f}s), "
+                          f"{self.gate.used / 2**20:.0f} MiB in flight")
+                feeder.join()
+        finally:
+            # The writer drains what was queued and exits even if the main loop failed
+            self.outputs.put(None)
+            writer.join()
+        return self.report(time.perf_counter() - start)
+
+    def report(self, wall_seconds):
+        totals = {phase: sum(r["timings"].get(phase, 0.0) for r in self.results.values()) for phase in PHASES}
+        serial = sum(totals.values())
+        summary = {
+            "jobs": len(self.jobs),
+            "failed": [job_id for job_id, r in self.results.items() if not r["ok"]],
+            "wall_seconds": wall_seconds,
+            "phase_seconds": totals,
+            "serial_seconds": serial,
+            # compute runs compute_workers wide, the other phases one at a time
+            "bound_seconds": max(totals["compute"] / self.compute_workers, totals["load"], totals["output"]),
+            "memory_peak_bytes": self.gate.peak,
+            "memory_waits": self.gate.waits,
+            "results": self.results,
+        }
+        print(f"[Batch] {len(self.jobs)} jobs in {wall_seconds:.2f}s "
+              f"(serial phases {serial:.2f}s, slowest-phase bound {summary['bound_seconds']:.2f}s)")
+        print("[Batch] " + "  ".join(f"{phase} {seconds:.2f}s" for phase, seconds in totals.items())
+              + f"  peak in flight {self.gate.peak / 2**20:.0f} MiB, {self.gate.waits} memory waits")
+        with open(os.path.join(self.output_dir, "batch_report.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def run_cli(argv):
+    parser = argparse.ArgumentParser(description="Pipelined terrain batch generation")
+    parser.add_argument("jobs", help="JSON list of {id, params, seed}")
+    parser.add_argument("--output-dir", default=cfg.BATCH_OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=cfg.BATCH_COMPUTE_WORKERS, help="compute processes")
+    parser.add_argument("--memory", type=float, default=cfg.BATCH_MEMORY_BYTES / 2**20, help="MiB in flight")
+    parser.add_argument("--numpy-only", action="store_true", help="no Blender load phase")
+    args = parser.parse_args(argv)
+
+    with open(args.jobs) as f:
+        jobs = json.load(f)
+    for index, job in enumerate(jobs):
+        job.setdefault("id", f"job{index:04d}")
+    pipeline = BatchPipeline(jobs, args.output_dir, args.workers, int(args.memory * 2**20),
+                             numpy_only=args.numpy_only)
+    summary = pipeline.run()
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    # Run through the importable module so pool processes can unpickle compute_job
+    import batch_pipeline
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    sys.exit(batch_pipeline.run_cli(argv))
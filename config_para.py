@@ -28,6 +28,8 @@ RANDOMNESS_FACTOR = 0.4 # default 0.4
 # Configuration parameters
 POWER_EXPONENT = 1.7
 COLOR_INTERPOLATION = 'B_SPLINE'
+WIREFRAME_MODE = "modifier"   # "modifier" (WIREFRAME geometry), "shader" (grid lines in the material) or None
+WIREFRAME_THICKNESS = 0.02    # line width in world units
 
 #animation
 #key names
@@ -50,4 +52,136 @@ SHAPE_KEY_ORDER = [
     APPLY_JITTER,   
     SMOOTH_TERRAIN,
     MODIFY_TERRAIN,
-]
\ No newline at end of file
+]
+
+# animation
+ANIMATION_BULK = True         # build F-curves directly (foreach_set) instead of keyframe_insert per key
+
+# playback cache
+ANIMATION_CACHE = False       # drive playback from a precomputed point cache
+CACHE_DIR = "//terrain_cache" # relative to the .blend file
+CACHE_DTYPE = "float16"       # "float16" or "float32"
+CACHE_FRAME_STEP = 1          # store every Nth frame, interpolate in between
+CACHE_MAX_BYTES = 2 * 1024**3 # evict least recently used caches above this
+CACHE_FORMAT = "frames"       # "frames" (blended frames) or "sparse" (sparse stage deltas + key weights)
+
+# sparse stage deltas (sparse cache and glTF export)
+SPARSE_EPSILON = 1e-3         # |dz| at or below this is dropped
+SPARSE_QUANT_STEP = 1e-3      # dz is stored as integer multiples of this
+GLTF_EXPORT_PATH = None       # e.g. "//terrain.glb": export the staged animation as morph targets
+GLTF_FRAME_STEP = 1           # sample the key weights every Nth frame
+
+# memory
+MEMORY_BUDGET_MODE = False            # enforce the budget and trace peak memory
+MEMORY_BUDGET_BYTES = 24 * 1024**3    # NumPy-side buffers, leaves room for Blender's own mesh data
+
+# job server
+JOB_SERVER_HOST = "127.0.0.1"
+JOB_SERVER_PORT = 8765
+JOB_WORKERS = 2
+JOB_OUTPUT_DIR = "terrain_jobs"
+BLENDER_EXECUTABLE = "blender"
+
+# batch pipeline (batch_pipeline.py)
+BATCH_OUTPUT_DIR = "terrain_batch"
+BATCH_COMPUTE_WORKERS = 2     # processes computing stage deltas ahead of the Blender load
+BATCH_MEMORY_BYTES = 4 * 1024**3 # estimated job buffers in flight before compute waits
+BATCH_IO_QUEUE = 2            # loaded jobs waiting for the output thread before load waits
+BATCH_COMPRESS_LEVEL = 6      # gzip level of the written .blend files
+
+# stage statistics trace
+STAGE_TRACE = False           # per-key height/delta/slope statistics after the run (off = no cost)
+STAGE_TRACE_PATH = "//terrain_trace" # writes <path>.json and <path>.npz
+STAGE_TRACE_BINS = 64
+STAGE_TRACE_SAMPLE = 16384    # vertices sampled for histograms/percentiles on larger grids
+STAGE_TRACE_BLOCK_ROWS = 256  # rows per streamed block
+
+# landing pad
+PLACE_LANDING_PAD = False
+LANDING_PAD_SIZE = 8.0        # pad width in world units
+LANDING_PAD_MARGIN = 4        # vertices over which the flattening blends out
+LANDING_PAD_THICKNESS = 0.3
+FLATTEN_LANDING_PAD = "FlattenLandingPad"
+
+# scattering
+SCATTER_ENABLED = False
+SCATTER_TILE_SIZE = 20.0      # world units per sampler tile
+SCATTER_LAYERS = {
+    # radius: min spacing; height/slope: normalized 0-1 bands where density is 1
+    "Rocks": {"radius": 0.8, "height": (0.4, 1.0), "slope": (0.15, 1.0),
+              "scale": (0.3, 1.0), "seed": 11, "collection": "RockAssets"},
+    "Vegetation": {"radius": 0.5, "height": (0.0, 0.45), "slope": (0.0, 0.3),
+                   "scale": (0.6, 1.3), "seed": 23, "collection": "VegetationAssets"},
+}
+
+# masks (normalized height / slope bands, smoothstep low -> high)
+MASK_PEAK_HEIGHT = (0.55, 0.8)
+MASK_PEAK_FLOOR = 0.3         # displace weight outside the peaks
+MASK_SNOW_HEIGHT = (0.75, 0.9)
+MASK_SNOW_MAX_SLOPE = (0.35, 0.6)   # snow fades out between these slopes
+MASK_ROCK_SLOPE = (0.2, 0.45)
+MASK_LOWLAND_HEIGHT = (0.15, 0.35)  # lowland fades out between these heights
+MASK_LOWLAND_SLOPE = (0.08, 0.25)
+MASK_WEIGHT_LEVELS = 64       # vertex group weights are quantized to this many levels
+MASK_SHADING = True           # tint the height gradient with rock/snow masks
+
+# baked detail maps
+BAKE_MAPS = False
+BAKE_RESOLUTION = 0           # bake texel grid, 0 = mesh resolution; finer grids rerun the stages for detail
+BAKE_AO_DISTANCE = 64         # horizon search distance in texels
+
+# rivers
+RIVERS_ENABLED = False
+RIVER_CARVE = "RiverCarve"
+RIVER_ROUTING = "dinf"        # "d8" or "dinf"
+RIVER_DEPTH = 1.5             # channel depth at the largest accumulated flow
+RIVER_MIN_FLOW = 60           # upstream cells before a channel starts
+RIVER_FLOW_EXPONENT = 0.5     # depth ~ flow^exponent
+RIVER_EPSILON = 1e-5          # slope added across filled flats so they drain
+
+# DEM base stage
+DEM_PATH = None               # .npy, ASCII grid (.asc) or raw 16-bit (.raw/.r16/.hgt); None = analytic stages
+DEM_STAGE = "StageDEMBase"
+DEM_FORMAT = None             # "npy", "ascii" or "raw"; None = from the file extension
+DEM_RAW_SHAPE = None          # (rows, cols) of raw files; None = square from the file size
+DEM_RAW_DTYPE = None          # e.g. "<u2"; None = ">i2" for .hgt, "<u2" otherwise
+DEM_NODATA = None             # void value; None = from the file header / SRTM default
+DEM_HEIGHT_RANGE = 20.0       # fit elevations to 0..range; None = keep units times DEM_Z_SCALE
+DEM_Z_SCALE = 1.0
+DEM_CROP_SQUARE = True        # use the centered square of non-square DEMs instead of stretching
+DEM_BLOCK_ROWS = 256          # source rows resampled per streamed block
+
+# render scheduler
+RENDER_OUTPUT_DIR = "terrain_render"
+RENDER_CHUNK_SIZE = 20        # frames per background Blender process
+RENDER_THREADS_PER_JOB = 4    # render threads of each process
+RENDER_JOB_MEMORY = 3 * 1024**3 # bytes reserved per process when sizing the pool
+RENDER_MAX_WORKERS = None     # cap on concurrent processes; None = cores/memory only
+RENDER_RETRIES = 2            # re-runs of a chunk for frames it failed to write
+RENDER_DEDUPE_STATIC = True   # render static spans once and copy the image
+
+# deform backend
+DEFORM_BACKEND = "python"     # "python" (NumPy) or "geometry_nodes"
+GN_DEFORM_GROUP = "TerrainDeformGN"
+GN_JITTER_RANDOMNESS = 0.6    # local randomness of the spatial jitter field
+
+# loop kernels
+TERRAIN_BACKEND = "auto"      # "auto" (numba if installed), "numba" or "numpy"
+KERNEL_CACHE = True           # keep compiled numba kernels on disk between launches
+KERNEL_CACHE_DIR = None       # None = __pycache__ next to kernels.py
+KERNEL_WARMUP = True          # compile/load kernels before the first job (terrain_worker)
+
+# periodic tiling
+PERIODIC = False              # seamless tile: torus-domain waves/jitter, wrapping slope and smoothing stencils
+PERIODIC_RADIAL_DECAY = False # keep stage 4 in periodic mode, with torus distance to the tile center
+TILE_COLUMNS = 1              # linked duplicates laid out along x (periodic mode, 1 = no tiling)
+TILE_ROWS = 1                 # ... and along y
+
+# progressive preview
+PROGRESSIVE_PREVIEW = False   # main() shows coarse-to-fine previews before the full build
+PROGRESSIVE_DIVISOR = 8       # first level is TERRAIN_RESOLUTION / divisor
+PROGRESSIVE_OBJECT_NAME = "TerrainPreview"
+PROGRESSIVE_SEED = 0          # jitter seed, so every level shows the same terrain
+PROGRESSIVE_CHUNK = 16384     # jitter vertices per step
+PROGRESSIVE_TICK_SECONDS = 0.05 # work per timer tick before the UI gets control back
+PROGRESSIVE_FINALIZE = True   # run the full (blocking) pipeline once the last level is shown
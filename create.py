@@ -1,9 +1,13 @@
 import bpy
 import bmesh
+import numpy as np
 from mathutils import Vector
 
 import config_para as cfg
 import animation
+import datablocks
+import key_stack
+import terrain_core
 
 
 def ensure_collection(collection_name: str) -> bpy.types.Collection:
@@ -22,6 +26,7 @@ def ensure_collection(collection_name: str) -> bpy.types.Collection:
 
 def purge_collection_objects(collection: bpy.types.Collection):
     """Clear all objects in collection for script reusability"""
+    key_stack.release_stacks()
     for obj in list(collection.objects):
         collection.objects.unlink(obj)
         if not obj.users_collection:
@@ -30,6 +35,7 @@ def purge_collection_objects(collection: bpy.types.Collection):
         for mesh in list(datablock):
             if mesh.users == 0:
                 datablock.remove(mesh)
+    # Materials/textures stay in bpy.data so this run can reuse them by key
 
 def link_object_to_collection(collection: bpy.types.Collection, obj: bpy.types.Object):
     """Link object to specified collection"""
@@ -38,7 +44,7 @@ def link_object_to_collection(collection: bpy.types.Collection, obj: bpy.types.O
 
 def add_material_color(obj, color):
     """Add basic material color to object for visual distinction"""
-    material = bpy.data.materials.new(name=f"{obj.name}_Material")
+    material = datablocks.get_material(f"{obj.name}_Material")
     material.diffuse_color = (*color, 1.0)
     obj.data.materials.append(material)
     
@@ -46,9 +52,8 @@ def add_wireframe_modifier(obj, wireframe_thickness=0.02):
     """Add wireframe modifier with black material"""
     # Add second black material for wireframe
     if len(obj.data.materials) < 2:
-        wireframe_material = bpy.data.materials.new(name="WireframeMaterial_Black")
-        wireframe_material.use_nodes = True
-        bsdf_node = wireframe_material.node_tree.nodes["Principled BSDF"]
+        wireframe_material = datablocks.get_material("WireframeMaterial_Black", use_nodes=True)
+        bsdf_node = datablocks.get_principled_node(wireframe_material)
         bsdf_node.inputs["Base Color"].default_value = (0.0, 0.0, 0.0, 1.0)
         bsdf_node.inputs["Roughness"].default_value = 1.0
         obj.data.materials.append(wireframe_material)
@@ -90,4 +95,66 @@ def create_flat_terrain(size=cfg.TERRAIN_SIZE, resolution=cfg.TERRAIN_RESOLUTION
     bmesh_data.free()
     mesh.update()
     
-    return terrain_obj
\ No newline at end of file
+    return terrain_obj
+
+def create_grid_mesh(name, size=cfg.TERRAIN_SIZE, resolution=cfg.TERRAIN_RESOLUTION) -> bpy.types.Mesh:
+    """Same grid as create_flat_terrain, built with foreach_set instead of bmesh"""
+    side = resolution + 1
+    axis = terrain_core.grid_axis(size, resolution)
+    co = np.zeros((side, side, 3), dtype=np.float32)
+    co[..., 0] = axis[np.newaxis, :]
+    co[..., 1] = axis[:, np.newaxis]
+
+    index = np.arange(side * side).reshape(side, side)
+    quads = np.stack([index[:-1, :-1], index[:-1, 1:], index[1:, 1:], index[1:, :-1]], axis=-1).reshape(-1, 4)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(side * side)
+    mesh.vertices.foreach_set("co", co.ravel())
+    mesh.loops.add(quads.size)
+    mesh.loops.foreach_set("vertex_index", quads.ravel().astype(np.int32))
+    mesh.polygons.add(len(quads))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, quads.size, 4, dtype=np.int32))
+    if hasattr(mesh.polygons[0], "loop_total") and not mesh.polygons[0].is_property_readonly("loop_total"):
+        mesh.polygons.foreach_set("loop_total", np.full(len(quads), 4, dtype=np.int32))
+    mesh.update(calc_edges=True)
+    mesh.validate()
+    return mesh
+
+def tile_linked_duplicates(source_obj, columns, rows, period, collection=None):
+    """Lay out a columns x rows block of linked duplicates sharing source_obj's mesh.
+
+    The block is centered on the source, which keeps its own cell; tiles are
+    period apart so periodic terrain edges meet. Mesh, shape keys and their
+    animation are shared; object-level modifiers are copied per tile.
+    """
+    collection = collection or source_obj.users_collection[0]
+    origin = source_obj.location.copy()
+    tiles = []
+    for row in range(rows):
+        for column in range(columns):
+            dx, dy = column - (columns - 1) // 2, row - (rows - 1) // 2
+            if dx == 0 and dy == 0:
+                continue
+            tile = source_obj.copy()  # shares source_obj.data
+            tile.name = f"{source_obj.name}_Tile_{column}_{row}"
+            tile.location = origin + Vector((dx * period, dy * period, 0.0))
+            link_object_to_collection(collection, tile)
+            tiles.append(tile)
+    print(f"[Tiling] {columns}x{rows} tiles of {source_obj.name}, one mesh "
+          f"({source_obj.data.users} users), period {period:g}")
+    return tiles
+
+def create_landing_pad(center, width, thickness=cfg.LANDING_PAD_THICKNESS) -> bpy.types.Object:
+    """Generate a square slab named PLATFORM_NAME centered at center"""
+    mesh = bpy.data.meshes.new(f"{cfg.PLATFORM_NAME}Mesh")
+    pad_obj = bpy.data.objects.new(cfg.PLATFORM_NAME, mesh)
+    bmesh_data = bmesh.new()
+    bmesh.ops.create_cube(bmesh_data, size=1.0)
+    bmesh.ops.scale(bmesh_data, vec=(width, width, thickness), verts=bmesh_data.verts)
+    bmesh_data.to_mesh(mesh)
+    bmesh_data.free()
+    mesh.update()
+
+    pad_obj.location = center
+    return pad_obj
@@ -0,0 +1,95 @@
+import bpy
+
+# Datablocks handed out during the current run, keyed by (kind, name)
+_active_keys = set()
+_usage = {"reused": 0, "created": 0, "purged": 0}
+
+# Collections swept for orphans, in dependency order (users first)
+ORPHAN_COLLECTIONS = ["meshes", "materials", "textures", "images", "node_groups", "actions"]
+
+
+def _lookup(collection, kind, key):
+    """Return existing datablock by stable key and record reuse/creation"""
+    datablock = collection.get(key)
+    _active_keys.add((kind, key))
+    if datablock is None:
+        _usage["created"] += 1
+    else:
+        _usage["reused"] += 1
+    return datablock
+
+def get_material(key: str, use_nodes=False) -> bpy.types.Material:
+    """Get material by stable key, creating it only when missing"""
+    material = _lookup(bpy.data.materials, "materials", key)
+    if material is None:
+        material = bpy.data.materials.new(name=key)
+    elif material.node_tree is not None:
+        # Drop stale fade keyframes so the old action becomes an orphan
+        material.node_tree.animation_data_clear()
+    if use_nodes:
+        material.use_nodes = True
+    return material
+
+def get_texture(key: str, texture_type: str) -> bpy.types.Texture:
+    """Get texture by stable key, replacing it if the type changed"""
+    texture = _lookup(bpy.data.textures, "textures", key)
+    if texture is not None and texture.type != texture_type:
+        bpy.data.textures.remove(texture)
+        texture = None
+    if texture is None:
+        texture = bpy.data.textures.new(key, texture_type)
+    return texture
+
+def get_image(key: str, width: int, height: int, float_buffer=True, non_color=False) -> bpy.types.Image:
+    """Get image by stable key, recreating it if the size or format changed"""
+    image = _lookup(bpy.data.images, "images", key)
+    if image is not None and (tuple(image.size) != (width, height) or image.is_float != float_buffer):
+        bpy.data.images.remove(image)
+        image = None
+    if image is None:
+        image = bpy.data.images.new(key, width, height, alpha=False, float_buffer=float_buffer)
+    image.colorspace_settings.name = "Non-Color" if non_color else "sRGB"
+    return image
+
+def get_node_group(key: str, tree_type="GeometryNodeTree") -> bpy.types.NodeTree:
+    """Get node group by stable key; caller rebuilds its nodes"""
+    group = _lookup(bpy.data.node_groups, "node_groups", key)
+    if group is not None and group.bl_idname != tree_type:
+        bpy.data.node_groups.remove(group)
+        group = None
+    if group is None:
+        group = bpy.data.node_groups.new(key, tree_type)
+    return group
+
+def get_principled_node(material: bpy.types.Material):
+    """Find the Principled BSDF of a node material, recreating it if removed"""
+    nodes = material.node_tree.nodes
+    bsdf_node = next((n for n in nodes if n.type == 'BSDF_PRINCIPLED'), None)
+    if bsdf_node is None:
+        bsdf_node = nodes.new("ShaderNodeBsdfPrincipled")
+    return bsdf_node
+
+def purge_orphans(keep_active=True) -> int:
+    """Remove datablocks without users; registry datablocks of this run are kept"""
+    removed = 0
+    for kind in ORPHAN_COLLECTIONS:
+        collection = getattr(bpy.data, kind)
+        for datablock in list(collection):
+            if datablock.users > 0 or datablock.use_fake_user:
+                continue
+            if keep_active and (kind, datablock.name) in _active_keys:
+                continue
+            collection.remove(datablock)
+            removed += 1
+    _usage["purged"] += removed
+    return removed
+
+def report_usage(reset=True) -> dict:
+    """Print and return how many datablocks were reused vs created"""
+    usage = dict(_usage)
+    print(f"[Datablocks] reused={usage['reused']} created={usage['created']} purged={usage['purged']}")
+    if reset:
+        _active_keys.clear()
+        for name in _usage:
+            _usage[name] = 0
+    return usage
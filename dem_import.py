@@ -0,0 +1,194 @@
+import math
+import os
+
+import numpy as np
+
+# Elevation grids from disk, resampled to the (res+1) x (res+1) vertex grid
+# one block of source rows at a time. Output uses the heights[j, i] layout:
+# row 0 is the southern (lowest y) edge, so north-up files are flipped.
+
+ASCII_HEADER_KEYS = ("ncols", "nrows", "xllcorner", "yllcorner", "xllcenter", "yllcenter",
+                     "cellsize", "nodata_value")
+
+
+class DemSource:
+    """A DEM opened lazily: shape, nodata and a row-block reader.
+
+    .npy and raw files are memory mapped; ASCII grids are parsed line by line,
+    so only the rows of the block being resampled are ever in memory.
+    """
+
+    def __init__(self, path, fmt=None, raw_shape=None, raw_dtype=None, nodata=None):
+        self.path = path
+        self.format = fmt or detect_format(path)
+        self.nodata = nodata
+        self.north_up = True
+        self._header_lines = 0
+
+        if self.format == "npy":
+            self._array = np.load(path, mmap_mode="r")
+            if self._array.ndim != 2:
+                raise ValueError(f"DEM {path} has {self._array.ndim} dimensions, expected 2")
+            self.rows, self.cols = self._array.shape
+            # Arrays saved from this pipeline are already south-up
+            self.north_up = False
+        elif self.format == "ascii":
+            header = self._read_ascii_header()
+            self.rows, self.cols = int(header["nrows"]), int(header["ncols"])
+            if self.nodata is None and "nodata_value" in header:
+                self.nodata = header["nodata_value"]
+            self._array = None
+        elif self.format == "raw":
+            dtype = np.dtype(raw_dtype or (">i2" if path.lower().endswith(".hgt") else "<u2"))
+            count = os.path.getsize(path) // dtype.itemsize
+            if raw_shape is None:
+                side = math.isqrt(count)
+                if side * side != count:
+                    raise ValueError(f"Raw DEM {path} is not square; set DEM_RAW_SHAPE")
+                raw_shape = (side, side)
+            self._array = np.memmap(path, dtype=dtype, mode="r", shape=tuple(raw_shape))
+            self.rows, self.cols = self._array.shape
+            if self.nodata is None and dtype.kind == "i":
+                self.nodata = -32768  # SRTM void
+        else:
+            raise ValueError(f"Unknown DEM format '{self.format}'")
+
+    def _read_ascii_header(self):
+        header = {}
+        with open(self.path, "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) != 2 or parts[0].lower() not in ASCII_HEADER_KEYS:
+                    break
+                header[parts[0].lower()] = float(parts[1])
+                self._header_lines += 1
+        return header
+
+    def blocks(self, row0, row1, col0, col1, block_rows=256):
+        """Yield (start_row, float64 block) over rows [row0, row1), cols [col0, col1)"""
+        if self._array is not None:
+            for start in range(row0, row1, block_rows):
+                stop = min(start + block_rows, row1)
+                yield start, np.asarray(self._array[start:stop, col0:col1], dtype=np.float64)
+            return
+
+        with open(self.path, "r") as f:
+            for _ in range(self._header_lines):
+                next(f)
+            buffered, start = [], row0
+            for row, line in enumerate(f):
+                if row < row0:
+                    continue
+                if row >= row1:
+                    break
+                buffered.append(line)
+                if len(buffered) == block_rows:
+                    yield start, _parse_ascii_rows(buffered, self.cols)[:, col0:col1]
+                    start += len(buffered)
+                    buffered = []
+            if buffered:
+                yield start, _parse_ascii_rows(buffered, self.cols)[:, col0:col1]
+
+def _parse_ascii_rows(lines, cols):
+    values = np.array(" ".join(lines).split(), dtype=np.float64)
+    return values.reshape(len(lines), cols)
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        return "npy"
+    if extension in (".asc", ".txt", ".grd"):
+        return "ascii"
+    if extension in (".raw", ".r16", ".bin", ".hgt"):
+        return "raw"
+    raise ValueError(f"Cannot tell DEM format from '{extension}'; set DEM_FORMAT")
+
+
+def _bin_starts(length, bins):
+    """Start index of each output bin when length samples snap to the nearest of bins vertices"""
+    centers = np.round(np.arange(length) * (bins - 1) / max(length - 1, 1)).astype(np.int64)
+    return np.searchsorted(centers, np.arange(bins))
+
+def _bilinear(source, out_rows, out_cols):
+    rows, cols = source.shape
+    fj = np.linspace(0, rows - 1, out_rows)
+    fi = np.linspace(0, cols - 1, out_cols)
+    j0 = np.minimum(fj.astype(np.int64), max(rows - 2, 0))
+    i0 = np.minimum(fi.astype(np.int64), max(cols - 2, 0))
+    j1 = np.minimum(j0 + 1, rows - 1)
+    i1 = np.minimum(i0 + 1, cols - 1)
+    tj = (fj - j0)[:, np.newaxis]
+    ti = (fi - i0)[np.newaxis, :]
+    top = source[j0][:, i0] * (1 - ti) + source[j0][:, i1] * ti
+    bottom = source[j1][:, i0] * (1 - ti) + source[j1][:, i1] * ti
+    return top * (1 - tj) + bottom * tj
+
+def resample_dem(source, resolution, crop_square=True, block_rows=256):
+    """Area-average source onto a (resolution+1)^2 vertex grid, streaming row blocks.
+
+    Each source sample is assigned to its nearest output vertex; sums and
+    counts per vertex are accumulated block by block, so memory stays at one
+    block plus the output grid. Nodata samples are skipped. When the source is
+    coarser than the output, it is read whole and bilinearly interpolated.
+    """
+    out_side = resolution + 1
+    row0, row1, col0, col1 = 0, source.rows, 0, source.cols
+    if crop_square:
+        side = min(source.rows, source.cols)
+        row0 = (source.rows - side) // 2
+        col0 = (source.cols - side) // 2
+        row1, col1 = row0 + side, col0 + side
+    rows, cols = row1 - row0, col1 - col0
+
+    if rows < out_side or cols < out_side:
+        whole = np.concatenate([block for _, block in source.blocks(row0, row1, col0, col1, block_rows)])
+        result = _fill_nodata(whole, source.nodata)
+        result = _bilinear(result, out_side, out_side)
+    else:
+        row_starts = _bin_starts(rows, out_side)
+        col_starts = _bin_starts(cols, out_side)
+        row_bins = np.repeat(np.arange(out_side), np.diff(np.append(row_starts, rows)))
+        sums = np.zeros((out_side, out_side))
+        counts = np.zeros((out_side, out_side))
+        for start, block in source.blocks(row0, row1, col0, col1, block_rows):
+            valid = _valid_mask(block, source.nodata)
+            block = np.where(valid, block, 0.0)
+            block_bins = row_bins[start - row0:start - row0 + len(block)]
+            np.add.at(sums, block_bins, np.add.reduceat(block, col_starts, axis=1))
+            np.add.at(counts, block_bins, np.add.reduceat(valid.astype(np.float64), col_starts, axis=1))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = sums / counts
+        result = _fill_nodata(result, None)
+
+    return result[::-1] if source.north_up else result
+
+def _valid_mask(values, nodata):
+    valid = np.isfinite(values)
+    if nodata is not None:
+        valid &= values != nodata
+    return valid
+
+def _fill_nodata(values, nodata):
+    """Replace voids with the lowest valid elevation"""
+    valid = _valid_mask(values, nodata)
+    if valid.all():
+        return values
+    if not valid.any():
+        raise ValueError("DEM has no valid elevation samples")
+    return np.where(valid, values, values[valid].min())
+
+def fit_heights(heights, height_range=None, z_scale=1.0):
+    """Shift the lowest point to 0 and scale to height_range (or by z_scale if None)"""
+    heights = heights - heights.min()
+    if height_range is not None:
+        heights *= height_range / max(float(heights.max()), 1e-9)
+    else:
+        heights *= z_scale
+    return heights.astype(np.float32)
+
+def load_dem(path, resolution, fmt=None, raw_shape=None, raw_dtype=None, nodata=None,
+             height_range=None, z_scale=1.0, crop_square=True, block_rows=256):
+    """Open, resample and fit a DEM to the terrain grid; returns (n, n) float32 heights"""
+    source = DemSource(path, fmt, raw_shape, raw_dtype, nodata)
+    heights = resample_dem(source, resolution, crop_square, block_rows)
+    return fit_heights(heights, height_range, z_scale)
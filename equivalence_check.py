@@ -0,0 +1,200 @@
+"""Check the optimized terrain paths against the per-vertex reference loops.
+
+    python equivalence_check.py                         # default grids and parameter sets
+    python equivalence_check.py --resolutions 64 --params default steep
+    python equivalence_check.py --update-golden         # rewrite equivalence_golden.json
+
+For every resolution / parameter set both paths run on the same seeded grid:
+deform stages 1-4, slope, jitter and smoothing. Each stage output is compared
+with a tolerance, and its summary checksum is compared with the stored golden
+one, so a change in either path shows up. The report also lists the speedup
+of each stage. Runs with plain Python (no bpy).
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+import numpy as np
+
+import config_para as cfg
+import kernels
+import reference_terrain as reference
+import terrain_core
+from terrain_worker import config_overrides
+
+GOLDEN_PATH = os.path.join(current_dir, "equivalence_golden.json")
+
+PARAMETER_SETS = {
+    "default": {},
+    "steep": {"HEIGHT_SCALE": 4.0, "POWER_VALUE": 1.8, "FREQUENCY": 0.25},
+    "broad": {"DECAY_RATE": 0.004, "MIX_WEIGHT": 0.2, "RANDOMNESS_FACTOR": 0.5},
+}
+
+# Absolute tolerance relative to the reference's peak magnitude, per stage
+TOLERANCE = 1e-5
+STAGES = ["stage1", "stage2", "stage3", "stage4", "slope", "jitter", "smooth", "final"]
+
+
+def checksum(values):
+    """Summary that survives float32/float64 differences, compared with a tolerance"""
+    values = np.asarray(values, dtype=np.float64).ravel()
+    return {
+        "sum": float(values.sum()),
+        "abs_sum": float(np.abs(values).sum()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+    }
+
+def checksums_match(a, b, scale, count):
+    tolerance = TOLERANCE * max(scale, 1.0)
+    return (abs(a["min"] - b["min"]) <= tolerance and abs(a["max"] - b["max"]) <= tolerance
+            and abs(a["sum"] - b["sum"]) <= tolerance * count
+            and abs(a["abs_sum"] - b["abs_sum"]) <= tolerance * count)
+
+
+def run_reference(size, resolution, seed):
+    xs, ys, neighbors = reference.grid_mesh(size, resolution)
+    outputs, seconds = {}, {}
+
+    start = time.perf_counter()
+    stage1 = reference.as_key_data(reference.deform_stage1_base(xs, ys))
+    stage2 = reference.as_key_data(reference.deform_stage2_mix(xs, ys))
+    stage3 = reference.as_key_data(reference.deform_stage3_height(stage1, stage2))
+    stage4 = reference.as_key_data(reference.deform_stage4_radial_decay(xs, ys, stage1, stage2, stage3))
+    seconds["deform"] = time.perf_counter() - start
+    heights = [a + b + c + d for a, b, c, d in zip(stage1, stage2, stage3, stage4)]
+
+    start = time.perf_counter()
+    slope_values = reference.compute_slope(heights, neighbors)
+    seconds["slope"] = time.perf_counter() - start
+
+    random.seed(seed)
+    start = time.perf_counter()
+    jitter = reference.as_key_data(reference.apply_smart_jitter(xs, ys, heights, neighbors))
+    seconds["jitter"] = time.perf_counter() - start
+    heights = [h + j for h, j in zip(heights, jitter)]
+
+    start = time.perf_counter()
+    smooth = reference.as_key_data(reference.smooth_height_by_slope(heights, neighbors))
+    seconds["smooth"] = time.perf_counter() - start
+
+    outputs.update(stage1=stage1, stage2=stage2, stage3=stage3, stage4=stage4, slope=slope_values,
+                   jitter=jitter, smooth=smooth, final=[h + s for h, s in zip(heights, smooth)])
+    side = resolution + 1
+    return {name: np.asarray(values).reshape(side, side) for name, values in outputs.items()}, seconds
+
+def run_optimized(size, resolution, seed, backend=None):
+    x, y = terrain_core.grid_xy(size, resolution)
+    shape = (resolution + 1, resolution + 1)
+    dtype = terrain_core.DTYPE
+    outputs, seconds = {}, {}
+
+    start = time.perf_counter()
+    stage1 = terrain_core.stage1_base(x, y, np.empty(shape, dtype))
+    stage2 = terrain_core.stage2_mix(x, y, np.empty(shape, dtype))
+    stage3 = terrain_core.stage3_power(stage1, stage2, np.empty(shape, dtype))
+    heights = stage1 + stage2 + stage3
+    stage4 = terrain_core.stage4_radial_decay(x, y, heights, np.empty(shape, dtype))
+    heights += stage4
+    seconds["deform"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    slope_values = terrain_core.slope(heights)
+    seconds["slope"] = time.perf_counter() - start
+
+    # Same defaults as generate_terrian.apply_smart_jitter
+    random.seed(seed)
+    start = time.perf_counter()
+    flat = heights.ravel()
+    weights = terrain_core.jitter_weight(terrain_core.normalize(flat), terrain_core.slope(heights).ravel(),
+                                         0.6, 0.4, 1.2, 1.2)
+    xs = np.broadcast_to(x, shape).ravel()
+    ys = np.broadcast_to(y, shape).ravel()
+    jitter = terrain_core.jitter_delta(xs, ys, flat, weights).reshape(shape)
+    seconds["jitter"] = time.perf_counter() - start
+    heights = heights + jitter
+
+    start = time.perf_counter()
+    smooth = terrain_core.smooth_delta(heights, terrain_core.slope(heights), backend=backend)
+    seconds["smooth"] = time.perf_counter() - start
+
+    outputs.update(stage1=stage1, stage2=stage2, stage3=stage3, stage4=stage4, slope=slope_values,
+                   jitter=jitter, smooth=smooth, final=heights + smooth)
+    return outputs, seconds
+
+
+def check_case(size, resolution, param_name, seed, golden, backend=None):
+    with config_overrides(PARAMETER_SETS[param_name]):
+        reference_out, reference_seconds = run_reference(size, resolution, seed)
+        kernels.warm_up(backend)
+        optimized_out, optimized_seconds = run_optimized(size, resolution, seed, backend)
+
+    key = f"res{resolution}/{param_name}/seed{seed}"
+    golden_case = golden.get(key, {})
+    stages = {}
+    for name in STAGES:
+        ref, opt = reference_out[name], optimized_out[name].astype(np.float64)
+        scale = float(np.abs(ref).max())
+        error = float(np.abs(ref - opt).max())
+        expected = golden_case.get(name)
+        stages[name] = {
+            "max_abs_error": error,
+            "within_tolerance": error <= TOLERANCE * max(scale, 1.0),
+            "golden": None if expected is None else checksums_match(checksum(opt), expected, scale, ref.size),
+            "checksum": checksum(ref),
+        }
+    speedup = {name: reference_seconds[name] / max(optimized_seconds[name], 1e-9) for name in reference_seconds}
+    return key, {"stages": stages, "speedup": speedup,
+                 "reference_seconds": reference_seconds, "optimized_seconds": optimized_seconds}
+
+def print_case(key, result):
+    failed = [name for name, stage in result["stages"].items()
+              if not stage["within_tolerance"] or stage["golden"] is False]
+    print(f"{key}: {'OK' if not failed else 'FAIL ' + ', '.join(failed)}")
+    for name, stage in result["stages"].items():
+        golden = {None: "-", True: "ok", False: "MISMATCH"}[stage["golden"]]
+        print(f"  {name:<7} max|ref-opt| {stage['max_abs_error']:.2e}  golden {golden}")
+    print("  speedup " + "  ".join(f"{name} {ratio:.0f}x" for name, ratio in result["speedup"].items()))
+    return not failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Optimized vs reference terrain equivalence check")
+    parser.add_argument("--resolutions", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--params", nargs="+", default=list(PARAMETER_SETS), choices=list(PARAMETER_SETS))
+    parser.add_argument("--size", type=float, default=cfg.TERRAIN_SIZE)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--backend", choices=kernels.BACKENDS, default=None, help="kernel backend")
+    parser.add_argument("--update-golden", action="store_true", help="store reference checksums")
+    parser.add_argument("--json", help="also write the full report to this file")
+    args = parser.parse_args()
+
+    golden = {}
+    if os.path.exists(GOLDEN_PATH):
+        with open(GOLDEN_PATH) as f:
+            golden = json.load(f)
+
+    report, all_ok = {}, True
+    for resolution in args.resolutions:
+        for param_name in args.params:
+            key, result = check_case(args.size, resolution, param_name, args.seed, golden, args.backend)
+            report[key] = result
+            all_ok &= print_case(key, result)
+            if args.update_golden:
+                golden[key] = {name: stage["checksum"] for name, stage in result["stages"].items()}
+
+    if args.update_golden:
+        with open(GOLDEN_PATH, "w") as f:
+            json.dump(golden, f, indent=1, sort_keys=True)
+        print(f"Golden checksums written to {GOLDEN_PATH}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(0 if all_ok else 1)
@@ -1,85 +1,79 @@
 import bpy
 import math
 import random
-import bmesh
 import numpy as np
 from mathutils import Vector
 
 import config_para as cfg
 import animation
+import hydrology
+import kernels
+import key_stack
+import mask_engine
+import memory_budget
+import terrain_core
+
+
+# helpers
+
+def grid_coordinates(terrain_obj):
+    """Broadcastable x (1, n) and y (n, 1) vertex coordinates of the terrain grid"""
+    vert_count = len(terrain_obj.data.vertices)
+    side = terrain_core.grid_side(vert_count)
+    co = memory_budget.get_pool().get("key_co", (vert_count * 3,))
+    terrain_obj.data.vertices.foreach_get("co", co)
+    x = co[0:side * 3:3].reshape(1, side).copy()
+    y = co[1::side * 3].reshape(side, 1).copy()
+    return x, y
+
+def write_key_z(key_block, z_values):
+    """Set the z of every point in key_block with one foreach_get/foreach_set"""
+    co = memory_budget.get_pool().get("key_co", (len(key_block.data) * 3,))
+    key_block.data.foreach_get("co", co)
+    co[2::3] = np.ravel(z_values)
+    key_block.data.foreach_set("co", co)
 
-
-# helpers 
-    
 def compute_slope(terrain_obj, heights=None):
-    """Calculate local slope for each vertex using BMesh"""
-    bmesh_data = bmesh.new()
-    bmesh_data.from_mesh(terrain_obj.data)
-    bm_verts = bmesh_data.verts
-
-    vertex_count = len(bm_verts)
-    slope_values = np.zeros(vertex_count)
+    """Calculate local slope for each vertex from its grid neighbors"""
+    pool = memory_budget.get_pool()
+    vert_count = len(terrain_obj.data.vertices)
+    side = terrain_core.grid_side(vert_count)
 
     if heights is None:
-        heights = [v.co.z for v in terrain_obj.data.vertices]
-
-    # Compute slope
-    for i, bm_vert in enumerate(bm_verts):
-        neighbors = [e.other_vert(bm_vert) for e in bm_vert.link_edges]
-        if not neighbors:
-            continue
-        
-        height_i = heights[i]
-        neigh_heights = [heights[n.index] for n in neighbors]
-        height_diff = np.mean([abs(h - height_i) for h in neigh_heights])
-
-        slope_values[i] = height_diff
-
-    # Clean up BMesh memory
-    bmesh_data.free()
+        co = pool.get("key_co", (vert_count * 3,))
+        terrain_obj.data.vertices.foreach_get("co", co)
+        heights = co[2::3]
+    heights = np.asarray(heights, dtype=pool.dtype).reshape(side, side)
 
-    # Normalize slope values
-    slope_min, slope_max = slope_values.min(), slope_values.max()
-    slope_values = (slope_values - slope_min) / (slope_max - slope_min + 1e-6)
-    return slope_values
+    slope_values = terrain_core.slope(heights, out=pool.get("slope", (side, side)),
+                                      scratch=pool.get("scratch", (side, side)))
+    return slope_values.ravel()
 
 def compute_height_normalization(terrain_obj, heights = None):
     """Normalize height values to 0-1 range"""
+    pool = memory_budget.get_pool()
     if heights is not None:
-        z_coordinates = heights
+        z_coordinates = np.asarray(heights, dtype=pool.dtype).ravel()
     else:
-        data = terrain_obj.data.vertices
-        z_coordinates = [vertex.co.z for vertex in data]
+        co = pool.get("key_co", (len(terrain_obj.data.vertices) * 3,))
+        terrain_obj.data.vertices.foreach_get("co", co)
+        z_coordinates = co[2::3]
     print("debug: use shape key or terrian", heights is not None)
-    z_min, z_max = min(z_coordinates), max(z_coordinates)
-    z_range = max(z_max - z_min, 1e-6)
-    return [(z - z_min) / z_range for z in z_coordinates]
+    return terrain_core.normalize(z_coordinates, out=pool.get("height_norm", z_coordinates.shape))
 
-def compute_jitter_weight(height_norms, slope_values, height_weight=0.6, slope_weight=0.4, 
+def compute_jitter_weight(height_norms, slope_values, height_weight=0.6, slope_weight=0.4,
                          height_exponent=1.0, slope_exponent=1.0):
     """Calculate mixed disturbance weight: w = a*h^alpha + b*s^beta"""
-    weights = []
-    for height, slope in zip(height_norms, slope_values):
-        weight = height_weight * (height ** height_exponent) + slope_weight * (slope ** slope_exponent)
-        weights.append(min(weight, 1.0))
-    return weights
+    pool = memory_budget.get_pool()
+    height_norms = np.asarray(height_norms, dtype=pool.dtype)
+    slope_values = np.asarray(slope_values, dtype=pool.dtype)
+    return terrain_core.jitter_weight(height_norms, slope_values, height_weight, slope_weight,
+                                      height_exponent, slope_exponent,
+                                      out=pool.get("jitter_weight", height_norms.shape),
+                                      scratch=pool.get("scratch_flat", height_norms.shape))
 
 # Asymmetric disturbance function
-def asymmetric_jitter(x, y, intensity=cfg.RANDOMNESS_FACTOR):
-    """Generate natural asymmetric Z disturbance for realistic terrain variation"""
-    # Local random seed for consistent coordinates
-    random.seed(int(x * 11.17 + y * 5.31 + 11))
-    # Multi-layer noise overlay (fractal brownian motion style)
-    noise_1 = math.sin(0.05 * x) * math.cos(0.08 * y)
-    noise_2 = math.sin(0.15 * x + 0.3) * math.cos(0.1 * y + 1.2)
-    noise_3 = math.sin(0.4 * x - 0.7 * y)
-
-    # Local random variation
-    local_randomness = random.uniform(-1, 1) * 0.6
-    # Weighted combination of multiple frequencies and randomness
-    combined_value = (0.5 * noise_1 + 0.3 * noise_2 + 0.2 * noise_3 + local_randomness)
-    # Enhance asymmetry
-    return max(-1.0, min(1.0, combined_value)) * intensity
+asymmetric_jitter = terrain_core.asymmetric_jitter
 
 
 # actual terrain functions
@@ -108,34 +102,46 @@ def deform_terrain(terrain_obj, terrain_mode="mountain"):
     print(f"Base terrain generation completed: mode = {terrain_mode}")
 
 def apply_smart_jitter(terrain_obj,jitter_intensity=3, height_weight=0.6, slope_weight=0.4,
-                      height_exponent=1.2, slope_exponent=1.2, noise_strength=5):
+                      height_exponent=1.2, slope_exponent=1.2, noise_strength=5, chunk_size=65536):
     """Apply disturbance based on height and slope: higher and steeper areas get more variation"""
 
     key_name = animation.add_shape_key(terrain_obj, cfg.APPLY_JITTER)
-    keys = terrain_obj.data.shape_keys.key_blocks  
+    keys = terrain_obj.data.shape_keys.key_blocks
 
-    prev_key = keys[-2]      
-    key_block = keys[-1]   
+    prev_key = keys[-2]
+    key_block = keys[-1]
 
-    print("debug: key names:", prev_key.name, key_block.name)   
+    print("debug: key names:", prev_key.name, key_block.name)
+    pool = memory_budget.get_pool()
+    vert_count = len(key_block.data)
     heights = get_height_after_deform(terrain_obj)
     height_norms = compute_height_normalization(terrain_obj, heights)
     slope_values = compute_slope(terrain_obj, heights)
-    weights = compute_jitter_weight(height_norms, slope_values, height_weight, slope_weight, 
+    weights = compute_jitter_weight(height_norms, slope_values, height_weight, slope_weight,
                                   height_exponent, slope_exponent)
 
-
-    for i in range(len(heights)):
-        x, y, z = (prev_key.data[i].co.x, prev_key.data[i].co.y, heights[i])
-        geometric_jitter = (random.random() - 0.5) * 2.0 * jitter_intensity * weights[i]
-        spatial_jitter = asymmetric_jitter(x, y)
-        combined_jitter = geometric_jitter * (1 + noise_strength * spatial_jitter)
-        if combined_jitter + z < 0:
-            combined_jitter = -z  # prevent going below zero height
-        key_block.data[i].co.z = combined_jitter
-
+    if cfg.DEFORM_BACKEND == "geometry_nodes" and not cfg.PERIODIC:
+        # Spatial field from the stage pass of the node group; random draws seeded from the global RNG
+        import gn_backend
+        spatial = gn_backend.take_jitter_field(terrain_obj)
+        rng = np.random.default_rng(random.getrandbits(32))
+        jitter = terrain_core.jitter_delta_field(spatial, heights, weights, rng, jitter_intensity,
+                                                 noise_strength, out=pool.get("jitter", (vert_count,)))
+    elif cfg.PERIODIC:
+        x, y = grid_coordinates(terrain_obj)
+        jitter = terrain_core.periodic_jitter_delta(x, y, heights, weights, jitter_intensity, noise_strength,
+                                                    out=pool.get("jitter", (vert_count,)), chunk_size=chunk_size)
+    else:
+        prev_co = pool.get("prev_co", (vert_count * 3,))
+        prev_key.data.foreach_get("co", prev_co)
+        jitter = terrain_core.jitter_delta(prev_co[0::3], prev_co[1::3], heights, weights,
+                                           jitter_intensity, noise_strength,
+                                           out=pool.get("jitter", (vert_count,)), chunk_size=chunk_size)
+
+    write_key_z(key_block, jitter)
+    key_stack.get_stack(terrain_obj).refresh(cfg.APPLY_JITTER, jitter)
     terrain_obj.data.update()
-    print("Height and slope dependent jitter applied111")    
+    print("Height and slope dependent jitter applied111")
 
 def smooth_height_by_slope(terrain_obj, base_smoothing_factor=0.5, slope_exponent=2, iteration_count=3):
     """Apply stronger smoothing to vertices with lower slope"""
@@ -145,66 +151,84 @@ def smooth_height_by_slope(terrain_obj, base_smoothing_factor=0.5, slope_exponen
     prev_key = keys[-2]
     key_block = keys[-1]
 
-    bmesh_data = bmesh.new()
-    bmesh_data.from_mesh(terrain_obj.data)
-
-    bmesh_data.verts.ensure_lookup_table()
-    bmvert = bmesh_data.verts
-    slope_values = compute_slope(terrain_obj)
-
-    heights = get_height_after_deform(terrain_obj) 
-    for i in range(len(heights)):
-        heights[i] += prev_key.data[i].co.z
-    z_values = np.array(heights)
-    slope_values = compute_slope(terrain_obj, heights)
-
-    for _ in range(iteration_count):
-        new_z_values = np.zeros(len(bmvert))
-        for i, vert_prev in enumerate(heights):
-            neighbors = [edge.other_vert(bmvert[i]) for edge in bmvert[i].link_edges]
-            if not neighbors:
-                new_z_values[i] = vert_prev.co.z
-                continue
+    pool = memory_budget.get_pool()
+    side = terrain_core.grid_side(len(key_block.data))
+    heights = key_stack.get_stack(terrain_obj).height_after(prev_key.name).reshape(side, side)
+    slope_values = compute_slope(terrain_obj, heights).reshape(side, side)
 
-            # Average height of neighbors
-            neighbor_avg_height = np.mean([heights[n.index] for n in neighbors])
+    # Every pass starts from the same heights, so iteration_count > 1 adds nothing
+    smooth_delta = terrain_core.smooth_delta(heights, slope_values, base_smoothing_factor, slope_exponent,
+                                             out=pool.get("smooth_delta", (side, side)),
+                                             scratch=pool.get("scratch", (side, side)))
 
-            # Slope weight control
-            slope = slope_values[i]
-            smoothing_weight = base_smoothing_factor * (1 - slope**slope_exponent)
-
-            # Linear interpolation between original and neighbor average
-            new_z_values[i] = (1 - smoothing_weight) * heights[i] + smoothing_weight * neighbor_avg_height
+    write_key_z(key_block, smooth_delta)
+    key_stack.get_stack(terrain_obj).refresh(cfg.SMOOTH_TERRAIN, smooth_delta.ravel())
+    terrain_obj.data.update()
+    print("Slope-dependent smoothing applied")
 
-        # Apply updates
-        for i, p in enumerate(key_block.data):
-            p.co.z = new_z_values[i] - heights[i]
+def carve_rivers(terrain_obj, routing=None):
+    """Fill depressions, route and accumulate flow, carve channels into RiverCarve"""
+    key_name = animation.add_shape_key(terrain_obj, cfg.RIVER_CARVE)
+    keys = terrain_obj.data.shape_keys.key_blocks
 
-    bmesh_data.free()
+    prev_key = keys[-2]
+    key_block = keys[key_name]
+
+    side = terrain_core.grid_side(len(key_block.data))
+    heights = key_stack.get_stack(terrain_obj).height_after(prev_key.name).reshape(side, side)
+    x, y = grid_coordinates(terrain_obj)
+    cell = float(x[0, 1] - x[0, 0])
+
+    filled = kernels.priority_flood(heights, cfg.RIVER_EPSILON)
+    routing = cfg.RIVER_ROUTING if routing is None else routing
+    flow = hydrology.flow_dinf if routing == "dinf" else hydrology.flow_d8
+    receivers, fractions = flow(filled, cell)
+    accumulation = kernels.flow_accumulation(receivers, fractions)
+
+    depth = hydrology.carve_depth(accumulation, heights.shape, cfg.RIVER_DEPTH,
+                                  cfg.RIVER_MIN_FLOW, cfg.RIVER_FLOW_EXPONENT)
+    # Soften the banks, and never cut below zero height
+    depth = np.maximum(depth, 0.5 * terrain_core.neighbor_mean(depth))
+    carve = -np.minimum(depth, np.maximum(heights, 0.0))
+
+    write_key_z(key_block, carve)
+    key_stack.get_stack(terrain_obj).refresh(key_name, carve.ravel())
+    mask_engine.write_point_attribute(terrain_obj, "flow", hydrology.flow_map(accumulation, heights.shape).ravel())
     terrain_obj.data.update()
-    print("Slope-dependent smoothing applied")
+    print(f"[Rivers] {routing} routing, max flow {accumulation.max():.0f} cells, "
+          f"{int((depth > 1e-3).sum())} channel vertices carved")
+    return accumulation.reshape(heights.shape)
 
 # defrom stage
 # base_height = abs(math.sin(cfg.FREQUENCY * x + cfg.PHASE_X) * math.cos(cfg.FREQUENCY * y + cfg.PHASE_Y)
 #                            + cfg.MIX_WEIGHT * math.sin(cfg.MIX_FREQUENCY * cfg.FREQUENCY * y + cfg.PHASE_MIX) + cfg.PHASE_Z)
 # z = cfg.HEIGHT_SCALE * base_height**cfg.POWER_VALUE * math.exp(-cfg.DECAY_RATE * radius**2)
+def _stage_buffer(terrain_obj, name="stage"):
+    side = terrain_core.grid_side(len(terrain_obj.data.vertices))
+    return memory_budget.get_pool().get(name, (side, side))
+
+def _key_grid(terrain_obj, key_name):
+    side = terrain_core.grid_side(len(terrain_obj.data.vertices))
+    return key_stack.get_stack(terrain_obj).key_delta(key_name).reshape(side, side)
+
 def deform_stage1_base(terrain_obj):
     key = animation.add_shape_key(terrain_obj, cfg.DEFORM_STAGE1)
     kb = terrain_obj.data.shape_keys.key_blocks[key]
 
-    for i, v in enumerate(kb.data):
-        x, y = v.co.x, v.co.y
-        kb.data[i].co.z = 5* math.sin(cfg.FREQUENCY * x + cfg.PHASE_X) * math.cos(cfg.FREQUENCY * y + cfg.PHASE_Y)
+    x, y = grid_coordinates(terrain_obj)
+    stage1 = terrain_core.stage1_base(x, y, out=_stage_buffer(terrain_obj))
+    write_key_z(kb, stage1)
+    key_stack.get_stack(terrain_obj).refresh(cfg.DEFORM_STAGE1, stage1.ravel())
     print("[Stage 1] Base wave created")
 
-def deform_stage2_mix(terrain_obj):    
+def deform_stage2_mix(terrain_obj):
     key = animation.add_shape_key(terrain_obj, cfg.DEFORM_STAGE2)
     kb = terrain_obj.data.shape_keys.key_blocks[key]
 
-    for i, v in enumerate(kb.data):
-        x, y = v.co.x, v.co.y
-        mix_value = 5* cfg.MIX_WEIGHT * math.sin(cfg.MIX_FREQUENCY * cfg.FREQUENCY * y + cfg.PHASE_MIX)
-        kb.data[i].co.z = mix_value
+    x, y = grid_coordinates(terrain_obj)
+    stage2 = terrain_core.stage2_mix(x, y, out=_stage_buffer(terrain_obj))
+    write_key_z(kb, stage2)
+    key_stack.get_stack(terrain_obj).refresh(cfg.DEFORM_STAGE2, stage2.ravel())
     print("[Stage 2] Mixed wave overlay applied")
 
 def deform_stage3_height(terrain_obj):
@@ -212,63 +236,85 @@ def deform_stage3_height(terrain_obj):
 
     # Get new key
     key_name = animation.add_shape_key(terrain_obj, cfg.DEFORM_STAGE3)
-    stage3 = kb[key_name]
+    stage3_key = kb[key_name]
 
     # Previous keys
-    stage1 = kb[cfg.DEFORM_STAGE1]
-    stage2 = kb[cfg.DEFORM_STAGE2]
-
-    for i, v in enumerate(stage3.data):
-        base_h = stage1.data[i].co.z + stage2.data[i].co.z
-        base_h = abs(base_h)
-        if base_h >= 0:
-            new_h_delta = cfg.HEIGHT_SCALE * (base_h ** cfg.POWER_VALUE) - base_h
-        else:
-            new_h_delta = 0.0
-        stage3.data[i].co.z = new_h_delta
+    stage1 = _key_grid(terrain_obj, cfg.DEFORM_STAGE1)
+    stage2 = _key_grid(terrain_obj, cfg.DEFORM_STAGE2)
 
+    stage3 = terrain_core.stage3_power(stage1, stage2, out=_stage_buffer(terrain_obj),
+                                       scratch=_stage_buffer(terrain_obj, "scratch"))
+    write_key_z(stage3_key, stage3)
+    key_stack.get_stack(terrain_obj).refresh(cfg.DEFORM_STAGE3, stage3.ravel())
     print("[Stage 3] Height scaling created")
 
 def deform_stage4_radial_decay(terrain_obj):
     key_name = animation.add_shape_key(terrain_obj, cfg.DEFORM_STAGE4)
     kb = terrain_obj.data.shape_keys.key_blocks
-    stage4 = kb[key_name]
-    stage3 = kb[cfg.DEFORM_STAGE3]
-    stage1 = kb[cfg.DEFORM_STAGE1]
-    stage2 = kb[cfg.DEFORM_STAGE2]
+    stage4_key = kb[key_name]
 
-    for i, v in enumerate(stage4.data):
-        x, y = v.co.x, v.co.y
-        radius = math.sqrt(x**2 + y**2)
-        decay = math.exp(-cfg.DECAY_RATE * radius**2)
-        prev_h = stage1.data[i].co.z + stage2.data[i].co.z + stage3.data[i].co.z
-        decayed_h = prev_h * decay
-        if decayed_h < 0:
-            stage4.data[i].co.z = -prev_h
-        else:
-            stage4.data[i].co.z = decayed_h - prev_h
+    # Previous stages
+    prev_h = _stage_buffer(terrain_obj, "scratch")
+    np.add(_key_grid(terrain_obj, cfg.DEFORM_STAGE1), _key_grid(terrain_obj, cfg.DEFORM_STAGE2), out=prev_h)
+    prev_h += _key_grid(terrain_obj, cfg.DEFORM_STAGE3)
 
-    print("[Stage 4] Radial decay applied") 
+    x, y = grid_coordinates(terrain_obj)
+    stage4 = terrain_core.stage4_radial_decay(x, y, prev_h, out=_stage_buffer(terrain_obj))
+    write_key_z(stage4_key, stage4)
+    key_stack.get_stack(terrain_obj).refresh(cfg.DEFORM_STAGE4, stage4.ravel())
+    print("[Stage 4] Radial decay applied")
 
 
+def deform_stage_dem(terrain_obj):
+    key = animation.add_shape_key(terrain_obj, cfg.DEM_STAGE)
+    kb = terrain_obj.data.shape_keys.key_blocks[key]
+
+    side = terrain_core.grid_side(len(kb.data))
+    heights = terrain_core.dem_heights(side - 1)
+    write_key_z(kb, heights)
+    key_stack.get_stack(terrain_obj).refresh(cfg.DEM_STAGE, heights.ravel())
+    print(f"[DEM] {cfg.DEM_PATH} resampled to {side}x{side}, heights 0-{heights.max():.2f}")
+
+def deform_stages_geometry_nodes(terrain_obj):
+    """Stages 1-4 from the Geometry Nodes backend, realized into the same shape keys"""
+    import gn_backend
+
+    def write_key(key_name, delta):
+        kb = terrain_obj.data.shape_keys.key_blocks[animation.add_shape_key(terrain_obj, key_name)]
+        write_key_z(kb, delta)
+        key_stack.get_stack(terrain_obj).refresh(key_name, delta.ravel())
+
+    gn_backend.realize_stages(terrain_obj, write_key)
+
 def deform_orchestrator(terrain_obj):
+    if cfg.DEM_PATH:
+        deform_stage_dem(terrain_obj)
+        print("Deformation stages completed")
+        return
+    if cfg.DEFORM_BACKEND == "geometry_nodes" and cfg.PERIODIC:
+        print("[Periodic] Geometry Nodes stages are not periodic, using the NumPy stages")
+    elif cfg.DEFORM_BACKEND == "geometry_nodes":
+        deform_stages_geometry_nodes(terrain_obj)
+        print("Deformation stages completed")
+        return
     deform_stage1_base(terrain_obj)
     deform_stage2_mix(terrain_obj)
     deform_stage3_height(terrain_obj)
     deform_stage4_radial_decay(terrain_obj)
-    print("Deformation stages completed")     
+    print("Deformation stages completed")
+
+def load_stage_deltas(terrain_obj, deltas):
+    """Write precomputed {key name: z delta} into shape keys, in order"""
+    for key_name, delta in deltas.items():
+        kb = terrain_obj.data.shape_keys.key_blocks[animation.add_shape_key(terrain_obj, key_name)]
+        write_key_z(kb, delta)
+        key_stack.get_stack(terrain_obj).refresh(key_name, np.ravel(delta))
+    terrain_obj.data.update()
+    print(f"[Load] {len(deltas)} precomputed stage keys written")
 
 def get_height_after_deform(terrain_obj):
     """Calculate final height after all deformation stages"""
-    kb = terrain_obj.data.shape_keys.key_blocks
-    stage1 = kb[cfg.DEFORM_STAGE1]
-    stage2 = kb[cfg.DEFORM_STAGE2]
-    stage3 = kb[cfg.DEFORM_STAGE3]
-    stage4 = kb[cfg.DEFORM_STAGE4]
-
-    heights = []
-    for i in range(len(stage1.data)):
-        total_z = (stage1.data[i].co.z + stage2.data[i].co.z +
-                   stage3.data[i].co.z + stage4.data[i].co.z)
-        heights.append(total_z)
-    return heights     
\ No newline at end of file
+    heights = key_stack.get_stack(terrain_obj).height_after(terrain_core.deform_keys()[-1])
+    out = memory_budget.get_pool().get("heights", heights.shape)
+    np.copyto(out, heights)
+    return out
@@ -0,0 +1,207 @@
+"""Export the staged terrain animation as a glTF 2.0 binary with morph targets.
+
+    blender -b scene.blend --python gltf_morph_export.py -- --output terrain.glb
+
+The Basis becomes the mesh, every stage key one morph target stored as a
+sparse accessor (only the vertices sparse_delta keeps), and the key value
+F-curves one weights animation. Blender is z-up and glTF y-up, so positions
+are written as (x, z, -y) like Blender's own exporter does.
+"""
+import os
+import sys
+import json
+import struct
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+import bpy
+import numpy as np
+
+import config_para as cfg
+import point_cache
+import sparse_delta
+
+GLB_MAGIC = 0x46546C67
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+FLOAT = 5126
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+
+class _GltfBuilder:
+    """Accumulates buffer views and accessors over one binary buffer"""
+
+    def __init__(self):
+        self.chunks = []
+        self.length = 0
+        self.buffer_views = []
+        self.accessors = []
+
+    def view(self, array, target=None):
+        data = np.ascontiguousarray(array).tobytes()
+        padding = -self.length % 4
+        if padding:
+            self.chunks.append(b"\0" * padding)
+            self.length += padding
+        view = {"buffer": 0, "byteOffset": self.length, "byteLength": len(data)}
+        if target is not None:
+            view["target"] = target
+        self.chunks.append(data)
+        self.length += len(data)
+        self.buffer_views.append(view)
+        return len(self.buffer_views) - 1
+
+    def accessor(self, **fields):
+        self.accessors.append(fields)
+        return len(self.accessors) - 1
+
+    def binary(self):
+        data = b"".join(self.chunks)
+        return data + b"\0" * (-len(data) % 4)
+
+
+def _y_up(co):
+    return np.stack([co[:, 0], co[:, 2], -co[:, 1]], axis=1).astype(np.float32)
+
+def _triangles(mesh):
+    mesh.calc_loop_triangles()
+    indices = np.empty(len(mesh.loop_triangles) * 3, dtype=np.uint32)
+    mesh.loop_triangles.foreach_get("vertices", indices)
+    return indices
+
+def _morph_accessor(builder, sparse, vertex_count):
+    """POSITION target: sparse accessor on an all-zero base, dz in the y component"""
+    values = np.zeros((sparse.count, 3), dtype=np.float32)
+    values[:, 1] = sparse.dequantized()
+    bounds = values
+    if sparse.count < vertex_count:
+        bounds = np.concatenate([bounds, np.zeros((1, 3), dtype=np.float32)])
+    fields = {"componentType": FLOAT, "count": vertex_count, "type": "VEC3",
+              "min": bounds.min(axis=0).tolist(), "max": bounds.max(axis=0).tolist()}
+    if not sparse.count:
+        # No bufferView and no sparse: an all-zero target
+        return builder.accessor(**fields), 0
+
+    small = vertex_count <= np.iinfo(np.uint16).max + 1
+    indices = sparse.indices.astype(np.uint16 if small else np.uint32)
+    fields["sparse"] = {
+        "count": sparse.count,
+        "indices": {"bufferView": builder.view(indices),
+                    "componentType": UNSIGNED_SHORT if small else UNSIGNED_INT},
+        "values": {"bufferView": builder.view(values)},
+    }
+    return builder.accessor(**fields), indices.nbytes + values.nbytes
+
+def export_morph_gltf(obj, shape_key_list, path, frame_start=None, frame_end=None,
+                      frame_step=cfg.GLTF_FRAME_STEP, epsilon=cfg.SPARSE_EPSILON, step=cfg.SPARSE_QUANT_STEP):
+    """Write obj's Basis, stage keys and key animation to a .glb; returns the size report"""
+    scene = bpy.context.scene
+    frame_start = scene.frame_start if frame_start is None else frame_start
+    frame_end = scene.frame_end if frame_end is None else frame_end
+    path = bpy.path.abspath(path)
+
+    names, basis, deltas = point_cache.read_key_deltas(obj, shape_key_list)
+    if np.abs(deltas[:, :, :2]).max(initial=0.0) >= 1e-6:
+        raise ValueError("Sparse morph export stores z deltas only, but some keys move x/y")
+    z_deltas = deltas[:, :, 2]
+    sparse_map = sparse_delta.encode_keys(names, z_deltas, epsilon, step)
+    stats = sparse_delta.report(sparse_map, z_deltas, label="glTF")
+
+    builder = _GltfBuilder()
+    positions = _y_up(basis)
+    vertex_count = len(positions)
+    position = builder.accessor(bufferView=builder.view(positions, ARRAY_BUFFER), componentType=FLOAT,
+                                count=vertex_count, type="VEC3",
+                                min=positions.min(axis=0).tolist(), max=positions.max(axis=0).tolist())
+    triangles = _triangles(obj.data)
+    index_accessor = builder.accessor(bufferView=builder.view(triangles, ELEMENT_ARRAY_BUFFER),
+                                      componentType=UNSIGNED_INT, count=len(triangles), type="SCALAR")
+
+    targets, morph_bytes = [], 0
+    for name in names:
+        accessor, nbytes = _morph_accessor(builder, sparse_map[name], vertex_count)
+        targets.append({"POSITION": accessor})
+        morph_bytes += nbytes
+
+    frames = list(range(frame_start, frame_end + 1, frame_step))
+    if frames[-1] != frame_end:
+        frames.append(frame_end)
+    weights = point_cache.sample_key_weights(obj, names, frames)
+    fps = scene.render.fps / scene.render.fps_base
+    times = (np.asarray(frames, dtype=np.float32) - frame_start) / np.float32(fps)
+    time_accessor = builder.accessor(bufferView=builder.view(times), componentType=FLOAT, count=len(times),
+                                     type="SCALAR", min=[float(times[0])], max=[float(times[-1])])
+    weight_accessor = builder.accessor(bufferView=builder.view(weights.astype(np.float32)),
+                                       componentType=FLOAT, count=weights.size, type="SCALAR")
+
+    document = {
+        "asset": {"version": "2.0", "generator": "terrain gltf_morph_export"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"name": obj.name, "mesh": 0}],
+        "meshes": [{
+            "name": obj.data.name,
+            "primitives": [{"attributes": {"POSITION": position}, "indices": index_accessor,
+                            "targets": targets}],
+            "weights": [0.0] * len(names),
+            "extras": {"targetNames": names},
+        }],
+        "animations": [{
+            "name": "TerrainStages",
+            "samplers": [{"input": time_accessor, "output": weight_accessor, "interpolation": "LINEAR"}],
+            "channels": [{"sampler": 0, "target": {"node": 0, "path": "weights"}}],
+        }],
+        "accessors": builder.accessors,
+        "bufferViews": builder.buffer_views,
+    }
+    binary = builder.binary()
+    document["buffers"] = [{"byteLength": len(binary)}]
+    text = json.dumps(document, separators=(",", ":")).encode()
+    text += b" " * (-len(text) % 4)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<III", GLB_MAGIC, 2, 12 + 8 + len(text) + 8 + len(binary)))
+        f.write(struct.pack("<II", len(text), CHUNK_JSON))
+        f.write(text)
+        f.write(struct.pack("<II", len(binary), CHUNK_BIN))
+        f.write(binary)
+
+    dense_morph = len(names) * vertex_count * sparse_delta.DENSE_BYTES_PER_VERTEX
+    stats["gltf"] = {"path": path, "file_bytes": os.path.getsize(path),
+                     "morph_bytes": morph_bytes, "dense_morph_bytes": dense_morph,
+                     "morph_ratio": dense_morph / max(morph_bytes, 1)}
+    print(f"[glTF] {path}: {len(names)} morph targets, {len(frames)} weight samples, "
+          f"morph data {dense_morph / 2**20:.2f} MiB dense -> {morph_bytes / 2**20:.2f} MiB sparse "
+          f"({stats['gltf']['morph_ratio']:.1f}x)")
+    return stats
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Export the staged terrain animation as glTF morph targets")
+    parser.add_argument("--output", default=cfg.GLTF_EXPORT_PATH or "//terrain.glb")
+    parser.add_argument("--object", default=cfg.TERRAIN_OBJECT_NAME)
+    parser.add_argument("--epsilon", type=float, default=cfg.SPARSE_EPSILON)
+    parser.add_argument("--step", type=float, default=cfg.SPARSE_QUANT_STEP)
+    parser.add_argument("--frame-step", type=int, default=cfg.GLTF_FRAME_STEP)
+    parser.add_argument("--json", help="also write the size/error report to this file")
+    args = parser.parse_args(argv)
+
+    terrain = bpy.data.objects[args.object]
+    key_names = [block.name for block in terrain.data.shape_keys.key_blocks
+                 if block.name not in (cfg.BASIS, point_cache.PLAYBACK_KEY)]
+    result = export_morph_gltf(terrain, key_names, args.output, frame_step=args.frame_step,
+                               epsilon=args.epsilon, step=args.step)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
@@ -0,0 +1,211 @@
+import time
+
+import bpy
+import numpy as np
+
+import config_para as cfg
+import datablocks
+import terrain_core
+
+# Geometry Nodes version of deform stages 1-4 and the spatial jitter field.
+# Blender evaluates the node tree natively and multi-threaded; every stage
+# delta is stored as a float point attribute, read back with foreach_get and
+# written into the same shape keys as the Python path.
+
+# Group float inputs, set from config_para on the modifier
+PARAMETERS = ["FREQUENCY", "PHASE_X", "PHASE_Y", "MIX_WEIGHT", "MIX_FREQUENCY", "PHASE_MIX",
+              "HEIGHT_SCALE", "POWER_VALUE", "DECAY_RATE", "RANDOMNESS_FACTOR", "GN_JITTER_RANDOMNESS"]
+
+# Point attribute per shape key
+STAGE_ATTRIBUTES = {
+    cfg.DEFORM_STAGE1: "gn_stage1",
+    cfg.DEFORM_STAGE2: "gn_stage2",
+    cfg.DEFORM_STAGE3: "gn_stage3",
+    cfg.DEFORM_STAGE4: "gn_stage4",
+}
+JITTER_ATTRIBUTE = "gn_spatial_jitter"
+
+# Jitter field of the last realize_stages per object, read once by the jitter stage
+_jitter_fields = {}
+
+
+class _TreeBuilder:
+    """Small helper that lays out math nodes in columns as they are created"""
+
+    def __init__(self, group):
+        self.nodes = group.nodes
+        self.links = group.links
+        self.column = 0
+
+    def _place(self, node):
+        node.location = (self.column * 160, -(self.column % 8) * 80)
+        self.column += 1
+        return node
+
+    def _connect(self, socket, value):
+        if isinstance(value, (int, float)):
+            socket.default_value = value
+        else:
+            self.links.new(value, socket)
+
+    def math(self, operation, a, b=None):
+        node = self._place(self.nodes.new("ShaderNodeMath"))
+        node.operation = operation
+        self._connect(node.inputs[0], a)
+        if b is not None:
+            self._connect(node.inputs[1], b)
+        return node.outputs[0]
+
+    def add(self, a, b):
+        return self.math('ADD', a, b)
+
+    def mul(self, a, b):
+        return self.math('MULTIPLY', a, b)
+
+    def sin(self, a):
+        return self.math('SINE', a)
+
+    def cos(self, a):
+        return self.math('COSINE', a)
+
+    def store(self, geometry, name, value):
+        node = self._place(self.nodes.new("GeometryNodeStoreNamedAttribute"))
+        node.data_type = 'FLOAT'
+        node.domain = 'POINT'
+        node.inputs["Name"].default_value = name
+        self.links.new(geometry, node.inputs["Geometry"])
+        self.links.new(value, _enabled(node.inputs, "Value"))
+        return node.outputs["Geometry"]
+
+
+def _enabled(sockets, name):
+    """The visible socket called name (older versions keep one hidden socket per data type)"""
+    return next(socket for socket in sockets if socket.name == name and socket.enabled)
+
+
+def _new_group_socket(group, name, in_out, socket_type):
+    if hasattr(group, "interface"):
+        return group.interface.new_socket(name=name, in_out=in_out, socket_type=socket_type)
+    if in_out == "INPUT":
+        return group.inputs.new(socket_type, name)
+    return group.outputs.new(socket_type, name)
+
+def build_deform_group():
+    """Node group storing stage 1-4 deltas and the spatial jitter as point attributes"""
+    group = datablocks.get_node_group(cfg.GN_DEFORM_GROUP)
+    group.nodes.clear()
+    if hasattr(group, "interface"):
+        group.interface.clear()
+    else:
+        group.inputs.clear()
+        group.outputs.clear()
+    _new_group_socket(group, "Geometry", "INPUT", "NodeSocketGeometry")
+    for name in PARAMETERS:
+        _new_group_socket(group, name, "INPUT", "NodeSocketFloat")
+    _new_group_socket(group, "Geometry", "OUTPUT", "NodeSocketGeometry")
+
+    tree = _TreeBuilder(group)
+    group_in = tree._place(tree.nodes.new("NodeGroupInput"))
+    p = {name: group_in.outputs[name] for name in PARAMETERS}
+    separate = tree._place(tree.nodes.new("ShaderNodeSeparateXYZ"))
+    tree.links.new(tree._place(tree.nodes.new("GeometryNodeInputPosition")).outputs[0], separate.inputs[0])
+    x, y = separate.outputs["X"], separate.outputs["Y"]
+
+    # Stage 1: 5 sin(F x + PX) cos(F y + PY)
+    stage1 = tree.mul(tree.mul(tree.sin(tree.add(tree.mul(x, p["FREQUENCY"]), p["PHASE_X"])),
+                               tree.cos(tree.add(tree.mul(y, p["FREQUENCY"]), p["PHASE_Y"]))), 5.0)
+    # Stage 2: 5 MW sin(MF F y + PM)
+    mix_frequency = tree.mul(p["MIX_FREQUENCY"], p["FREQUENCY"])
+    stage2 = tree.mul(tree.mul(tree.sin(tree.add(tree.mul(y, mix_frequency), p["PHASE_MIX"])),
+                               p["MIX_WEIGHT"]), 5.0)
+    # Stage 3: HS |s|^P - |s| with s = stage1 + stage2
+    wave = tree.add(stage1, stage2)
+    magnitude = tree.math('ABSOLUTE', wave)
+    stage3 = tree.math('SUBTRACT', tree.mul(tree.math('POWER', magnitude, p["POWER_VALUE"]), p["HEIGHT_SCALE"]),
+                       magnitude)
+    # Stage 4: max(h3 exp(-D r^2), 0) - h3
+    h3 = tree.add(wave, stage3)
+    radius_sq = tree.add(tree.mul(x, x), tree.mul(y, y))
+    decay = tree.math('EXPONENT', tree.mul(radius_sq, tree.mul(p["DECAY_RATE"], -1.0)))
+    stage4 = tree.math('SUBTRACT', tree.math('MAXIMUM', tree.mul(h3, decay), 0.0), h3)
+
+    # Spatial jitter: terrain_core.spatial_jitter_field with a per-point random value
+    noise_1 = tree.mul(tree.sin(tree.mul(x, 0.05)), tree.cos(tree.mul(y, 0.08)))
+    noise_2 = tree.mul(tree.sin(tree.add(tree.mul(x, 0.15), 0.3)), tree.cos(tree.add(tree.mul(y, 0.1), 1.2)))
+    noise_3 = tree.sin(tree.math('SUBTRACT', tree.mul(x, 0.4), tree.mul(y, 0.7)))
+    random_value = tree._place(tree.nodes.new("FunctionNodeRandomValue"))
+    random_value.data_type = 'FLOAT'
+    _enabled(random_value.inputs, "Min").default_value = -1.0
+    _enabled(random_value.inputs, "Max").default_value = 1.0
+    local = tree.mul(_enabled(random_value.outputs, "Value"), p["GN_JITTER_RANDOMNESS"])
+    combined = tree.add(tree.add(tree.mul(noise_1, 0.5), tree.mul(noise_2, 0.3)),
+                        tree.add(tree.mul(noise_3, 0.2), local))
+    clamped = tree.math('MAXIMUM', tree.math('MINIMUM', combined, 1.0), -1.0)
+    jitter = tree.mul(clamped, p["RANDOMNESS_FACTOR"])
+
+    geometry = group_in.outputs["Geometry"]
+    for key_name, stage in zip(STAGE_ATTRIBUTES, (stage1, stage2, stage3, stage4)):
+        geometry = tree.store(geometry, STAGE_ATTRIBUTES[key_name], stage)
+    geometry = tree.store(geometry, JITTER_ATTRIBUTE, jitter)
+    group_out = tree._place(tree.nodes.new("NodeGroupOutput"))
+    tree.links.new(geometry, group_out.inputs["Geometry"])
+    return group
+
+def _set_parameters(modifier, group, overrides=None):
+    values = {name: float(getattr(cfg, name)) for name in PARAMETERS}
+    values.update(overrides or {})
+    if hasattr(group, "interface"):
+        sockets = [item for item in group.interface.items_tree
+                   if item.item_type == 'SOCKET' and item.in_out == 'INPUT']
+    else:
+        sockets = list(group.inputs)
+    for socket in sockets:
+        if socket.name in values:
+            modifier[socket.identifier] = values[socket.name]
+
+def evaluate_fields(terrain_obj, overrides=None):
+    """Evaluate the deform group on terrain_obj's grid.
+
+    Returns {shape key name or JITTER_ATTRIBUTE: (n, n) float32}. A temporary
+    object sharing the mesh carries the modifier, so the terrain's own
+    modifier stack (wireframe, displace) is not evaluated.
+    """
+    group = build_deform_group()
+    evaluator = bpy.data.objects.new("GNDeformEval", terrain_obj.data)
+    bpy.context.scene.collection.objects.link(evaluator)
+    try:
+        modifier = evaluator.modifiers.new("GNDeform", 'NODES')
+        modifier.node_group = group
+        _set_parameters(modifier, group, overrides)
+
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        depsgraph.update()
+        evaluated = evaluator.evaluated_get(depsgraph)
+        mesh = evaluated.to_mesh()
+        side = terrain_core.grid_side(len(mesh.vertices))
+        fields = {}
+        for name, attribute in list(STAGE_ATTRIBUTES.items()) + [(JITTER_ATTRIBUTE, JITTER_ATTRIBUTE)]:
+            values = np.empty(len(mesh.vertices), dtype=np.float32)
+            mesh.attributes[attribute].data.foreach_get("value", values)
+            fields[name] = values.reshape(side, side)
+        evaluated.to_mesh_clear()
+    finally:
+        bpy.data.objects.remove(evaluator, do_unlink=True)
+    return fields
+
+def realize_stages(terrain_obj, write_key):
+    """Evaluate once and hand each stage delta to write_key(key_name, delta) in order"""
+    start = time.perf_counter()
+    fields = evaluate_fields(terrain_obj)
+    for key_name in STAGE_ATTRIBUTES:
+        write_key(key_name, fields[key_name])
+    _jitter_fields[terrain_obj.as_pointer()] = fields[JITTER_ATTRIBUTE]
+    print(f"[GN Backend] Stages 1-4 evaluated and realized in {time.perf_counter() - start:.3f}s")
+    return fields
+
+def take_jitter_field(terrain_obj):
+    """Spatial jitter from the realize_stages pass on terrain_obj, evaluated only if there was none"""
+    field = _jitter_fields.pop(terrain_obj.as_pointer(), None)
+    if field is None or field.size != len(terrain_obj.data.vertices):
+        field = evaluate_fields(terrain_obj)[JITTER_ATTRIBUTE]
+    return field
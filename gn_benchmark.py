@@ -0,0 +1,110 @@
+"""Compare the Geometry Nodes deform backend with the Python path.
+
+    blender -b --factory-startup --python gn_benchmark.py -- --resolution 512 --repeat 3
+
+Times stages 1-4 realized into shape keys on both backends plus the spatial
+jitter field (per-vertex asymmetric_jitter vs. the node group), and reports
+the largest absolute difference of every stage delta.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+import bpy
+import numpy as np
+
+import config_para as cfg
+import create
+import generate_terrian as generate
+import gn_backend
+import key_stack
+import terrain_core
+
+BENCHMARK_COLLECTION = "DeformBenchmark"
+
+
+def _fresh_terrain(collection, size, resolution):
+    terrain = create.create_flat_terrain(size, resolution)
+    create.link_object_to_collection(collection, terrain)
+    return terrain
+
+def _stage_deltas(terrain):
+    side = terrain_core.grid_side(len(terrain.data.vertices))
+    stack = key_stack.get_stack(terrain)
+    return {name: stack.key_delta(name).reshape(side, side).copy() for name in gn_backend.STAGE_ATTRIBUTES}
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def run_benchmark(size=cfg.TERRAIN_SIZE, resolution=cfg.TERRAIN_RESOLUTION, repeat=3):
+    collection = create.ensure_collection(BENCHMARK_COLLECTION)
+    timings = {"python_stages": [], "gn_stages": [], "python_jitter": [], "gn_jitter": []}
+    errors = {}
+
+    for _ in range(repeat):
+        create.purge_collection_objects(collection)
+        python_terrain = _fresh_terrain(collection, size, resolution)
+        gn_terrain = _fresh_terrain(collection, size, resolution)
+
+        seconds, _ = _timed(lambda: [generate.deform_stage1_base(python_terrain),
+                                     generate.deform_stage2_mix(python_terrain),
+                                     generate.deform_stage3_height(python_terrain),
+                                     generate.deform_stage4_radial_decay(python_terrain)])
+        timings["python_stages"].append(seconds)
+        seconds, _ = _timed(generate.deform_stages_geometry_nodes, gn_terrain)
+        timings["gn_stages"].append(seconds)
+
+        x, y = generate.grid_coordinates(python_terrain)
+        xs, ys = np.broadcast_arrays(x, y)
+        seconds, _ = _timed(lambda: [terrain_core.asymmetric_jitter(a, b)
+                                     for a, b in zip(xs.ravel().tolist(), ys.ravel().tolist())])
+        timings["python_jitter"].append(seconds)
+        seconds, fields = _timed(gn_backend.evaluate_fields, gn_terrain, {"GN_JITTER_RANDOMNESS": 0.0})
+        timings["gn_jitter"].append(seconds)
+
+    python_deltas = _stage_deltas(python_terrain)
+    gn_deltas = _stage_deltas(gn_terrain)
+    for name in gn_backend.STAGE_ATTRIBUTES:
+        errors[name] = float(np.abs(python_deltas[name] - gn_deltas[name]).max())
+    reference_jitter = terrain_core.spatial_jitter_field(x, y, randomness=0.0)
+    errors["spatial_jitter"] = float(np.abs(reference_jitter - fields[gn_backend.JITTER_ATTRIBUTE]).max())
+
+    create.purge_collection_objects(collection)
+    bpy.data.collections.remove(collection)
+
+    report = {
+        "resolution": resolution,
+        "vertices": (resolution + 1) ** 2,
+        "best_seconds": {name: min(values) for name, values in timings.items()},
+        "max_abs_error": errors,
+    }
+    best = report["best_seconds"]
+    print(f"[GN Benchmark] {report['vertices']} vertices, best of {repeat}")
+    print(f"  stages 1-4: python {best['python_stages']:.3f}s  geometry nodes {best['gn_stages']:.3f}s")
+    print(f"  spatial jitter: python {best['python_jitter']:.3f}s  geometry nodes {best['gn_jitter']:.3f}s")
+    for name, error in errors.items():
+        print(f"  max |python - gn| {name}: {error:.2e}")
+    return report
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Geometry Nodes vs Python deform benchmark")
+    parser.add_argument("--size", type=float, default=cfg.TERRAIN_SIZE)
+    parser.add_argument("--resolution", type=int, default=cfg.TERRAIN_RESOLUTION)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.size, args.resolution, args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
@@ -0,0 +1,88 @@
+import numpy as np
+
+# CPU bakes straight from a heights[j, i] grid (row 0 = lowest y, which is
+# also the bottom row of a Blender image). All maps are float32 in 0-1.
+
+# Integer texel steps for the horizon sweeps: axes and diagonals
+SWEEP_DIRECTIONS = [(0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)]
+
+
+def _shifted(field, dj, di):
+    """Slices (target, source) so target[p] pairs with field[p + (dj, di)]"""
+    rows, cols = field.shape
+    tj = slice(max(0, -dj), rows - max(0, dj))
+    ti = slice(max(0, -di), cols - max(0, di))
+    sj = slice(max(0, dj), rows - max(0, -dj))
+    si = slice(max(0, di), cols - max(0, -di))
+    return (tj, ti), (sj, si)
+
+def normal_map(heights, cell):
+    """Object-space normals from central differences, packed as RGB = n * 0.5 + 0.5"""
+    dz_dy, dz_dx = np.gradient(heights.astype(np.float32), cell)
+    normals = np.empty(heights.shape + (3,), dtype=np.float32)
+    normals[..., 0] = -dz_dx
+    normals[..., 1] = -dz_dy
+    normals[..., 2] = 1.0
+    normals /= np.linalg.norm(normals, axis=-1, keepdims=True)
+    normals *= 0.5
+    normals += 0.5
+    return normals
+
+def curvature_map(heights, cell, strength=1.0):
+    """Laplacian curvature mapped around 0.5 (convex > 0.5, concave < 0.5)"""
+    h = heights.astype(np.float32)
+    padded = np.pad(h, 1, mode="edge")
+    laplacian = (padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:] - 4 * h)
+    laplacian /= cell * cell
+    scale = np.percentile(np.abs(laplacian), 99) + 1e-6
+    return np.clip(0.5 - 0.5 * strength * laplacian / scale, 0.0, 1.0).astype(np.float32)
+
+def horizon_ao_map(heights, cell, max_distance=64, directions=SWEEP_DIRECTIONS):
+    """Horizon-based ambient occlusion from whole-grid sweeps per direction.
+
+    For each direction the horizon tangent is the max of (h(p + k*d) - h(p)) / dist
+    over k = 1, 2, 4, ... max_distance texels, computed as shifted-slice passes
+    over the whole grid. AO is 1 - mean(sin(horizon angle)).
+    """
+    h = heights.astype(np.float32)
+    occlusion = np.zeros_like(h)
+    best = np.empty_like(h)
+    diff = np.empty_like(h)
+    steps = [1 << k for k in range(int(np.log2(max(max_distance, 1))) + 1)]
+
+    for dj, di in directions:
+        best.fill(0.0)
+        step_length = cell * float(np.hypot(dj, di))
+        for k in steps:
+            target, source = _shifted(h, dj * k, di * k)
+            out = diff[target]
+            np.subtract(h[source], h[target], out=out)
+            out *= 1.0 / (k * step_length)
+            np.maximum(best[target], out, out=best[target])
+        # sin(atan(t)) = t / sqrt(1 + t^2)
+        np.multiply(best, best, out=diff)
+        diff += 1.0
+        np.sqrt(diff, out=diff)
+        np.divide(best, diff, out=diff)
+        occlusion += diff
+
+    occlusion /= len(directions)
+    return np.clip(1.0 - occlusion, 0.0, 1.0)
+
+def bake_maps(heights, cell, ao_distance=64):
+    """Normal, ambient occlusion and curvature maps for one heightfield"""
+    return {
+        "normal": normal_map(heights, cell),
+        "ao": horizon_ao_map(heights, cell, ao_distance),
+        "curvature": curvature_map(heights, cell),
+    }
+
+def to_rgba(values):
+    """Flat RGBA float32 pixels for Image.pixels.foreach_set"""
+    rows, cols = values.shape[:2]
+    rgba = np.ones((rows, cols, 4), dtype=np.float32)
+    if values.ndim == 2:
+        rgba[..., :3] = values[..., np.newaxis]
+    else:
+        rgba[..., :values.shape[2]] = values
+    return rgba.ravel()
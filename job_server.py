@@ -0,0 +1,250 @@
+"""Local job server keeping a pool of warm terrain workers.
+
+POST /jobs            {"params": {...config overrides}, "seed": 1} -> {"id", "status"}
+POST /jobs?wait=1     same, but blocks until the job is finished
+GET  /jobs/<id>       status, output paths and timings of one job
+GET  /status          workers and queue length
+
+    python job_server.py --workers 4            # background Blender workers
+    python job_server.py --workers 2 --fake     # NumPy-core workers, no Blender
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import argparse
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import config_para as cfg
+from terrain_worker import READY_MARKER, RESULT_MARKER
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "terrain_worker.py")
+
+
+def blender_worker_command(blender=cfg.BLENDER_EXECUTABLE):
+    return [blender, "-b", "--factory-startup", "--python", WORKER_SCRIPT, "--"]
+
+def fake_worker_command():
+    """Plain-Python worker that only runs the NumPy core"""
+    return [sys.executable, WORKER_SCRIPT, "--numpy-only"]
+
+
+class WorkerProcess:
+    """One warm worker process speaking the terrain_worker line protocol"""
+
+    def __init__(self, name, command):
+        self.name = name
+        self.command = command
+        self.process = None
+        self.jobs_done = 0
+
+    def start(self):
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, text=True, bufsize=1)
+        self._read_until(lambda line: line.startswith(READY_MARKER))
+        print(f"[JobServer] {self.name} ready (pid {self.process.pid})")
+
+    def _read_until(self, match):
+        for line in self.process.stdout:
+            line = line.rstrip("\n")
+            if match(line):
+                return line
+        raise RuntimeError(f"{self.name} exited with code {self.process.wait()}")
+
+    def run(self, job):
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+        self.process.stdin.write(json.dumps(job) + "\n")
+        self.process.stdin.flush()
+        line = self._read_until(lambda line: line.startswith(RESULT_MARKER))
+        self.jobs_done += 1
+        return json.loads(line[len(RESULT_MARKER):])
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class JobServer:
+    """FIFO queue of terrain jobs scheduled onto whichever worker is free"""
+
+    def __init__(self, worker_command, worker_count=cfg.JOB_WORKERS, output_dir=cfg.JOB_OUTPUT_DIR,
+                 retries=1):
+        self.output_dir = os.path.abspath(output_dir)
+        self.retries = retries
+        self.queue = queue.Queue()
+        self.jobs = {}
+        self.done_events = {}
+        self.lock = threading.Lock()
+        self.workers = [WorkerProcess(f"worker-{i}", worker_command) for i in range(worker_count)]
+        self.threads = []
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+            thread = threading.Thread(target=self._dispatch, args=(worker,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        for _ in self.workers:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join(timeout=30)
+        for worker in self.workers:
+            worker.stop()
+
+    def submit(self, payload):
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "params": payload.get("params", {}),
+            "seed": payload.get("seed"),
+            "status": "queued",
+            "submitted": time.time(),
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+            self.done_events[job_id] = threading.Event()
+        self.queue.put(job_id)
+        return job_id
+
+    def wait(self, job_id, timeout=None):
+        self.done_events[job_id].wait(timeout)
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def status(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "queued": self.queue.qsize(),
+            "jobs": counts,
+            "workers": [{"name": w.name, "jobs_done": w.jobs_done,
+                         "alive": w.process is not None and w.process.poll() is None}
+                        for w in self.workers],
+        }
+
+    def _dispatch(self, worker):
+        while True:
+            job_id = self.queue.get()
+            if job_id is None:
+                return
+            with self.lock:
+                job = self.jobs[job_id]
+                job["status"] = "running"
+                job["worker"] = worker.name
+                job["started"] = time.time()
+            request = {"id": job_id, "params": job["params"], "seed": job["seed"],
+                       "output_dir": self.output_dir}
+
+            result = {"ok": False, "error": f"{worker.name} did not return a result"}
+            try:
+                for attempt in range(self.retries + 1):
+                    try:
+                        result = worker.run(request)
+                        break
+                    except (RuntimeError, OSError) as error:
+                        # Worker died mid-job; run() restarts it on the next attempt
+                        result = {"ok": False, "error": f"{worker.name} crashed: {error}"}
+                if not isinstance(result, dict):
+                    raise ValueError(f"{worker.name} returned {type(result).__name__}, expected an object")
+            except Exception as error:
+                # E.g. a truncated result line: fail this job, restart the worker, keep the slot
+                result = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+                try:
+                    worker.stop()
+                except OSError:
+                    pass
+            finally:
+                finished = time.time()
+                with self.lock:
+                    job["status"] = "done" if result.get("ok") else "failed"
+                    job["outputs"] = result.get("outputs", {})
+                    job["error"] = result.get("error")
+                    job["timings"] = dict(result.get("timings", {}),
+                                          queue_wait=job["started"] - job["submitted"],
+                                          total=finished - job["submitted"])
+                self.done_events[job_id].set()
+
+
+def make_handler(server):
+    class JobRequestHandler(BaseHTTPRequestHandler):
+        def _send(self, code, body):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/jobs":
+                return self._send(404, {"error": "not found"})
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError as error:
+                return self._send(400, {"error": f"invalid JSON: {error}"})
+            job_id = server.submit(payload)
+            if parse_qs(url.query).get("wait", ["0"])[0] not in ("0", ""):
+                return self._send(200, server.wait(job_id))
+            self._send(202, {"id": job_id, "status": "queued"})
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/status":
+                return self._send(200, server.status())
+            if path.startswith("/jobs/"):
+                job = server.get(path[len("/jobs/"):])
+                if job is None:
+                    return self._send(404, {"error": "unknown job"})
+                return self._send(200, job)
+            self._send(404, {"error": "not found"})
+
+        def log_message(self, format, *args):
+            print(f"[JobServer] {self.address_string()} {format % args}")
+
+    return JobRequestHandler
+
+def serve(server, host=cfg.JOB_SERVER_HOST, port=cfg.JOB_SERVER_PORT):
+    httpd = ThreadingHTTPServer((host, port), make_handler(server))
+    print(f"[JobServer] Listening on http://{host}:{port} with {len(server.workers)} worker(s)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Terrain job server with warm workers")
+    parser.add_argument("--workers", type=int, default=cfg.JOB_WORKERS)
+    parser.add_argument("--port", type=int, default=cfg.JOB_SERVER_PORT)
+    parser.add_argument("--output-dir", default=cfg.JOB_OUTPUT_DIR)
+    parser.add_argument("--blender", default=cfg.BLENDER_EXECUTABLE)
+    parser.add_argument("--fake", action="store_true", help="NumPy-only workers, no Blender")
+    args = parser.parse_args()
+
+    command = fake_worker_command() if args.fake else blender_worker_command(args.blender)
+    job_server = JobServer(command, args.workers, args.output_dir)
+    job_server.start()
+    serve(job_server, port=args.port)
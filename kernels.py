@@ -0,0 +1,205 @@
+import os
+import heapq
+
+import numpy as np
+
+import config_para as cfg
+import hydrology
+
+# Kernel backends for the loops that do not vectorize cleanly: depression
+# filling, flow accumulation and iterated smoothing. "numba" compiles the
+# loops below (parallel over rows where cells are independent, cached on
+# disk so a Blender launch does not pay the JIT cost again); "numpy" runs the
+# reference implementations in hydrology. TERRAIN_BACKEND "auto" picks numba
+# when it can be imported. Smoothing is dispatched by terrain_core.smooth_delta,
+# which owns the NumPy reference and calls smooth() here for numba.
+
+if cfg.KERNEL_CACHE_DIR:
+    # Must be set before numba is imported
+    os.environ.setdefault("NUMBA_CACHE_DIR", os.path.abspath(os.path.expanduser(cfg.KERNEL_CACHE_DIR)))
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKENDS = ("auto", "numba", "numpy")
+
+_compiled = {}
+_warned = set()
+
+
+def active_backend(choice=None):
+    """Resolve TERRAIN_BACKEND (or choice) to "numba" or "numpy" """
+    choice = cfg.TERRAIN_BACKEND if choice is None else choice
+    if choice not in BACKENDS:
+        raise ValueError(f"Unknown TERRAIN_BACKEND '{choice}', expected one of {BACKENDS}")
+    if choice == "numpy":
+        return "numpy"
+    if numba is None:
+        if choice == "numba" and "numba" not in _warned:
+            _warned.add("numba")
+            print("[Kernels] numba is not installed, falling back to NumPy")
+        return "numpy"
+    return "numba"
+
+def _kernel(function, parallel=False):
+    """numba-compiled version of a loop kernel, compiled once per process"""
+    kernel = _compiled.get(function.__name__)
+    if kernel is None:
+        kernel = numba.njit(cache=cfg.KERNEL_CACHE, parallel=parallel, fastmath=False)(function)
+        _compiled[function.__name__] = kernel
+    return kernel
+
+
+# loop kernels (plain Python source, compiled by numba)
+
+def _priority_flood_loop(filled, closed, seeds, offsets, epsilon):
+    heap = [(0.0, np.int64(0))]
+    heap.pop()
+    for index in seeds:
+        closed[index] = True
+        heap.append((filled[index], index))
+    heapq.heapify(heap)
+
+    pit = np.empty(len(filled), dtype=np.int64)
+    head = 0
+    tail = 0
+    while len(heap) > 0 or head < tail:
+        if head < tail:
+            cell = pit[head]
+            head += 1
+        else:
+            cell = heapq.heappop(heap)[1]
+        spill = filled[cell] + epsilon
+        for offset in offsets:
+            neighbor = cell + offset
+            if closed[neighbor]:
+                continue
+            closed[neighbor] = True
+            if filled[neighbor] <= spill:
+                filled[neighbor] = spill
+                pit[tail] = neighbor
+                tail += 1
+            else:
+                heapq.heappush(heap, (filled[neighbor], neighbor))
+
+def _flow_accumulation_loop(receivers, fractions, accumulation):
+    count = receivers.shape[0]
+    indegree = np.zeros(count, dtype=np.int64)
+    for cell in range(count):
+        for k in range(receivers.shape[1]):
+            if receivers[cell, k] >= 0:
+                indegree[receivers[cell, k]] += 1
+
+    queue = np.empty(count, dtype=np.int64)
+    tail = 0
+    for cell in range(count):
+        if indegree[cell] == 0:
+            queue[tail] = cell
+            tail += 1
+    head = 0
+    while head < tail:
+        cell = queue[head]
+        head += 1
+        for k in range(receivers.shape[1]):
+            target = receivers[cell, k]
+            if target < 0:
+                continue
+            accumulation[target] += fractions[cell, k] * accumulation[cell]
+            indegree[target] -= 1
+            if indegree[target] == 0:
+                queue[tail] = target
+                tail += 1
+
+def _smooth_loop(heights, slope_values, factor, exponent, iterations, periodic, out):
+    rows, cols = heights.shape
+    current = heights.astype(np.float64)
+    following = np.empty_like(current)
+    for _ in range(iterations):
+        if periodic:
+            # Torus over the unique (rows-1, cols-1) vertices; the border row/column repeats the first
+            for j in numba.prange(rows - 1):
+                for i in range(cols - 1):
+                    total = (current[j, (i - 1) % (cols - 1)] + current[j, (i + 1) % (cols - 1)]
+                             + current[(j - 1) % (rows - 1), i] + current[(j + 1) % (rows - 1), i])
+                    weight = factor * (1.0 - slope_values[j, i] ** exponent)
+                    following[j, i] = current[j, i] + (total / 4.0 - current[j, i]) * weight
+            following[rows - 1, :] = following[0, :]
+            following[:, cols - 1] = following[:, 0]
+            current, following = following, current
+            continue
+        for j in numba.prange(rows):
+            for i in range(cols):
+                total = 0.0
+                count = 0
+                if i > 0:
+                    total += current[j, i - 1]
+                    count += 1
+                if i < cols - 1:
+                    total += current[j, i + 1]
+                    count += 1
+                if j > 0:
+                    total += current[j - 1, i]
+                    count += 1
+                if j < rows - 1:
+                    total += current[j + 1, i]
+                    count += 1
+                weight = factor * (1.0 - slope_values[j, i] ** exponent)
+                following[j, i] = current[j, i] + (total / count - current[j, i]) * weight
+        current, following = following, current
+    for j in numba.prange(rows):
+        for i in range(cols):
+            out[j, i] = current[j, i] - heights[j, i]
+
+
+# public kernels
+
+def priority_flood(heights, epsilon=0.0, backend=None):
+    """hydrology.priority_flood on the selected backend"""
+    if active_backend(backend) == "numpy":
+        return hydrology.priority_flood(heights, epsilon)
+
+    rows, cols = heights.shape
+    width = cols + 2
+    filled = np.zeros((rows + 2, width), dtype=np.float64)
+    filled[1:-1, 1:-1] = heights
+    closed = np.ones((rows + 2, width), dtype=np.bool_)
+    closed[1:-1, 1:-1] = False
+    border = np.zeros((rows, cols), dtype=bool)
+    border[[0, -1], :] = True
+    border[:, [0, -1]] = True
+    j, i = np.nonzero(border)
+    seeds = ((j + 1) * width + (i + 1)).astype(np.int64)
+    offsets = np.array([dj * width + di for dj, di in hydrology.NEIGHBORS_8], dtype=np.int64)
+
+    _kernel(_priority_flood_loop)(filled.ravel(), closed.ravel(), seeds, offsets, float(epsilon))
+    return filled[1:-1, 1:-1]
+
+def flow_accumulation(receivers, fractions, weights=None, backend=None):
+    """hydrology.flow_accumulation on the selected backend"""
+    if active_backend(backend) == "numpy":
+        return hydrology.flow_accumulation(receivers, fractions, weights)
+
+    accumulation = (np.ones(len(receivers)) if weights is None
+                    else np.asarray(weights, dtype=np.float64).copy())
+    _kernel(_flow_accumulation_loop)(np.ascontiguousarray(receivers, dtype=np.int64),
+                                     np.ascontiguousarray(fractions, dtype=np.float64), accumulation)
+    return accumulation
+
+def smooth(heights, slope_values, base_smoothing_factor, slope_exponent, iterations, periodic, out):
+    """Compounding smoothing passes compiled with numba; terrain_core.smooth_delta picks the backend"""
+    _kernel(_smooth_loop, parallel=True)(heights, slope_values, float(base_smoothing_factor),
+                                         float(slope_exponent), int(iterations), bool(periodic), out)
+    return out
+
+def warm_up(backend=None):
+    """Compile (or load from the disk cache) every kernel on a tiny grid"""
+    if active_backend(backend) != "numba":
+        return False
+    heights = np.random.default_rng(0).random((8, 8)).astype(np.float32)
+    filled = priority_flood(heights, 1e-5, backend="numba")
+    receivers, fractions = hydrology.flow_dinf(filled, 1.0)
+    flow_accumulation(receivers, fractions, backend="numba")
+    smooth(heights, heights, 0.5, 2, 2, False, np.empty_like(heights))
+    return True
@@ -0,0 +1,100 @@
+import numpy as np
+
+# One accumulator per live object, keyed by its RNA pointer
+_stacks = {}
+
+
+class ShapeKeyStack:
+    """Prefix sums of shape-key z values: cumulative height after each key.
+
+    Keys are read once with foreach_get. Like the rest of the pipeline the
+    stored key z is treated as the key's delta (Basis is the flat plane), so
+    prefix[k] = Basis.z + key1.z + ... + keyk.z.
+    """
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.vert_count = len(obj.data.vertices)
+        self.names = []
+        self.key_z = []
+        self.prefix = []
+        self._ranges = {}
+        self._buffer = np.empty(self.vert_count * 3, dtype=np.float32)
+        self.sync()
+
+    def _read(self, key_block):
+        key_block.data.foreach_get("co", self._buffer)
+        return self._buffer[2::3].copy()
+
+    def _recompute_from(self, index):
+        """Rebuild prefix sums from index onward; earlier entries stay valid"""
+        del self.prefix[index:]
+        for k in range(index, len(self.key_z)):
+            self.prefix.append(self.key_z[k] if k == 0 else self.prefix[k - 1] + self.key_z[k])
+        for k in [k for k in self._ranges if k >= index]:
+            del self._ranges[k]
+
+    def sync(self):
+        """Pick up keys added since the last read (new keys go at the end)"""
+        shape_keys = self.obj.data.shape_keys
+        if shape_keys is None:
+            return self
+        key_blocks = shape_keys.key_blocks
+        first_new = len(self.names)
+        if [kb.name for kb in key_blocks[:first_new]] != self.names:
+            # Keys were removed, renamed or reordered: start over
+            self.names, self.key_z, first_new = [], [], 0
+        for key_block in key_blocks[first_new:]:
+            self.names.append(key_block.name)
+            self.key_z.append(self._read(key_block))
+        self._recompute_from(first_new)
+        return self
+
+    def refresh(self, key_name, z_values=None):
+        """Re-read one key (or take its new z values) and invalidate the suffix"""
+        known = len(self.names)
+        self.sync()
+        index = self.names.index(key_name)
+        if z_values is None:
+            if index >= known:
+                return  # just read by sync()
+            self.key_z[index] = self._read(self.obj.data.shape_keys.key_blocks[key_name])
+        else:
+            self.key_z[index] = np.array(z_values, dtype=np.float32).ravel()
+        self._recompute_from(index)
+
+    def height_after(self, key_name=None):
+        """Cumulative height after key_name (latest key if None); read-only view"""
+        self.sync()
+        index = len(self.names) - 1 if key_name is None else self.names.index(key_name)
+        heights = self.prefix[index]
+        heights.flags.writeable = False
+        return heights
+
+    def range_after(self, key_name=None):
+        """(z_min, z_max) after key_name, cached until an earlier key changes"""
+        self.sync()
+        index = len(self.names) - 1 if key_name is None else self.names.index(key_name)
+        if index not in self._ranges:
+            heights = self.prefix[index]
+            self._ranges[index] = (float(heights.min()), float(heights.max()))
+        return self._ranges[index]
+
+    def key_delta(self, key_name):
+        """z values stored in a single key"""
+        self.sync()
+        return self.key_z[self.names.index(key_name)]
+
+
+def get_stack(obj) -> ShapeKeyStack:
+    """Shared accumulator for obj, synced with any keys added since last use"""
+    pointer = obj.as_pointer()
+    stack = _stacks.get(pointer)
+    if stack is None or stack.vert_count != len(obj.data.vertices):
+        stack = ShapeKeyStack(obj)
+        _stacks[pointer] = stack
+    return stack.sync()
+
+def release_stacks():
+    """Forget all accumulators, e.g. before the objects they read are removed"""
+    _stacks.clear()
@@ -0,0 +1,43 @@
+import math
+
+import config_para as cfg
+import animation
+import create
+import key_stack
+import terrain_core
+import terrain_index
+import generate_terrian as generate
+
+
+def place_landing_pad(terrain_obj, collection, pad_size=cfg.LANDING_PAD_SIZE, margin=cfg.LANDING_PAD_MARGIN):
+    """Find the flattest pad-sized window, level it in a new shape key and put LandingPad on it"""
+    stack = key_stack.get_stack(terrain_obj)
+    side = terrain_core.grid_side(len(terrain_obj.data.vertices))
+    heights = stack.height_after().reshape(side, side)
+
+    x, y = generate.grid_coordinates(terrain_obj)
+    cell = float(x[0, 1] - x[0, 0])
+    window = min(max(2, math.ceil(pad_size / cell) + 1), side)
+
+    index = terrain_index.TerrainIndex(heights)
+    row, col, target, score = index.flattest_window(window, window)
+    print(f"[LandingPad] Flattest {window}x{window} window at ({row}, {col}), "
+          f"mean height {target:.3f}, score {score:.4f}")
+
+    # Level the window smoothly into its own key
+    key_name = animation.add_shape_key(terrain_obj, cfg.FLATTEN_LANDING_PAD)
+    key_block = terrain_obj.data.shape_keys.key_blocks[key_name]
+    delta = terrain_index.flatten_delta(heights, row, col, row + window, col + window, target, margin)
+    generate.write_key_z(key_block, delta)
+    stack.refresh(key_name, delta.ravel())
+    terrain_obj.data.update()
+
+    center_x = 0.5 * float(x[0, col] + x[0, col + window - 1])
+    center_y = 0.5 * float(y[row, 0] + y[row + window - 1, 0])
+    center = (center_x, center_y, target + 0.5 * cfg.LANDING_PAD_THICKNESS)
+    pad_obj = create.create_landing_pad(center, float(x[0, col + window - 1] - x[0, col]))
+    create.link_object_to_collection(collection, pad_obj)
+    create.add_material_color(pad_obj, (0.35, 0.35, 0.38))  # Concrete grey
+
+    print(f"[LandingPad] {pad_obj.name} placed at ({center_x:.2f}, {center_y:.2f}, {center[2]:.2f})")
+    return pad_obj
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 
 import bpy
 import importlib
@@ -20,6 +21,14 @@ import modifier
 import render_color as render
 import animation
 import config_para as cfg
+import datablocks
+import point_cache
+import memory_budget
+import landing_pad
+import scatter
+import terrain_core
+import progressive as progressive_preview
+import gltf_morph_export
 
 # check module paths
 # print("create module path:", create.__file__)
@@ -37,54 +46,130 @@ importlib.reload(modifier)
 importlib.reload(animation)
 importlib.reload(render)
 importlib.reload(cfg)
+importlib.reload(datablocks)
+importlib.reload(point_cache)
+importlib.reload(memory_budget)
+importlib.reload(landing_pad)
+importlib.reload(scatter)
+importlib.reload(terrain_core)
+importlib.reload(progressive_preview)
+importlib.reload(gltf_morph_export)
 
 # check main
 print("__name__:", __name__)
 
-def main():
+def _finish_preview(session):
+    """Last preview level is on screen: replace it with the full pipeline.
+
+    Runs in its own timer step after the last level, but the full build is
+    not split into steps, so the UI is blocked until it is done.
+    """
+    if cfg.PROGRESSIVE_FINALIZE:
+        session.remove_preview()
+        main(progressive=False)
+
+def main(progressive=None, deltas=None):
+    """Build the terrain scene; deltas ({key: heights}, e.g. terrain_core.stage_deltas)
+    replace the deform, jitter and smoothing stages when given"""
+
+    if progressive is None:
+        progressive = cfg.PROGRESSIVE_PREVIEW
+    if progressive:
+        # Coarse-to-fine previews from a timer; the full build runs after the last level
+        progressive_preview.start_preview(on_finished=_finish_preview)
+        return
 
     print("Starting terrain generation...")
+    run_started = time.perf_counter()
+    memory_budget.begin_run()
 
     collection = create.ensure_collection(cfg.COLLECTION_NAME)
     create.purge_collection_objects(collection)
 
-    terrain = create.create_flat_terrain()
+    terrain = create.create_flat_terrain(cfg.TERRAIN_SIZE, cfg.TERRAIN_RESOLUTION)
 
     create.link_object_to_collection(collection, terrain)
 
      # Add colors and wireframe
     create.add_material_color(terrain, (0.1, 0.6, 0.1))  # Green terrain
-    create.add_wireframe_modifier(terrain, wireframe_thickness=0.02) # Wireframe for terrain
+    if cfg.WIREFRAME_MODE == "modifier":
+        create.add_wireframe_modifier(terrain, wireframe_thickness=cfg.WIREFRAME_THICKNESS) # Wireframe for terrain
 
     print("Plane created")
     print(f"Terrain: {terrain.name} (size=±{cfg.TERRAIN_SIZE}, resolution={cfg.TERRAIN_RESOLUTION})")
 
-    # Deform terrain
-    generate.deform_orchestrator(terrain)
-    print("Terrain deformed")
-
-    # add noise
-    # Apply disturbances
-    generate.apply_smart_jitter(terrain)
-    generate.smooth_height_by_slope(terrain)
+    if deltas is not None:
+        # Precomputed stage deltas (batch_pipeline): only write them into shape keys
+        generate.load_stage_deltas(terrain, deltas)
+    else:
+        # Deform terrain
+        generate.deform_orchestrator(terrain)
+        print("Terrain deformed")
+
+        # add noise
+        # Apply disturbances
+        generate.apply_smart_jitter(terrain)
+        generate.smooth_height_by_slope(terrain)
+
+    shape_key_order = terrain_core.key_order()
+    if cfg.RIVERS_ENABLED:
+        generate.carve_rivers(terrain)
+        shape_key_order.insert(shape_key_order.index(cfg.SMOOTH_TERRAIN) + 1, cfg.RIVER_CARVE)
     bpy.context.view_layer.update()
    # print("Terrain generation and disturbance overlay successful")
 
     # Modify terrain with modifiers
     modifier.modify_terrain(terrain)
 
+    if cfg.PLACE_LANDING_PAD:
+        landing_pad.place_landing_pad(terrain, collection)
+        shape_key_order.append(cfg.FLATTEN_LANDING_PAD)
+
+    if cfg.SCATTER_ENABLED:
+        scatter.scatter_all(terrain, collection)
+
     context = render.render_terrain_color(terrain)
     mix_node = render.setup_mixshader_fade(context["tree"], context["bsdf"], context["output"])
+    if cfg.WIREFRAME_MODE == "shader":
+        render.add_shader_wireframe(context["tree"], context["output"], terrain)
 
     stage_length = 30
     fade_length = 20
-    animation.animate_shape_keys(terrain, cfg.SHAPE_KEY_ORDER, start_frame=1, stage_length=stage_length, fade=fade_length)
-    fade_start = len(cfg.SHAPE_KEY_ORDER) * stage_length + 10
+    fade_start = len(shape_key_order) * stage_length + 10
     fade_end = fade_start + fade_length * 2
-    animation.animate_color_material_fade(mix_node, fade_start, fade_end)
+    if cfg.ANIMATION_BULK:
+        animation.animate_shape_keys_bulk(terrain, shape_key_order, start_frame=1, stage_length=stage_length,
+                                          fade=fade_length)
+        animation.animate_color_material_fade_bulk(mix_node, fade_start, fade_end)
+    else:
+        animation.animate_shape_keys(terrain, shape_key_order, start_frame=1, stage_length=stage_length,
+                                     fade=fade_length)
+        animation.animate_color_material_fade(mix_node, fade_start, fade_end)
     bpy.context.scene.frame_end = fade_end + 100
 
+    if cfg.GLTF_EXPORT_PATH:
+        gltf_morph_export.export_morph_gltf(terrain, shape_key_order, cfg.GLTF_EXPORT_PATH)
+
+    if cfg.ANIMATION_CACHE:
+        cache_path = point_cache.build_point_cache(terrain, shape_key_order,
+                                                   bpy.context.scene.frame_start, bpy.context.scene.frame_end)
+        point_cache.attach_point_cache(terrain, cache_path)
+
+    if cfg.PERIODIC and cfg.TILE_COLUMNS * cfg.TILE_ROWS > 1:
+        create.tile_linked_duplicates(terrain, cfg.TILE_COLUMNS, cfg.TILE_ROWS,
+                                      terrain_core.tile_period(cfg.TERRAIN_SIZE), collection)
+
+    if cfg.STAGE_TRACE:
+        import stage_trace
+        stage_trace.trace_object(terrain, shape_key_order, run_seconds=time.perf_counter() - run_started)
+
+    # Drop materials/textures/actions left behind by previous runs
+    datablocks.purge_orphans()
+    datablocks.report_usage()
+    memory_budget.end_run()
+
     print("Terrain setup complete!")
 
-# explicitly call main function
-main()
\ No newline at end of file
+# explicitly call main function (skipped when imported by a worker)
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,75 @@
+import numpy as np
+
+import config_para as cfg
+import key_stack
+import terrain_core
+
+# Mask name -> (vertex group, point attribute)
+MASK_TARGETS = {
+    "peak": ("PeakMask", "mask_peak"),
+    "snow": ("SnowMask", "mask_snow"),
+    "rock": ("RockMask", "mask_rock"),
+    "lowland": ("LowlandMask", "mask_lowland"),
+}
+
+
+# helpers
+
+def smoothstep(values, low, high):
+    t = np.clip((values - low) / max(high - low, 1e-6), 0.0, 1.0)
+    return t * t * (3.0 - 2.0 * t)
+
+def compute_masks(heights):
+    """Peak, snow, rock and lowland masks from one height/slope pass over the grid"""
+    height_norm = terrain_core.normalize(heights)
+    slope_values = terrain_core.slope(heights)
+
+    rock = smoothstep(slope_values, *cfg.MASK_ROCK_SLOPE)
+    gentle = 1.0 - smoothstep(slope_values, *cfg.MASK_SNOW_MAX_SLOPE)
+    peak = smoothstep(height_norm, *cfg.MASK_PEAK_HEIGHT)
+    masks = {
+        "peak": cfg.MASK_PEAK_FLOOR + (1.0 - cfg.MASK_PEAK_FLOOR) * peak,
+        "snow": smoothstep(height_norm, *cfg.MASK_SNOW_HEIGHT) * gentle,
+        "rock": rock,
+        "lowland": ((1.0 - smoothstep(height_norm, *cfg.MASK_LOWLAND_HEIGHT))
+                    * (1.0 - smoothstep(slope_values, *cfg.MASK_LOWLAND_SLOPE))),
+    }
+    return {name: mask.astype(np.float32).ravel() for name, mask in masks.items()}
+
+def write_vertex_group(obj, name, weights, levels=cfg.MASK_WEIGHT_LEVELS):
+    """Bulk-assign weights: one vertex_group.add per quantized weight level"""
+    group = obj.vertex_groups.get(name)
+    if group is None:
+        group = obj.vertex_groups.new(name=name)
+    quantized = np.rint(np.clip(weights, 0.0, 1.0) * (levels - 1)).astype(np.int64)
+    order = np.argsort(quantized, kind="stable")
+    bounds = np.searchsorted(quantized[order], np.arange(levels + 1))
+    for level in range(1, levels):  # weight 0 == not in the group
+        indices = order[bounds[level]:bounds[level + 1]]
+        if len(indices):
+            group.add(indices.tolist(), level / (levels - 1), 'REPLACE')
+    return group
+
+def write_point_attribute(obj, name, values):
+    mesh = obj.data
+    attribute = mesh.attributes.get(name)
+    if attribute is None or attribute.data_type != 'FLOAT' or attribute.domain != 'POINT':
+        if attribute is not None:
+            mesh.attributes.remove(attribute)
+        attribute = mesh.attributes.new(name, 'FLOAT', 'POINT')
+    attribute.data.foreach_set("value", values)
+    return attribute
+
+
+def apply_terrain_masks(terrain_obj, after_key=None):
+    """Derive masks from accumulated shape-key heights and store them on the mesh"""
+    side = terrain_core.grid_side(len(terrain_obj.data.vertices))
+    heights = key_stack.get_stack(terrain_obj).height_after(after_key).reshape(side, side)
+    masks = compute_masks(heights)
+    for name, values in masks.items():
+        group_name, attribute_name = MASK_TARGETS[name]
+        write_vertex_group(terrain_obj, group_name, values)
+        write_point_attribute(terrain_obj, attribute_name, values)
+    print(f"[Masks] Wrote {', '.join(MASK_TARGETS[n][0] for n in masks)} from "
+          f"'{after_key or 'latest key'}' heights")
+    return masks
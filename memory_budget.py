@@ -0,0 +1,127 @@
+import sys
+import tracemalloc
+
+import numpy as np
+
+import config_para as cfg
+
+
+class BufferPool:
+    """Named, preallocated per-vertex buffers reused across stages.
+
+    get() hands back the same array for a name as long as shape and dtype
+    match, so slope/normalization/jitter scratch space is allocated once per
+    run. With a budget set, allocations that would exceed it raise MemoryError
+    before NumPy touches the memory.
+    """
+
+    def __init__(self, budget_bytes=None, dtype=np.float32):
+        self.budget_bytes = budget_bytes
+        self.dtype = np.dtype(dtype)
+        self.buffers = {}
+        self.live_bytes = 0
+        self.peak_bytes = 0
+        self.allocations = 0
+        self.reuses = 0
+
+    def get(self, name, shape, dtype=None):
+        dtype = self.dtype if dtype is None else np.dtype(dtype)
+        buffer = self.buffers.get(name)
+        if buffer is not None and buffer.shape == tuple(shape) and buffer.dtype == dtype:
+            self.reuses += 1
+            return buffer
+        self.release(name)
+
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if self.budget_bytes is not None and self.live_bytes + nbytes > self.budget_bytes:
+            raise MemoryError(
+                f"Buffer '{name}' needs {nbytes / 2**20:.1f} MiB, "
+                f"{self.live_bytes / 2**20:.1f} of {self.budget_bytes / 2**20:.1f} MiB already in use")
+        buffer = np.empty(shape, dtype=dtype)
+        self.buffers[name] = buffer
+        self.live_bytes += nbytes
+        self.peak_bytes = max(self.peak_bytes, self.live_bytes)
+        self.allocations += 1
+        return buffer
+
+    def release(self, name):
+        buffer = self.buffers.pop(name, None)
+        if buffer is not None:
+            self.live_bytes -= buffer.nbytes
+
+    def clear(self):
+        for name in list(self.buffers):
+            self.release(name)
+
+    def report(self):
+        """Print and return pool and process peak memory"""
+        stats = {
+            "pool_live_bytes": self.live_bytes,
+            "pool_peak_bytes": self.peak_bytes,
+            "allocations": self.allocations,
+            "reuses": self.reuses,
+            "traced_peak_bytes": tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None,
+            "process_peak_bytes": process_peak_bytes(),
+        }
+        line = (f"[Memory] pool peak {stats['pool_peak_bytes'] / 2**20:.1f} MiB "
+                f"({stats['allocations']} allocations, {stats['reuses']} reuses)")
+        if stats["traced_peak_bytes"] is not None:
+            line += f", traced peak {stats['traced_peak_bytes'] / 2**20:.1f} MiB"
+        if stats["process_peak_bytes"] is not None:
+            line += f", process peak {stats['process_peak_bytes'] / 2**20:.1f} MiB"
+        print(line)
+        return stats
+
+
+def process_peak_bytes():
+    """Peak resident set size of this process, if the platform reports it"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def estimate_run_bytes(resolution=cfg.TERRAIN_RESOLUTION, key_count=len(cfg.SHAPE_KEY_ORDER), itemsize=4):
+    """Rough NumPy-side footprint: key stack (key + prefix per key) plus pool scratch"""
+    vertex_count = (resolution + 1) ** 2
+    key_stack_bytes = 2 * key_count * vertex_count * itemsize
+    pool_bytes = 6 * vertex_count * itemsize + 3 * vertex_count * 4
+    return key_stack_bytes + pool_bytes
+
+
+_pool = None
+
+def get_pool() -> BufferPool:
+    """Shared pool for this run, budgeted when MEMORY_BUDGET_MODE is on"""
+    global _pool
+    if _pool is None:
+        budget = cfg.MEMORY_BUDGET_BYTES if cfg.MEMORY_BUDGET_MODE else None
+        _pool = BufferPool(budget_bytes=budget)
+    return _pool
+
+def begin_run():
+    """Reset the shared pool and start peak tracing in budget mode"""
+    global _pool
+    if _pool is not None:
+        _pool.clear()
+    _pool = None
+    pool = get_pool()
+    if cfg.MEMORY_BUDGET_MODE:
+        estimate = estimate_run_bytes()
+        print(f"[Memory] Budget mode: ~{estimate / 2**20:.1f} MiB estimated, "
+              f"{cfg.MEMORY_BUDGET_BYTES / 2**20:.1f} MiB budget")
+        if estimate > cfg.MEMORY_BUDGET_BYTES:
+            raise MemoryError("Estimated terrain buffers exceed MEMORY_BUDGET_BYTES")
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    return pool
+
+def end_run():
+    """Report peak memory and release the pool"""
+    stats = get_pool().report()
+    if cfg.MEMORY_BUDGET_MODE and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    get_pool().clear()
+    return stats
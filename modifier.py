@@ -1,6 +1,11 @@
 import bpy
+import numpy as np
+
 import config_para as cfg
 import animation
+import datablocks
+import mask_engine
+import terrain_core
 
 def modify_terrain(terrain_obj):
     bpy.context.view_layer.objects.active = terrain_obj
@@ -13,23 +18,17 @@ def modify_terrain(terrain_obj):
             terrain_obj.modifiers.remove(terrain_obj.modifiers[modifier_name])
   
     # Add displace modifier
-    # Create vertex group
-    vertex_group = terrain_obj.vertex_groups.new(name="PeakMask")
-
-    # Assign vertices to group based on height
-    height_threshold = 20.0
-    for vertex in terrain_obj.data.vertices:
-        if vertex.co.z > height_threshold:
-            vertex_group.add([vertex.index], 1.0, 'ADD')  # Full weight for high vertices
-        else:
-            vertex_group.add([vertex.index], 0.3, 'ADD')  # Low weight for low vertices
+    # Peak/snow/rock/lowland masks from the accumulated shape-key heights;
+    # the base mesh itself is still flat, so its vertex z cannot be used
+    mask_engine.apply_terrain_masks(terrain_obj)
+    vertex_group = terrain_obj.vertex_groups[mask_engine.MASK_TARGETS["peak"][0]]
 
     # Create displace modifier and assign vertex group
     displace_modifier = terrain_obj.modifiers.new("LocalDisplace", "DISPLACE")
     displace_modifier.vertex_group = vertex_group.name
 
     # Configure noise texture
-    cloud_texture = bpy.data.textures.new("PeakNoise", "CLOUDS")
+    cloud_texture = datablocks.get_texture("PeakNoise", "CLOUDS")
     cloud_texture.noise_scale = 1.2
     displace_modifier.texture = cloud_texture
     displace_modifier.strength = 2
@@ -48,6 +47,15 @@ def modify_terrain(terrain_obj):
     print(f"Baked modifiers into shape key: {new_key.name}")
     terrain_obj.modifiers.clear()
 
+    if cfg.PERIODIC:
+        # The cloud texture is not periodic; give the tile border one value so copies meet
+        co = np.empty(len(new_key.data) * 3, dtype=np.float32)
+        new_key.data.foreach_get("co", co)
+        side = terrain_core.grid_side(len(new_key.data))
+        z = co[2::3].reshape(side, side)
+        co[2::3] = terrain_core.wrap_edges(z).ravel()
+        new_key.data.foreach_set("co", co)
+
     terrain_obj.data.update()
     print("modify_terrain shape key complete:", new_key.name)
     # print("=== DEBUG: ALL SHAPE KEYS ===")
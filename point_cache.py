@@ -0,0 +1,262 @@
+import os
+import json
+import hashlib
+
+import bpy
+import numpy as np
+
+import config_para as cfg
+import animation
+import sparse_delta
+
+PLAYBACK_KEY = "CachedPlayback"
+
+
+# helpers
+
+def read_key_deltas(obj, shape_key_list):
+    """Read (key - Basis) offsets of every listed key in one foreach_get per key"""
+    key_blocks = obj.data.shape_keys.key_blocks
+    vert_count = len(obj.data.vertices)
+
+    basis = np.empty(vert_count * 3, dtype=np.float32)
+    key_blocks[cfg.BASIS].data.foreach_get("co", basis)
+
+    names = [name for name in shape_key_list if name != cfg.BASIS]
+    deltas = np.empty((len(names), vert_count, 3), dtype=np.float32)
+    buffer = np.empty(vert_count * 3, dtype=np.float32)
+    for k, name in enumerate(names):
+        key_blocks[name].data.foreach_get("co", buffer)
+        deltas[k] = (buffer - basis).reshape(-1, 3)
+    return names, basis.reshape(-1, 3), deltas
+
+def sample_key_weights(obj, names, frames):
+    """Evaluate the value F-curve of each key at the given frames"""
+    shape_keys = obj.data.shape_keys
+    fcurves = {fc.data_path: fc for fc in animation.action_fcurves(shape_keys)}
+
+    weights = np.empty((len(frames), len(names)), dtype=np.float32)
+    for k, name in enumerate(names):
+        fcurve = fcurves.get(f'key_blocks["{name}"].value')
+        if fcurve is None:
+            weights[:, k] = shape_keys.key_blocks[name].value
+            continue
+        weights[:, k] = [fcurve.evaluate(frame) for frame in frames]
+    return weights
+
+def estimate_cache_size(vertex_count, frame_count, dtype=cfg.CACHE_DTYPE, z_only=True):
+    """Bytes needed to store frame_count blended frames (before deduplication)"""
+    components = 1 if z_only else 3
+    return int(frame_count) * int(vertex_count) * components * np.dtype(dtype).itemsize
+
+def evict_caches(cache_dir, max_bytes=cfg.CACHE_MAX_BYTES, keep=()):
+    """Delete least recently used caches until the directory fits max_bytes"""
+    if not os.path.isdir(cache_dir):
+        return 0
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith((".npy", ".npz")):
+            continue
+        path = os.path.join(cache_dir, name)
+        stat = os.stat(path)
+        entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        os.remove(path)
+        meta_path = path[:-4] + ".json"
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        total -= size
+        evicted += 1
+    if evicted:
+        print(f"[PointCache] Evicted {evicted} cache(s), {total / 2**20:.1f} MiB left")
+    return evicted
+
+
+# cache build / playback
+
+def build_point_cache(obj, shape_key_list, frame_start, frame_end,
+                      cache_dir=cfg.CACHE_DIR, dtype=cfg.CACHE_DTYPE, frame_step=cfg.CACHE_FRAME_STEP,
+                      fmt=cfg.CACHE_FORMAT):
+    """Precompute playback data on disk.
+
+    "frames" stores blended vertex offsets per sampled frame in a memory-mapped
+    .npy; "sparse" stores each key once as a sparse delta (.npz) plus the key
+    weights per frame, and blends at playback.
+    """
+    cache_dir = bpy.path.abspath(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    names, basis, deltas = read_key_deltas(obj, shape_key_list)
+    frames = list(range(frame_start, frame_end + 1, frame_step))
+    if frames[-1] != frame_end:
+        frames.append(frame_end)
+    weights = sample_key_weights(obj, names, frames)
+
+    # Only z moves in every stage so far; fall back to xyz if that changes
+    z_only = bool(np.abs(deltas[:, :, :2]).max(initial=0.0) < 1e-6)
+
+    # Frames with identical key weights share one stored slot
+    slot_of = {}
+    frame_slots = []
+    for row in weights:
+        frame_slots.append(slot_of.setdefault(row.tobytes(), len(slot_of)))
+    unique_weights = np.empty((len(slot_of), len(names)), dtype=np.float32)
+    for row_bytes, slot in slot_of.items():
+        unique_weights[slot] = np.frombuffer(row_bytes, dtype=np.float32)
+
+    if fmt == "sparse" and not z_only:
+        print("[PointCache] Keys move x/y, sparse cache stores z only: using frames")
+        fmt = "frames"
+    if fmt not in ("frames", "sparse"):
+        raise ValueError(f"Unknown CACHE_FORMAT '{fmt}', expected 'frames' or 'sparse'")
+
+    digest = hashlib.sha1(deltas.tobytes())
+    digest.update(unique_weights.tobytes())
+    digest.update(f"{dtype}:{frame_step}:{frame_start}:{frame_end}".encode())
+    if fmt == "sparse":
+        digest.update(f"sparse:{cfg.SPARSE_EPSILON}:{cfg.SPARSE_QUANT_STEP}".encode())
+    cache_name = f"{obj.name}_{digest.hexdigest()[:12]}"
+    cache_path = os.path.join(cache_dir, cache_name + (".npz" if fmt == "sparse" else ".npy"))
+    meta_path = os.path.join(cache_dir, cache_name + ".json")
+    meta = {"frame_start": frame_start, "frame_end": frame_end,
+            "frame_step": frame_step, "frames": frames,
+            "frame_slots": frame_slots, "z_only": z_only, "format": fmt}
+
+    if fmt == "sparse":
+        return _build_sparse_cache(cache_path, meta_path, meta, names, deltas[:, :, 2], unique_weights)
+
+    estimate = estimate_cache_size(len(basis), len(slot_of), dtype, z_only)
+    print(f"[PointCache] {len(frames)} samples -> {len(slot_of)} unique frames, "
+          f"~{estimate / 2**20:.1f} MiB ({dtype})")
+
+    if not (os.path.exists(cache_path) and os.path.exists(meta_path)):
+        evict_caches(cache_dir, max(cfg.CACHE_MAX_BYTES - estimate, 0))
+        shape = (len(slot_of), len(basis)) if z_only else (len(slot_of), len(basis), 3)
+        cache = np.lib.format.open_memmap(cache_path, mode="w+", dtype=dtype, shape=shape)
+        flat_deltas = deltas[:, :, 2] if z_only else deltas.reshape(len(names), -1)
+        for slot, row in enumerate(unique_weights):
+            cache[slot] = (row @ flat_deltas).reshape(shape[1:])
+        cache.flush()
+        del cache
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+    else:
+        os.utime(cache_path)
+        print(f"[PointCache] Reusing {cache_path}")
+
+    return cache_path
+
+def _build_sparse_cache(cache_path, meta_path, meta, names, z_deltas, unique_weights):
+    """Sparse per-key deltas in an .npz; the slot weights go in the .json sidecar"""
+    if os.path.exists(cache_path) and os.path.exists(meta_path):
+        os.utime(cache_path)
+        print(f"[PointCache] Reusing {cache_path}")
+        return cache_path
+
+    sparse_map = sparse_delta.encode_keys(names, z_deltas)
+    stats = sparse_delta.report(sparse_map, z_deltas, label="PointCache")
+    dense_frames = estimate_cache_size(z_deltas.shape[1], len(unique_weights), cfg.CACHE_DTYPE)
+    print(f"[PointCache] Sparse keys {stats['total']['sparse_bytes'] / 2**20:.2f} MiB "
+          f"vs {dense_frames / 2**20:.2f} MiB of blended frames")
+
+    evict_caches(os.path.dirname(cache_path), max(cfg.CACHE_MAX_BYTES - stats["total"]["sparse_bytes"], 0))
+    sparse_delta.save(cache_path, sparse_map)
+    with open(meta_path, "w") as f:
+        json.dump(dict(meta, names=names, slot_weights=unique_weights.tolist(),
+                       max_abs_error=stats["total"]["max_abs_error"]), f)
+    return cache_path
+
+def _slot_offsets(state, slot):
+    if state["format"] == "sparse":
+        out = np.zeros(state["vertex_count"], dtype=np.float32)
+        for sparse, weight in zip(state["sparse"], state["slot_weights"][slot]):
+            if weight != 0.0:
+                sparse.add_to(out, weight)
+        return out
+    return state["cache"][slot].astype(np.float32)
+
+def _frame_offsets(state, frame):
+    """Blended offsets at frame, interpolating between sampled frames"""
+    frames = state["frames"]
+    slots = state["frame_slots"]
+
+    frame = min(max(frame, frames[0]), frames[-1])
+    i = min(int((frame - frames[0]) // state["frame_step"]), len(frames) - 1)
+    if i == len(frames) - 1 or frame == frames[i]:
+        return _slot_offsets(state, slots[i])
+    t = (frame - frames[i]) / (frames[i + 1] - frames[i])
+    a = _slot_offsets(state, slots[i])
+    b = _slot_offsets(state, slots[i + 1])
+    return a + (b - a) * t
+
+_playback = {}
+
+def _on_frame_change(scene, depsgraph=None):
+    for obj_name, state in _playback.items():
+        obj = scene.objects.get(obj_name)
+        if obj is None or obj.data.shape_keys is None:
+            continue
+        if PLAYBACK_KEY not in obj.data.shape_keys.key_blocks:
+            continue
+        offsets = _frame_offsets(state, scene.frame_current)
+        co = state["scratch"]
+        co[:] = state["basis"]
+        if state["z_only"]:
+            co[:, 2] += offsets
+        else:
+            co += offsets.reshape(-1, 3)
+        obj.data.shape_keys.key_blocks[PLAYBACK_KEY].data.foreach_set("co", co.ravel())
+        obj.data.update()
+
+def attach_point_cache(obj, cache_path):
+    """Drive obj from the cache: one playback key shown alone, updated per frame"""
+    with open(cache_path[:-4] + ".json") as f:
+        meta = json.load(f)
+
+    key_blocks = obj.data.shape_keys.key_blocks
+    basis = np.empty(len(obj.data.vertices) * 3, dtype=np.float32)
+    key_blocks[cfg.BASIS].data.foreach_get("co", basis)
+
+    if PLAYBACK_KEY not in key_blocks:
+        obj.shape_key_add(name=PLAYBACK_KEY, from_mix=False)
+    obj.active_shape_key_index = key_blocks.find(PLAYBACK_KEY)
+    key_blocks[PLAYBACK_KEY].value = 1.0
+    obj.show_only_shape_key = True
+
+    state = dict(meta, basis=basis.reshape(-1, 3),
+                 scratch=np.empty((len(basis) // 3, 3), dtype=np.float32))
+    state.setdefault("format", "frames")
+    if state["format"] == "sparse":
+        sparse_map, _ = sparse_delta.load(cache_path)
+        state.update(sparse=[sparse_map[name] for name in meta["names"]],
+                     slot_weights=np.asarray(meta["slot_weights"], dtype=np.float32),
+                     vertex_count=len(basis) // 3)
+    else:
+        state["cache"] = np.load(cache_path, mmap_mode="r")
+    _playback[obj.name] = state
+
+    handlers = bpy.app.handlers.frame_change_pre
+    for handler in [h for h in handlers if getattr(h, "__name__", "") == _on_frame_change.__name__]:
+        handlers.remove(handler)
+    handlers.append(_on_frame_change)
+    _on_frame_change(bpy.context.scene)
+    print(f"[PointCache] {obj.name} now plays back from {os.path.basename(cache_path)}")
+
+def detach_point_cache(obj):
+    """Return obj to live shape-key evaluation"""
+    _playback.pop(obj.name, None)
+    obj.show_only_shape_key = False
+    key_blocks = obj.data.shape_keys.key_blocks if obj.data.shape_keys else {}
+    if PLAYBACK_KEY in key_blocks:
+        obj.shape_key_remove(key_blocks[PLAYBACK_KEY])
+    if not _playback:
+        handlers = bpy.app.handlers.frame_change_pre
+        for handler in [h for h in handlers if getattr(h, "__name__", "") == _on_frame_change.__name__]:
+            handlers.remove(handler)
@@ -0,0 +1,158 @@
+import math
+
+import numpy as np
+
+import terrain_core
+
+# Vectorized Poisson-disk sampling on a background grid of cell size r/sqrt(2),
+# so every cell holds at most one point. Cells are processed in 3x3 phases:
+# cells of one phase are three cells apart, i.e. farther than r, so all of
+# them can accept a candidate at once without checking each other.
+
+# Neighbor cells that can hold a point closer than r (5x5 block minus corners)
+_NEIGHBOR_OFFSETS = [(dj, di) for dj in range(-2, 3) for di in range(-2, 3)
+                     if (dj, di) != (0, 0) and abs(dj) + abs(di) < 4]
+
+
+def sample_rect(x0, y0, x1, y1, radius, rng, attempts=4, existing=None):
+    """Blue-noise points with spacing >= radius inside [x0, x1) x [y0, y1).
+
+    existing: (m, 2) points (e.g. from neighboring tiles) that new points must
+    also keep their distance from. Returns an (n, 2) float32 array.
+    """
+    cell = radius / math.sqrt(2.0)
+    cols = max(1, math.ceil((x1 - x0) / cell))
+    rows = max(1, math.ceil((y1 - y0) / cell))
+
+    # Two-cell apron so existing points and edge checks need no bounds tests
+    grid_x = np.full((rows + 4, cols + 4), np.nan, dtype=np.float32)
+    grid_y = np.full((rows + 4, cols + 4), np.nan, dtype=np.float32)
+    if existing is not None and len(existing):
+        ci = np.floor((existing[:, 0] - x0) / cell).astype(np.int64) + 2
+        cj = np.floor((existing[:, 1] - y0) / cell).astype(np.int64) + 2
+        keep = (ci >= 0) & (ci < cols + 4) & (cj >= 0) & (cj < rows + 4)
+        grid_x[cj[keep], ci[keep]] = existing[keep, 0]
+        grid_y[cj[keep], ci[keep]] = existing[keep, 1]
+
+    r2 = np.float32(radius * radius)
+    for _ in range(attempts):
+        for pj in range(3):
+            n_j = len(range(pj, rows, 3))
+            for pi in range(3):
+                n_i = len(range(pi, cols, 3))
+                if n_j == 0 or n_i == 0:
+                    continue
+                # Cells of one phase are a strided view, as is each neighbor offset
+                rows_sl = slice(2 + pj, 2 + pj + 3 * n_j, 3)
+                cols_sl = slice(2 + pi, 2 + pi + 3 * n_i, 3)
+                current_x = grid_x[rows_sl, cols_sl]
+                current_y = grid_y[rows_sl, cols_sl]
+
+                cand_x = (x0 + (pi + 3 * np.arange(n_i) + rng.random((n_j, n_i))) * cell).astype(np.float32)
+                cand_y = (y0 + (pj + 3 * np.arange(n_j)[:, np.newaxis] + rng.random((n_j, n_i))) * cell).astype(np.float32)
+                ok = np.isnan(current_x) & (cand_x < x1) & (cand_y < y1)
+
+                for dj, di in _NEIGHBOR_OFFSETS:
+                    nb_rows = slice(rows_sl.start + dj, rows_sl.stop + dj, 3)
+                    nb_cols = slice(cols_sl.start + di, cols_sl.stop + di, 3)
+                    dx = grid_x[nb_rows, nb_cols] - cand_x
+                    dy = grid_y[nb_rows, nb_cols] - cand_y
+                    # NaN (empty cell) compares False, so it never rejects
+                    ok &= ~(dx * dx + dy * dy < r2)
+
+                current_x[ok] = cand_x[ok]
+                current_y[ok] = cand_y[ok]
+
+    inner_x = grid_x[2:-2, 2:-2].ravel()
+    inner_y = grid_y[2:-2, 2:-2].ravel()
+    filled = ~np.isnan(inner_x)
+    return np.stack([inner_x[filled], inner_y[filled]], axis=1)
+
+
+def iter_tiles(x0, y0, x1, y1, radius, tile_size, seed=0, attempts=4):
+    """Stream ((tile_j, tile_i), points) tile by tile, row-major.
+
+    Each tile is seeded from (seed, tile_j, tile_i) so results do not depend
+    on which tiles were generated before, and only the border points of the
+    previous and current tile rows are kept to stitch tiles seamlessly.
+    """
+    tiles_x = max(1, math.ceil((x1 - x0) / tile_size))
+    tiles_y = max(1, math.ceil((y1 - y0) / tile_size))
+    band = 2 * radius
+    borders = {}
+
+    for tj in range(tiles_y):
+        for ti in range(tiles_x):
+            tx0 = x0 + ti * tile_size
+            ty0 = y0 + tj * tile_size
+            tx1 = min(tx0 + tile_size, x1)
+            ty1 = min(ty0 + tile_size, y1)
+
+            neighbors = [borders[key] for key in ((tj - 1, ti - 1), (tj - 1, ti), (tj - 1, ti + 1), (tj, ti - 1))
+                         if key in borders]
+            existing = np.concatenate(neighbors) if neighbors else None
+
+            rng = np.random.default_rng((seed, tj, ti))
+            points = sample_rect(tx0, ty0, tx1, ty1, radius, rng, attempts, existing)
+
+            near_edge = ((points[:, 0] < tx0 + band) | (points[:, 0] >= tx1 - band) |
+                         (points[:, 1] < ty0 + band) | (points[:, 1] >= ty1 - band))
+            borders[(tj, ti)] = points[near_edge]
+            for key in [key for key in borders if key[0] < tj - 1]:
+                del borders[key]
+
+            yield (tj, ti), points
+
+
+def sample_field(field, x, y, x0, y0, cell):
+    """Bilinear lookup of a grid field (heights[j, i] layout) at world x, y"""
+    rows, cols = field.shape
+    fi = np.clip((x - x0) / cell, 0, cols - 1)
+    fj = np.clip((y - y0) / cell, 0, rows - 1)
+    i0 = np.minimum(fi.astype(np.int64), cols - 2)
+    j0 = np.minimum(fj.astype(np.int64), rows - 2)
+    ti = (fi - i0).astype(field.dtype)
+    tj = (fj - j0).astype(field.dtype)
+    top = field[j0, i0] * (1 - ti) + field[j0, i0 + 1] * ti
+    bottom = field[j0 + 1, i0] * (1 - ti) + field[j0 + 1, i0 + 1] * ti
+    return top * (1 - tj) + bottom * tj
+
+
+def band_mask(values, low, high, softness=0.1):
+    """1 inside [low, high], smoothstep down to 0 over softness outside it"""
+    below = np.clip((values - (low - softness)) / softness, 0, 1) if softness > 0 else (values >= low)
+    above = np.clip(((high + softness) - values) / softness, 0, 1) if softness > 0 else (values <= high)
+    below = below * below * (3 - 2 * below)
+    above = above * above * (3 - 2 * above)
+    return (below * above).astype(np.float32)
+
+
+def scatter_tiles(heights, x0, y0, cell, layer, tile_size, seed=0):
+    """Stream masked instance points for one scatter layer, tile by tile.
+
+    Density is 1 where normalized height and slope fall inside the layer's
+    bands; Poisson-disk points are thinned by that density, then get z from
+    the heightfield plus a random scale and z rotation.
+    Yields ((tile_j, tile_i), xyz (n, 3), scale (n,), rotation (n,)).
+    """
+    rows, cols = heights.shape
+    height_norm = terrain_core.normalize(heights)
+    slope_values = terrain_core.slope(heights)
+    x1 = x0 + cell * (cols - 1)
+    y1 = y0 + cell * (rows - 1)
+
+    for key, points in iter_tiles(x0, y0, x1, y1, layer["radius"], tile_size, seed):
+        rng = np.random.default_rng((seed, key[0], key[1], 1))
+        x, y = points[:, 0], points[:, 1]
+        density = band_mask(sample_field(height_norm, x, y, x0, y0, cell), *layer["height"])
+        density *= band_mask(sample_field(slope_values, x, y, x0, y0, cell), *layer["slope"])
+        keep = rng.random(len(points)) < density
+        x, y = x[keep], y[keep]
+
+        xyz = np.empty((len(x), 3), dtype=np.float32)
+        xyz[:, 0] = x
+        xyz[:, 1] = y
+        xyz[:, 2] = sample_field(heights, x, y, x0, y0, cell)
+        scale = rng.uniform(*layer["scale"], len(x)).astype(np.float32)
+        rotation = rng.uniform(0.0, 2 * math.pi, len(x)).astype(np.float32)
+        yield key, xyz, scale, rotation
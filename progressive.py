@@ -0,0 +1,246 @@
+import time
+import random
+
+import bpy
+import numpy as np
+
+import config_para as cfg
+import create
+import render_color as render
+import terrain_core
+
+# Coarse-to-fine preview. A Blender timer advances the terrain math in small
+# steps (one deform pass or one jitter chunk at a time) so the UI keeps
+# redrawing, and shows each level on a preview object as soon as it is done.
+# A new level first shows the previous level bilinearly upsampled. Stages 1-4
+# and the DEM base are pointwise in x, y, so they are recomputed exactly at
+# each level. Jitter draws from a sequential random stream and smoothing reads
+# neighbors, so neither can be upsampled; both are recomputed per level.
+
+PREVIEW_MATERIAL = "HeightGradientPreview_Material"
+
+_session = None
+
+
+def preview_levels(resolution=cfg.TERRAIN_RESOLUTION, divisor=cfg.PROGRESSIVE_DIVISOR, minimum=8):
+    """Resolutions from resolution / divisor doubling up to resolution"""
+    levels = []
+    step = max(divisor, 1)
+    while step >= 1:
+        level = max(resolution // step, minimum)
+        if level not in levels and level <= resolution:
+            levels.append(level)
+        step //= 2
+    if resolution not in levels:
+        levels.append(resolution)
+    return levels
+
+def config_signature():
+    """Every config_para value; a change cancels the running preview"""
+    return repr(sorted((name, repr(getattr(cfg, name))) for name in dir(cfg) if name.isupper()))
+
+def level_steps(size, resolution, seed, chunk_size=cfg.PROGRESSIVE_CHUNK):
+    """Generator over one level: yields after every unit of work, finally the heights.
+
+    The jitter keeps its own random state between chunks, so timers or other
+    scripts drawing random numbers in between do not change the result.
+    """
+    x, y = terrain_core.grid_xy(size, resolution)
+    shape = (resolution + 1, resolution + 1)
+    dtype = terrain_core.DTYPE
+    period = terrain_core.tile_period(size)
+
+    if cfg.DEM_PATH:
+        heights = terrain_core.dem_heights(resolution)
+        yield None
+    else:
+        stage1 = terrain_core.stage1_base(x, y, np.empty(shape, dtype), period)
+        stage2 = terrain_core.stage2_mix(x, y, np.empty(shape, dtype), period)
+        heights = stage1 + stage2
+        heights += terrain_core.stage3_power(stage1, stage2, np.empty(shape, dtype))
+        yield None
+        heights += terrain_core.stage4_radial_decay(x, y, heights, np.empty(shape, dtype), period)
+        yield None
+
+    # Same defaults as generate_terrian.apply_smart_jitter
+    flat = heights.ravel()
+    weights = terrain_core.jitter_weight(terrain_core.normalize(flat), terrain_core.slope(heights).ravel(),
+                                         0.6, 0.4, 1.2, 1.2)
+    # Periodic tiles jitter their unique vertices only and wrap the border afterwards
+    core = (slice(0, -1), slice(0, -1)) if cfg.PERIODIC else (slice(None), slice(None))
+    xs = np.broadcast_to(x, shape)[core].ravel()
+    ys = np.broadcast_to(y, shape)[core].ravel()
+    flat = heights[core].ravel()
+    weights = weights.reshape(shape)[core].ravel()
+    jitter = np.empty(len(flat), dtype=dtype)
+    outer_state = random.getstate()
+    random.seed(seed)
+    state = random.getstate()
+    random.setstate(outer_state)
+    for start in range(0, len(flat), chunk_size):
+        stop = min(start + chunk_size, len(flat))
+        outer_state = random.getstate()
+        random.setstate(state)
+        terrain_core.jitter_delta(xs[start:stop], ys[start:stop], flat[start:stop], weights[start:stop],
+                                  out=jitter[start:stop])
+        state = random.getstate()
+        random.setstate(outer_state)
+        yield None
+    heights[core] += jitter.reshape(heights[core].shape)
+    if cfg.PERIODIC:
+        terrain_core.wrap_edges(heights)
+
+    heights += terrain_core.smooth_delta(heights, terrain_core.slope(heights))
+    yield heights
+
+
+class ProgressivePreview:
+    """One coarse-to-fine run driven by bpy.app.timers"""
+
+    def __init__(self, levels, size=cfg.TERRAIN_SIZE, seed=cfg.PROGRESSIVE_SEED, on_finished=None,
+                 tick_seconds=cfg.PROGRESSIVE_TICK_SECONDS):
+        self.levels = levels
+        self.size = size
+        self.seed = seed
+        self.on_finished = on_finished
+        self.tick_seconds = tick_seconds
+        self.signature = config_signature()
+        self.level_index = 0
+        self.heights = None
+        self.cancelled = False
+        self.preview_obj = None
+        self._steps = None
+        self._level_started = 0.0
+        # One bound method object, so the timer can be found again to unregister
+        self.timer = self.step
+
+    # display
+
+    def _ensure_object(self):
+        obj = bpy.data.objects.get(cfg.PROGRESSIVE_OBJECT_NAME)
+        if obj is None:
+            mesh = create.create_grid_mesh(f"{cfg.PROGRESSIVE_OBJECT_NAME}Mesh", self.size, 1)
+            obj = bpy.data.objects.new(cfg.PROGRESSIVE_OBJECT_NAME, mesh)
+            collection = create.ensure_collection(cfg.COLLECTION_NAME)
+            create.link_object_to_collection(collection, obj)
+        self.preview_obj = obj
+        return obj
+
+    def _show(self, heights, resolution):
+        """Put heights on a preview mesh of the given resolution"""
+        obj = self._ensure_object()
+        side = resolution + 1
+        if len(obj.data.vertices) != side * side:
+            old_mesh = obj.data
+            obj.data = create.create_grid_mesh(f"{cfg.PROGRESSIVE_OBJECT_NAME}Mesh", self.size, resolution)
+            bpy.data.meshes.remove(old_mesh)
+        co = np.empty(side * side * 3, dtype=np.float32)
+        obj.data.vertices.foreach_get("co", co)
+        co[2::3] = heights.ravel()
+        obj.data.vertices.foreach_set("co", co)
+        obj.data.update()
+
+        z_min, z_max = float(heights.min()), float(heights.max())
+        render.render_terrain_color(obj, height_range=(z_min, max(z_max, z_min + 1e-4)),
+                                    material_key=PREVIEW_MATERIAL, detail_maps=False)
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type == 'VIEW_3D':
+                    area.tag_redraw()
+
+    # stepping
+
+    def _start_level(self):
+        resolution = self.levels[self.level_index]
+        if self.heights is not None:
+            # Show the previous level on the finer mesh right away
+            self._show(terrain_core.upsample(self.heights, resolution + 1), resolution)
+        self._steps = level_steps(self.size, resolution, self.seed)
+        self._level_started = time.perf_counter()
+
+    def step(self):
+        """Timer callback: work for about tick_seconds, return the next interval or None"""
+        if self.cancelled:
+            return None
+        if config_signature() != self.signature:
+            print("[Progressive] Parameters changed, restarting preview")
+            self.cancel(from_timer=True)
+            start_preview(self.on_finished)
+            return None
+
+        if self._steps is None:
+            self._start_level()
+        deadline = time.perf_counter() + self.tick_seconds
+        while time.perf_counter() < deadline:
+            result = next(self._steps)
+            if result is None:
+                continue
+
+            resolution = self.levels[self.level_index]
+            self.heights = result
+            self._show(result, resolution)
+            print(f"[Progressive] Level {resolution} ready in {time.perf_counter() - self._level_started:.2f}s")
+            self._steps = None
+            self.level_index += 1
+            if self.level_index == len(self.levels):
+                self._finish()
+                return None
+            return 0.0  # let the viewport draw this level before starting the next
+        return 0.0
+
+    def _finish(self):
+        global _session
+        if _session is self:
+            _session = None
+        if self.on_finished is None:
+            return
+        if bpy.app.background:
+            self.on_finished(self)
+        else:
+            # Own timer step, so the finest level is drawn before on_finished takes over
+            bpy.app.timers.register(self._run_on_finished, first_interval=0.0)
+
+    def _run_on_finished(self):
+        # Skipped when a newer preview has started since this one finished
+        if _session is None and not self.cancelled:
+            self.on_finished(self)
+        return None
+
+    def cancel(self, from_timer=False):
+        """Stop at once; from inside the timer, returning None unregisters it"""
+        global _session
+        self.cancelled = True
+        self._steps = None
+        if not from_timer and bpy.app.timers.is_registered(self.timer):
+            bpy.app.timers.unregister(self.timer)
+        if _session is self:
+            _session = None
+
+    def run_blocking(self):
+        """Background mode has no event loop for timers: run every level now"""
+        while self.step() is not None:
+            pass
+
+    def remove_preview(self):
+        obj = bpy.data.objects.get(cfg.PROGRESSIVE_OBJECT_NAME)
+        if obj is not None:
+            mesh = obj.data
+            bpy.data.objects.remove(obj, do_unlink=True)
+            bpy.data.meshes.remove(mesh)
+
+
+def start_preview(on_finished=None, levels=None):
+    """Cancel any running preview and start a new one"""
+    global _session
+    cancel_preview()
+    _session = ProgressivePreview(levels or preview_levels(), on_finished=on_finished)
+    print(f"[Progressive] Levels {_session.levels}")
+    if bpy.app.background:
+        _session.run_blocking()
+    else:
+        bpy.app.timers.register(_session.timer, first_interval=0.0)
+    return _session
+
+def cancel_preview():
+    if _session is not None:
+        _session.cancel()
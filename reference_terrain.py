@@ -0,0 +1,148 @@
+"""Per-vertex reference implementations of the terrain stages.
+
+These are the original generate_terrian.py loops with the bpy reads replaced
+by plain lists: vertex i has coordinates xs[i], ys[i] and its edge-connected
+neighbors in neighbors[i] (what bmesh link_edges gave on the grid). They are
+slow on purpose and exist only so equivalence_check.py can compare the
+optimized paths against them.
+"""
+import math
+import random
+
+import numpy as np
+
+import config_para as cfg
+
+
+def grid_mesh(size, resolution):
+    """Vertex x, y lists (float32 values, like mesh co) and grid edge neighbors"""
+    side = resolution + 1
+    xs, ys = [], []
+    for j in range(side):
+        y = float(np.float32((j / resolution - 0.5) * (2 * size)))
+        for i in range(side):
+            xs.append(float(np.float32((i / resolution - 0.5) * (2 * size))))
+            ys.append(y)
+    neighbors = []
+    for j in range(side):
+        for i in range(side):
+            linked = []
+            if i + 1 < side:
+                linked.append(j * side + i + 1)
+            if j + 1 < side:
+                linked.append((j + 1) * side + i)
+            if i > 0:
+                linked.append(j * side + i - 1)
+            if j > 0:
+                linked.append((j - 1) * side + i)
+            neighbors.append(linked)
+    return xs, ys, neighbors
+
+def as_key_data(values):
+    """Round through float32, as storing values in shape-key co does"""
+    return np.asarray(values, dtype=np.float32).astype(np.float64).tolist()
+
+
+# helpers
+
+def compute_slope(heights, neighbors):
+    vertex_count = len(heights)
+    slope_values = np.zeros(vertex_count)
+    for i in range(vertex_count):
+        if not neighbors[i]:
+            continue
+        height_i = heights[i]
+        neigh_heights = [heights[n] for n in neighbors[i]]
+        slope_values[i] = np.mean([abs(h - height_i) for h in neigh_heights])
+    slope_min, slope_max = slope_values.min(), slope_values.max()
+    return (slope_values - slope_min) / (slope_max - slope_min + 1e-6)
+
+def compute_height_normalization(heights):
+    z_min, z_max = min(heights), max(heights)
+    z_range = max(z_max - z_min, 1e-6)
+    return [(z - z_min) / z_range for z in heights]
+
+def compute_jitter_weight(height_norms, slope_values, height_weight=0.6, slope_weight=0.4,
+                          height_exponent=1.0, slope_exponent=1.0):
+    weights = []
+    for height, slope in zip(height_norms, slope_values):
+        weight = height_weight * (height ** height_exponent) + slope_weight * (slope ** slope_exponent)
+        weights.append(min(weight, 1.0))
+    return weights
+
+def asymmetric_jitter(x, y, intensity=None):
+    if intensity is None:
+        intensity = cfg.RANDOMNESS_FACTOR
+    random.seed(int(x * 11.17 + y * 5.31 + 11))
+    noise_1 = math.sin(0.05 * x) * math.cos(0.08 * y)
+    noise_2 = math.sin(0.15 * x + 0.3) * math.cos(0.1 * y + 1.2)
+    noise_3 = math.sin(0.4 * x - 0.7 * y)
+    local_randomness = random.uniform(-1, 1) * 0.6
+    combined_value = (0.5 * noise_1 + 0.3 * noise_2 + 0.2 * noise_3 + local_randomness)
+    return max(-1.0, min(1.0, combined_value)) * intensity
+
+
+# deform stages: each returns the key's z list
+
+def deform_stage1_base(xs, ys):
+    return [5 * math.sin(cfg.FREQUENCY * x + cfg.PHASE_X) * math.cos(cfg.FREQUENCY * y + cfg.PHASE_Y)
+            for x, y in zip(xs, ys)]
+
+def deform_stage2_mix(xs, ys):
+    return [5 * cfg.MIX_WEIGHT * math.sin(cfg.MIX_FREQUENCY * cfg.FREQUENCY * y + cfg.PHASE_MIX) for y in ys]
+
+def deform_stage3_height(stage1, stage2):
+    stage3 = []
+    for s1, s2 in zip(stage1, stage2):
+        base_h = abs(s1 + s2)
+        if base_h >= 0:
+            stage3.append(cfg.HEIGHT_SCALE * (base_h ** cfg.POWER_VALUE) - base_h)
+        else:
+            stage3.append(0.0)
+    return stage3
+
+def deform_stage4_radial_decay(xs, ys, stage1, stage2, stage3):
+    stage4 = []
+    for i, (x, y) in enumerate(zip(xs, ys)):
+        radius = math.sqrt(x ** 2 + y ** 2)
+        decay = math.exp(-cfg.DECAY_RATE * radius ** 2)
+        prev_h = stage1[i] + stage2[i] + stage3[i]
+        decayed_h = prev_h * decay
+        stage4.append(-prev_h if decayed_h < 0 else decayed_h - prev_h)
+    return stage4
+
+
+# disturbances
+
+def apply_smart_jitter(xs, ys, heights, neighbors, jitter_intensity=3, height_weight=0.6, slope_weight=0.4,
+                       height_exponent=1.2, slope_exponent=1.2, noise_strength=5):
+    height_norms = compute_height_normalization(heights)
+    slope_values = compute_slope(heights, neighbors)
+    weights = compute_jitter_weight(height_norms, slope_values, height_weight, slope_weight,
+                                    height_exponent, slope_exponent)
+    jitter = []
+    for i in range(len(heights)):
+        x, y, z = xs[i], ys[i], heights[i]
+        geometric_jitter = (random.random() - 0.5) * 2.0 * jitter_intensity * weights[i]
+        spatial_jitter = asymmetric_jitter(x, y)
+        combined_jitter = geometric_jitter * (1 + noise_strength * spatial_jitter)
+        if combined_jitter + z < 0:
+            combined_jitter = -z
+        jitter.append(combined_jitter)
+    return jitter
+
+def smooth_height_by_slope(heights, neighbors, base_smoothing_factor=0.5, slope_exponent=2, iteration_count=3):
+    slope_values = compute_slope(heights, neighbors)
+    delta = np.zeros(len(heights))
+    for _ in range(iteration_count):
+        new_z_values = np.zeros(len(heights))
+        for i in range(len(heights)):
+            if not neighbors[i]:
+                new_z_values[i] = heights[i]
+                continue
+            neighbor_avg_height = np.mean([heights[n] for n in neighbors[i]])
+            smoothing_weight = base_smoothing_factor * (1 - slope_values[i] ** slope_exponent)
+            new_z_values[i] = (1 - smoothing_weight) * heights[i] + smoothing_weight * neighbor_avg_height
+        for i in range(len(heights)):
+            delta[i] = new_z_values[i] - heights[i]
+    return delta
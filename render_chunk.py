@@ -0,0 +1,134 @@
+"""Runs inside background Blender for render_scheduler.py.
+
+    blender -b scene.blend --python render_chunk.py -- --plan plan.json --output-dir out
+    blender -b scene.blend --python render_chunk.py -f 1..20,31 -- --output-dir out
+
+--plan writes the frame range, the output path of every frame and spans of
+frames that render identically (no F-curve value changes). Without --plan
+the script prepares the scene and the -f frames render after it, printing
+one FRAME_MARKER line per written frame. bpy is imported inside functions so
+render_scheduler can import FRAME_MARKER with plain Python.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+import numpy as np
+
+FRAME_MARKER = "@@RENDER_FRAME "
+
+_frame_started = {}
+
+
+def animated_ids():
+    """Every datablock whose animation can change what a frame looks like"""
+    import bpy
+
+    ids = []
+    for collection in (bpy.data.objects, bpy.data.shape_keys, bpy.data.materials, bpy.data.node_groups,
+                       bpy.data.worlds, bpy.data.cameras, bpy.data.lights, bpy.data.scenes):
+        for datablock in collection:
+            ids.append(datablock)
+            node_tree = getattr(datablock, "node_tree", None)
+            if node_tree is not None:
+                ids.append(node_tree)
+    return ids
+
+def frame_signatures(frames):
+    """(frames, curves) matrix of every F-curve and driver evaluated at each frame"""
+    import animation
+
+    columns = []
+    for datablock in animated_ids():
+        anim = getattr(datablock, "animation_data", None)
+        if anim is None:
+            continue
+        fcurves = animation.action_fcurves(datablock) + list(anim.drivers)
+        for fcurve in fcurves:
+            columns.append([fcurve.evaluate(frame) for frame in frames])
+    if not columns:
+        return np.zeros((len(frames), 0))
+    return np.array(columns, dtype=np.float64).T
+
+def static_spans(frames, signatures, tolerance=1e-6):
+    """[first, last] runs of consecutive frames with the same signature"""
+    if signatures.shape[1] == 0:
+        return [[frames[0], frames[-1]]]
+    changed = np.any(np.abs(np.diff(signatures, axis=0)) > tolerance, axis=1)
+    spans, start = [], frames[0]
+    for frame, is_change in zip(frames[1:], changed):
+        if is_change:
+            spans.append([start, frame - 1])
+            start = frame
+    spans.append([start, frames[-1]])
+    return spans
+
+def frame_varies_without_keys(scene):
+    """Settings that make every frame differ even when nothing is keyed"""
+    cycles = getattr(scene, "cycles", None)
+    return bool(scene.render.engine == 'CYCLES' and cycles is not None and cycles.use_animated_seed)
+
+def set_output(scene, output_dir):
+    scene.render.filepath = os.path.join(os.path.abspath(output_dir), "frame_")
+    scene.render.use_persistent_data = True
+    scene.render.use_overwrite = True
+    scene.render.use_placeholder = False
+
+def write_plan(path, output_dir):
+    import bpy
+
+    scene = bpy.context.scene
+    set_output(scene, output_dir)
+    frames = list(range(scene.frame_start, scene.frame_end + 1, scene.frame_step))
+    if frame_varies_without_keys(scene) or scene.frame_step != 1:
+        spans = [[frame, frame] for frame in frames]
+    else:
+        spans = static_spans(frames, frame_signatures(frames))
+    plan = {
+        "frames": frames,
+        "spans": spans,
+        "paths": {str(frame): scene.render.frame_path(frame=frame) for frame in frames},
+    }
+    with open(path, "w") as f:
+        json.dump(plan, f)
+    print(f"[RenderChunk] {len(frames)} frames in {len(spans)} distinct span(s)")
+
+def _on_render_pre(scene, *args):
+    _frame_started[scene.frame_current] = time.perf_counter()
+
+def _on_render_write(scene, *args):
+    frame = scene.frame_current
+    seconds = time.perf_counter() - _frame_started.pop(frame, time.perf_counter())
+    record = {"frame": frame, "seconds": seconds, "path": scene.render.frame_path(frame=frame)}
+    print(FRAME_MARKER + json.dumps(record), flush=True)
+
+def prepare_render(output_dir, threads=0):
+    import bpy
+
+    scene = bpy.context.scene
+    set_output(scene, output_dir)
+    if threads:
+        scene.render.threads_mode = 'FIXED'
+        scene.render.threads = threads
+    bpy.app.handlers.render_pre.append(_on_render_pre)
+    bpy.app.handlers.render_write.append(_on_render_write)
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Render-chunk helper (inside Blender)")
+    parser.add_argument("--plan", help="write the frame plan to this JSON file and exit")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.plan:
+        write_plan(args.plan, args.output_dir)
+    else:
+        prepare_render(args.output_dir, args.threads)
@@ -2,7 +2,11 @@ import bpy
 
 import config_para as cfg
 import animation
+import datablocks
 import generate_terrian as generate
+import key_stack
+import heightmap_bake
+import terrain_core
 
 def get_final_height_range(obj, end_key_name):
     """Accumulate shape key deltas from Basis (0) to end_key_name, return z_min/z_max."""
@@ -16,23 +20,7 @@ def get_final_height_range(obj, end_key_name):
         print(f"[WARNING] Shape key {end_key_name} not found!")
         return 0.0, 0.0
 
-    end_index = kb.find(end_key_name)
-    vert_count = len(obj.data.vertices)
-
-    z_values = []
-
-    for i in range(vert_count):
-        # Start at Basis
-        total_z = kb[0].data[i].co.z
-
-        # Accumulate all shape keys from 1 → end_index
-        for idx in range(1, end_index + 1):
-            total_z += kb[idx].data[i].co.z
-
-        z_values.append(total_z)
-
-    z_min = min(z_values)
-    z_max = max(z_values)
+    z_min, z_max = key_stack.get_stack(obj).range_after(end_key_name)
 
     # Avoid zero division
     if abs(z_max - z_min) < 1e-6:
@@ -41,16 +29,115 @@ def get_final_height_range(obj, end_key_name):
 
     return z_min, z_max
 
-def render_terrain_color(terrain_obj):
-
-    z_min, z_max = get_final_height_range(terrain_obj, cfg.APPLY_JITTER)
+def _mix_color_sockets(mix_node):
+    """(factor, A, B, result) sockets of a ShaderNodeMix switched to RGBA"""
+    mix_node.data_type = 'RGBA'
+    factor = mix_node.inputs["Factor"]
+    a = next(s for s in mix_node.inputs if s.name == "A" and s.type == 'RGBA')
+    b = next(s for s in mix_node.inputs if s.name == "B" and s.type == 'RGBA')
+    result = next(s for s in mix_node.outputs if s.name == "Result" and s.type == 'RGBA')
+    return factor, a, b, result
+
+def add_mask_tints(nodes, links, color_socket):
+    """Blend rock and snow over the height gradient using the mask_engine attributes"""
+    tints = [
+        ("mask_rock", (0.5, 0.4, 0.4, 1.0)),   # Rocky Gray
+        ("mask_snow", (0.9, 0.9, 0.9, 1.0)),   # Snow White
+    ]
+    for i, (attribute_name, color) in enumerate(tints):
+        attribute_node = nodes.new("ShaderNodeAttribute")
+        attribute_node.attribute_type = 'GEOMETRY'
+        attribute_node.attribute_name = attribute_name
+        attribute_node.location = (400 + 150 * i, -300)
+
+        mix_node = nodes.new("ShaderNodeMix")
+        mix_node.location = (450 + 150 * i, -150)
+        factor, a, b, result = _mix_color_sockets(mix_node)
+        b.default_value = color
+        links.new(attribute_node.outputs["Fac"], factor)
+        links.new(color_socket, a)
+        color_socket = result
+    return color_socket
+
+def detail_heights(mesh_heights, resolution, seed=None):
+    """Heightfield at bake resolution with the detail the mesh grid is too coarse for.
+
+    The NumPy stages run again at bake resolution; what the mesh has on top
+    of the same stages at its own resolution (ModifyTerrain, RiverCarve,
+    FlattenLandingPad) is added back as an upsampled residual.
+    """
+    mesh_resolution = mesh_heights.shape[0] - 1
+    fine = terrain_core.accumulate(terrain_core.stage_deltas(cfg.TERRAIN_SIZE, resolution, seed))
+    coarse = terrain_core.accumulate(terrain_core.stage_deltas(cfg.TERRAIN_SIZE, mesh_resolution, seed))
+    residual = mesh_heights - coarse
+    return fine + terrain_core.upsample(residual, resolution + 1)
+
+def bake_detail_maps(terrain_obj, resolution=cfg.BAKE_RESOLUTION, seed=None):
+    """Bake normal/AO/curvature images from the heightfield for the terrain material"""
+    side = terrain_core.grid_side(len(terrain_obj.data.vertices))
+    # The mesh's own key stack, so every stage (rivers, pads, modifiers) is in the maps
+    heights = key_stack.get_stack(terrain_obj).height_after().reshape(side, side)
+    if resolution and resolution + 1 > side:
+        heights = detail_heights(heights, resolution, seed)
+    cell = 2 * cfg.TERRAIN_SIZE / (heights.shape[0] - 1)
+
+    maps = heightmap_bake.bake_maps(heights, cell, cfg.BAKE_AO_DISTANCE)
+    images = {}
+    for name, values in maps.items():
+        rows, cols = values.shape[:2]
+        image = datablocks.get_image(f"{terrain_obj.name}_{name}", cols, rows, non_color=True)
+        image.pixels.foreach_set(heightmap_bake.to_rgba(values))
+        image.pack()
+        images[name] = image
+    print(f"[Bake] normal/AO/curvature maps baked at {heights.shape[1]}x{heights.shape[0]}")
+    return images
+
+def add_baked_maps(nodes, links, color_socket, bsdf_node, images):
+    """Plug baked maps in: normal -> BSDF normal, AO and curvature -> base color"""
+    texcoord_node = nodes.new("ShaderNodeTexCoord")
+    texcoord_node.location = (-400, -500)
+
+    image_nodes = {}
+    for i, name in enumerate(["normal", "ao", "curvature"]):
+        image_node = nodes.new("ShaderNodeTexImage")
+        image_node.image = images[name]
+        image_node.interpolation = 'Linear'
+        image_node.extension = 'EXTEND'
+        image_node.location = (-150, -450 - 250 * i)
+        # Generated coords span the undeformed grid 0-1, like the image
+        links.new(texcoord_node.outputs["Generated"], image_node.inputs["Vector"])
+        image_nodes[name] = image_node
+
+    normal_map_node = nodes.new("ShaderNodeNormalMap")
+    normal_map_node.space = 'OBJECT'
+    normal_map_node.location = (150, -450)
+    links.new(image_nodes["normal"].outputs["Color"], normal_map_node.inputs["Color"])
+    links.new(normal_map_node.outputs["Normal"], bsdf_node.inputs["Normal"])
+
+    for i, (name, blend_type, strength) in enumerate([("ao", 'MULTIPLY', 1.0), ("curvature", 'OVERLAY', 0.3)]):
+        mix_node = nodes.new("ShaderNodeMix")
+        mix_node.location = (150 + 150 * i, -700)
+        factor, a, b, result = _mix_color_sockets(mix_node)
+        mix_node.blend_type = blend_type
+        factor.default_value = strength
+        links.new(color_socket, a)
+        links.new(image_nodes[name].outputs["Color"], b)
+        color_socket = result
+    return color_socket
+
+def render_terrain_color(terrain_obj, height_range=None, material_key="HeightGradient_Material",
+                         detail_maps=True):
+
+    if height_range is None:
+        z_min, z_max = get_final_height_range(terrain_obj, cfg.APPLY_JITTER)
+    else:
+        z_min, z_max = height_range
     z_max = 1.05 * z_max  # Slightly extend max for better color gradation
 
     print(f"Detected terrain height range: {z_min:.3f} to {z_max:.3f}")
 
     # Material and nodes setup
-    material = bpy.data.materials.new(name="HeightGradient_Material")
-    material.use_nodes = True
+    material = datablocks.get_material(material_key, use_nodes=True)
     nodes = material.node_tree.nodes
     links = material.node_tree.links
     nodes.clear()
@@ -107,7 +194,12 @@ def render_terrain_color(terrain_obj):
     links.new(sep_xyz_node.outputs["Z"], map_range_node.inputs["Value"])
     links.new(map_range_node.outputs["Result"], math_pow_node.inputs[0])
     links.new(math_pow_node.outputs["Value"], color_ramp_node.inputs["Fac"])
-    links.new(color_ramp_node.outputs["Color"], bsdf_node.inputs["Base Color"])
+    base_color = color_ramp_node.outputs["Color"]
+    if cfg.MASK_SHADING and "mask_rock" in terrain_obj.data.attributes:
+        base_color = add_mask_tints(nodes, links, base_color)
+    if cfg.BAKE_MAPS and detail_maps:
+        base_color = add_baked_maps(nodes, links, base_color, bsdf_node, bake_detail_maps(terrain_obj))
+    links.new(base_color, bsdf_node.inputs["Base Color"])
     links.new(bsdf_node.outputs["BSDF"], output_node.inputs["Surface"])
 
     # Apply material to terrain
@@ -151,4 +243,84 @@ def setup_mixshader_fade(tree, bsdf_node, output_node):
 
     print("[MixShader] Created material fade setup.")
 
-    return mix
\ No newline at end of file
+    return mix
+
+def add_shader_wireframe(tree, output_node, terrain_obj, thickness=cfg.WIREFRAME_THICKNESS):
+    """Grid lines in the shader instead of a WIREFRAME modifier: no extra geometry.
+
+    Generated coordinates span the undeformed grid 0-1, so Generated * resolution
+    is integer on every grid edge. The distance to the nearest integer, in
+    cells, becomes a line mask that mixes a black shader over whatever reaches
+    the material output (so the lines stay through the material fade).
+    """
+    nodes = tree.nodes
+    links = tree.links
+    resolution = terrain_core.grid_side(len(terrain_obj.data.vertices)) - 1
+    cell = 2 * cfg.TERRAIN_SIZE / resolution
+    half_width = 0.5 * thickness / cell  # in cells, like the modifier's world-space thickness
+
+    texcoord_node = nodes.new("ShaderNodeTexCoord")
+    texcoord_node.location = (-400, 400)
+    scale_node = nodes.new("ShaderNodeVectorMath")
+    scale_node.operation = 'MULTIPLY'
+    scale_node.inputs[1].default_value = (resolution, resolution, 0.0)
+    scale_node.location = (-200, 400)
+    separate_node = nodes.new("ShaderNodeSeparateXYZ")
+    separate_node.location = (0, 400)
+    links.new(texcoord_node.outputs["Generated"], scale_node.inputs[0])
+    links.new(scale_node.outputs["Vector"], separate_node.inputs["Vector"])
+
+    # |fract(g + 0.5) - 0.5| per axis: distance to the nearest grid line
+    distances = []
+    for i, axis in enumerate("XY"):
+        shifted = nodes.new("ShaderNodeMath")
+        shifted.operation = 'ADD'
+        shifted.inputs[1].default_value = 0.5
+        fract = nodes.new("ShaderNodeMath")
+        fract.operation = 'FRACT'
+        centered = nodes.new("ShaderNodeMath")
+        centered.operation = 'SUBTRACT'
+        centered.inputs[1].default_value = 0.5
+        absolute = nodes.new("ShaderNodeMath")
+        absolute.operation = 'ABSOLUTE'
+        for k, node in enumerate((shifted, fract, centered, absolute)):
+            node.location = (200 + 150 * k, 500 - 200 * i)
+        links.new(separate_node.outputs[axis], shifted.inputs[0])
+        links.new(shifted.outputs["Value"], fract.inputs[0])
+        links.new(fract.outputs["Value"], centered.inputs[0])
+        links.new(centered.outputs["Value"], absolute.inputs[0])
+        distances.append(absolute.outputs["Value"])
+
+    nearest = nodes.new("ShaderNodeMath")
+    nearest.operation = 'MINIMUM'
+    nearest.location = (800, 400)
+    links.new(distances[0], nearest.inputs[0])
+    links.new(distances[1], nearest.inputs[1])
+
+    # 1 on the line, smooth falloff over one more half width
+    line_mask = nodes.new("ShaderNodeMapRange")
+    line_mask.interpolation_type = 'SMOOTHSTEP'
+    line_mask.clamp = True
+    line_mask.inputs["From Min"].default_value = half_width
+    line_mask.inputs["From Max"].default_value = 2 * half_width
+    line_mask.inputs["To Min"].default_value = 1.0
+    line_mask.inputs["To Max"].default_value = 0.0
+    line_mask.location = (950, 400)
+    links.new(nearest.outputs["Value"], line_mask.inputs["Value"])
+
+    wire_shader = nodes.new("ShaderNodeBsdfDiffuse")
+    wire_shader.inputs["Color"].default_value = (0.0, 0.0, 0.0, 1.0)
+    wire_shader.location = (950, 150)
+
+    surface = output_node.inputs["Surface"]
+    wire_mix = nodes.new("ShaderNodeMixShader")
+    wire_mix.location = (1100, 0)
+    if surface.links:
+        links.new(surface.links[0].from_socket, wire_mix.inputs[1])
+    links.new(wire_shader.outputs["BSDF"], wire_mix.inputs[2])
+    links.new(line_mask.outputs["Result"], wire_mix.inputs["Fac"])
+    links.new(wire_mix.outputs["Shader"], surface)
+    output_node.location = (1300, 0)
+
+    print(f"[Wireframe] Shader grid lines: {resolution} cells, half width {half_width:.3f} cells")
+    return wire_mix
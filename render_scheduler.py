@@ -0,0 +1,189 @@
+"""Render the build-up animation in frame chunks on parallel background Blenders.
+
+    python render_scheduler.py terrain.blend                 # all frames
+    python render_scheduler.py terrain.blend --chunk-size 10 --workers 3
+
+A plan pass finds spans of frames that render identically; only the first
+frame of each span is rendered and the image is copied to the rest. Frames
+are split into contiguous chunks, one background Blender per chunk (with
+persistent data, so the scene is synced once per chunk), as many at a time
+as cores and memory allow. Failed chunks are retried on their missing frames,
+and per-frame render times go to render_report.json in the output directory.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import config_para as cfg
+from render_chunk import FRAME_MARKER
+
+CHUNK_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "render_chunk.py")
+
+
+def available_memory():
+    """Bytes of memory available to new processes (MemAvailable on Linux)"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def worker_slots(threads_per_job=cfg.RENDER_THREADS_PER_JOB, job_memory=cfg.RENDER_JOB_MEMORY,
+                 max_workers=cfg.RENDER_MAX_WORKERS):
+    """Concurrent render processes bounded by cores and available memory"""
+    by_cores = max(1, (os.cpu_count() or 1) // max(threads_per_job, 1))
+    memory = available_memory()
+    by_memory = max(1, memory // job_memory) if memory else by_cores
+    slots = min(by_cores, by_memory)
+    return min(slots, max_workers) if max_workers else slots
+
+def frame_spec(frames):
+    """Blender -f argument: comma separated frames and a..b ranges"""
+    parts, start = [], None
+    for k, frame in enumerate(frames):
+        if start is None:
+            start = frame
+        if k + 1 == len(frames) or frames[k + 1] != frame + 1:
+            parts.append(str(start) if start == frame else f"{start}..{frame}")
+            start = None
+    return ",".join(parts)
+
+def make_chunks(frames, chunk_size):
+    return [frames[k:k + chunk_size] for k in range(0, len(frames), chunk_size)]
+
+
+class RenderScheduler:
+    """Plans, renders and reports one .blend animation"""
+
+    def __init__(self, blend_path, output_dir=cfg.RENDER_OUTPUT_DIR, blender=cfg.BLENDER_EXECUTABLE,
+                 chunk_size=cfg.RENDER_CHUNK_SIZE, workers=None, threads_per_job=cfg.RENDER_THREADS_PER_JOB,
+                 retries=cfg.RENDER_RETRIES, dedupe=cfg.RENDER_DEDUPE_STATIC):
+        self.blend_path = os.path.abspath(blend_path)
+        self.output_dir = os.path.abspath(output_dir)
+        self.blender = blender
+        self.chunk_size = chunk_size
+        self.workers = workers or worker_slots(threads_per_job)
+        self.threads_per_job = threads_per_job
+        self.retries = retries
+        self.dedupe = dedupe
+        self.frame_times = {}
+        self.frame_paths = {}
+        self.chunk_log = []
+
+    def _blender(self, *args, frames=None):
+        command = [self.blender, "-b", self.blend_path, "--python", CHUNK_SCRIPT]
+        if frames is not None:
+            command += ["-f", frame_spec(frames)]
+        return command + ["--", "--output-dir", self.output_dir] + list(args)
+
+    def plan(self):
+        plan_path = os.path.join(self.output_dir, "render_plan.json")
+        subprocess.run(self._blender("--plan", plan_path), check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        with open(plan_path) as f:
+            plan = json.load(f)
+        if not self.dedupe:
+            plan["spans"] = [[frame, frame] for frame in plan["frames"]]
+        return plan
+
+    def render_chunk(self, index, frames):
+        """Render frames in one process, retrying the ones that were not written"""
+        pending = list(frames)
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            process = subprocess.Popen(self._blender("--threads", str(self.threads_per_job), frames=pending),
+                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+            for line in process.stdout:
+                if line.startswith(FRAME_MARKER):
+                    record = json.loads(line[len(FRAME_MARKER):])
+                    self.frame_times[record["frame"]] = record["seconds"]
+                    self.frame_paths[record["frame"]] = record["path"]
+            code = process.wait()
+            done = [frame for frame in pending if frame in self.frame_paths]
+            self.chunk_log.append({"chunk": index, "attempt": attempt, "frames": frame_spec(pending),
+                                   "rendered": len(done), "exit_code": code,
+                                   "seconds": time.perf_counter() - started})
+            pending = [frame for frame in pending if frame not in self.frame_paths]
+            if not pending:
+                return []
+            print(f"[RenderScheduler] chunk {index}: {len(pending)} frame(s) missing "
+                  f"(exit {code}), attempt {attempt + 1}/{self.retries + 1}")
+        return pending
+
+    def duplicate_static(self, plan):
+        """Copy the first rendered frame of each static span to the frames after it"""
+        copied = 0
+        for first, last in plan["spans"]:
+            source = self.frame_paths.get(first)
+            if source is None:
+                continue
+            for frame in range(first + 1, last + 1):
+                target = plan["paths"][str(frame)]
+                if os.path.abspath(target) != os.path.abspath(source):
+                    shutil.copyfile(source, target)
+                self.frame_paths[frame] = target
+                copied += 1
+        return copied
+
+    def run(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        started = time.perf_counter()
+        plan = self.plan()
+        to_render = [first for first, _ in plan["spans"]]
+        chunks = make_chunks(to_render, self.chunk_size)
+        print(f"[RenderScheduler] {len(plan['frames'])} frames, {len(to_render)} to render "
+              f"in {len(chunks)} chunk(s) on {self.workers} worker(s)")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            failed = sum(pool.map(self.render_chunk, range(len(chunks)), chunks), [])
+        copied = self.duplicate_static(plan)
+
+        times = sorted(self.frame_times.values())
+        report = {
+            "blend": self.blend_path,
+            "frames": len(plan["frames"]),
+            "rendered": len(self.frame_times),
+            "duplicated": copied,
+            "failed": failed,
+            "workers": self.workers,
+            "wall_seconds": time.perf_counter() - started,
+            "render_seconds": sum(times),
+            "median_frame_seconds": times[len(times) // 2] if times else None,
+            "spans": plan["spans"],
+            "frame_seconds": {str(frame): self.frame_times[frame] for frame in sorted(self.frame_times)},
+            "chunks": self.chunk_log,
+        }
+        with open(os.path.join(self.output_dir, "render_report.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[RenderScheduler] rendered {report['rendered']}, duplicated {copied}, failed {len(failed)} "
+              f"in {report['wall_seconds']:.1f}s")
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunked parallel render of the terrain animation")
+    parser.add_argument("blend", help=".blend file saved after running main.py")
+    parser.add_argument("--output-dir", default=cfg.RENDER_OUTPUT_DIR)
+    parser.add_argument("--blender", default=cfg.BLENDER_EXECUTABLE)
+    parser.add_argument("--chunk-size", type=int, default=cfg.RENDER_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="default: from cores and memory")
+    parser.add_argument("--threads", type=int, default=cfg.RENDER_THREADS_PER_JOB)
+    parser.add_argument("--retries", type=int, default=cfg.RENDER_RETRIES)
+    parser.add_argument("--no-dedupe", action="store_true", help="render static spans frame by frame")
+    args = parser.parse_args()
+
+    scheduler = RenderScheduler(args.blend, args.output_dir, args.blender, args.chunk_size, args.workers,
+                                args.threads, args.retries, dedupe=not args.no_dedupe)
+    report = scheduler.run()
+    sys.exit(1 if report["failed"] else 0)
@@ -0,0 +1,157 @@
+import time
+
+import bpy
+import bmesh
+import numpy as np
+
+import config_para as cfg
+import create
+import datablocks
+import key_stack
+import poisson_disk
+import terrain_core
+import generate_terrian as generate
+
+
+# helpers
+
+def ensure_asset_collection(layer_name, collection_name):
+    """Asset collection to instance; a low-poly proxy is made if it does not exist"""
+    collection = bpy.data.collections.get(collection_name)
+    if collection is not None:
+        return collection
+
+    # Not linked to the scene: only the instancer node references it
+    collection = bpy.data.collections.new(collection_name)
+    mesh = bpy.data.meshes.new(f"{layer_name}ProxyMesh")
+    bmesh_data = bmesh.new()
+    if layer_name == "Vegetation":
+        bmesh.ops.create_cone(bmesh_data, cap_ends=True, segments=6, radius1=0.4, radius2=0.0, depth=1.2)
+        bmesh.ops.translate(bmesh_data, vec=(0.0, 0.0, 0.6), verts=bmesh_data.verts)
+        color = (0.05, 0.3, 0.08)
+    else:
+        bmesh.ops.create_icosphere(bmesh_data, subdivisions=1, radius=0.5)
+        color = (0.3, 0.28, 0.25)
+    bmesh_data.to_mesh(mesh)
+    bmesh_data.free()
+
+    proxy = bpy.data.objects.new(f"{layer_name}Proxy", mesh)
+    create.add_material_color(proxy, color)
+    collection.objects.link(proxy)
+    return collection
+
+def _new_group_socket(group, name, in_out):
+    if hasattr(group, "interface"):
+        group.interface.new_socket(name=name, in_out=in_out, socket_type="NodeSocketGeometry")
+    elif in_out == "INPUT":
+        group.inputs.new("NodeSocketGeometry", name)
+    else:
+        group.outputs.new("NodeSocketGeometry", name)
+
+def build_instancer_group(layer_name, asset_collection):
+    """Geometry Nodes group: instance the asset collection on every point"""
+    group = datablocks.get_node_group(f"Scatter_{layer_name}")
+    group.nodes.clear()
+    if hasattr(group, "interface"):
+        group.interface.clear()
+    else:
+        group.inputs.clear()
+        group.outputs.clear()
+    _new_group_socket(group, "Geometry", "INPUT")
+    _new_group_socket(group, "Geometry", "OUTPUT")
+
+    nodes = group.nodes
+    links = group.links
+    group_in = nodes.new("NodeGroupInput")
+    group_out = nodes.new("NodeGroupOutput")
+    collection_info = nodes.new("GeometryNodeCollectionInfo")
+    instance_node = nodes.new("GeometryNodeInstanceOnPoints")
+    scale_attr = nodes.new("GeometryNodeInputNamedAttribute")
+    rotation_attr = nodes.new("GeometryNodeInputNamedAttribute")
+    combine_rotation = nodes.new("ShaderNodeCombineXYZ")
+
+    group_in.location = (-600, 0)
+    collection_info.location = (-400, -200)
+    scale_attr.location = (-400, -450)
+    rotation_attr.location = (-600, -600)
+    combine_rotation.location = (-400, -600)
+    instance_node.location = (-100, 0)
+    group_out.location = (150, 0)
+
+    collection_info.inputs["Collection"].default_value = asset_collection
+    collection_info.inputs["Separate Children"].default_value = True
+    collection_info.inputs["Reset Children"].default_value = True
+    instance_node.inputs["Pick Instance"].default_value = True
+    scale_attr.data_type = 'FLOAT'
+    scale_attr.inputs["Name"].default_value = "scatter_scale"
+    rotation_attr.data_type = 'FLOAT'
+    rotation_attr.inputs["Name"].default_value = "scatter_rotation"
+
+    links.new(group_in.outputs[0], instance_node.inputs["Points"])
+    links.new(collection_info.outputs["Instances"], instance_node.inputs["Instance"])
+    links.new(scale_attr.outputs["Attribute"], instance_node.inputs["Scale"])
+    links.new(rotation_attr.outputs["Attribute"], combine_rotation.inputs["Z"])
+    links.new(combine_rotation.outputs["Vector"], instance_node.inputs["Rotation"])
+    links.new(instance_node.outputs["Instances"], group_out.inputs[0])
+    return group
+
+def create_point_object(name, xyz, scale, rotation, node_group):
+    """Vertex-only mesh carrying per-point attributes, instanced by node_group"""
+    mesh = bpy.data.meshes.new(f"{name}Points")
+    mesh.vertices.add(len(xyz))
+    mesh.vertices.foreach_set("co", xyz.ravel())
+    mesh.attributes.new("scatter_scale", 'FLOAT', 'POINT').data.foreach_set("value", scale)
+    mesh.attributes.new("scatter_rotation", 'FLOAT', 'POINT').data.foreach_set("value", rotation)
+    mesh.update()
+
+    point_obj = bpy.data.objects.new(name, mesh)
+    modifier = point_obj.modifiers.new("ScatterInstances", 'NODES')
+    modifier.node_group = node_group
+    return point_obj
+
+
+# scattering
+
+def scatter_layer(terrain_obj, collection, layer_name, layer, tile_size=cfg.SCATTER_TILE_SIZE,
+                  per_tile_objects=False):
+    """Scatter one layer over the terrain's current surface as instanced points"""
+    start = time.perf_counter()
+    side = terrain_core.grid_side(len(terrain_obj.data.vertices))
+    heights = key_stack.get_stack(terrain_obj).height_after().reshape(side, side)
+    x, y = generate.grid_coordinates(terrain_obj)
+    cell = float(x[0, 1] - x[0, 0])
+
+    asset_collection = ensure_asset_collection(layer_name, layer["collection"])
+    node_group = build_instancer_group(layer_name, asset_collection)
+
+    chunks = []
+    objects = []
+    for key, xyz, scale, rotation in poisson_disk.scatter_tiles(
+            heights, float(x[0, 0]), float(y[0, 0]), cell, layer, tile_size, layer.get("seed", 0)):
+        if per_tile_objects:
+            # Stream each tile straight into its own instancer object
+            if len(xyz):
+                point_obj = create_point_object(f"Scatter_{layer_name}_{key[0]}_{key[1]}",
+                                                xyz, scale, rotation, node_group)
+                create.link_object_to_collection(collection, point_obj)
+                objects.append(point_obj)
+        else:
+            chunks.append((xyz, scale, rotation))
+
+    if not per_tile_objects:
+        xyz = np.concatenate([c[0] for c in chunks]) if chunks else np.empty((0, 3), np.float32)
+        scale = np.concatenate([c[1] for c in chunks]) if chunks else np.empty(0, np.float32)
+        rotation = np.concatenate([c[2] for c in chunks]) if chunks else np.empty(0, np.float32)
+        point_obj = create_point_object(f"Scatter_{layer_name}", xyz, scale, rotation, node_group)
+        create.link_object_to_collection(collection, point_obj)
+        objects.append(point_obj)
+
+    count = sum(len(obj.data.vertices) for obj in objects)
+    print(f"[Scatter] {layer_name}: {count} instances in {len(objects)} object(s), "
+          f"{time.perf_counter() - start:.2f}s")
+    return objects
+
+def scatter_all(terrain_obj, collection, layers=None, per_tile_objects=False):
+    layers = cfg.SCATTER_LAYERS if layers is None else layers
+    return {name: scatter_layer(terrain_obj, collection, name, layer, per_tile_objects=per_tile_objects)
+            for name, layer in layers.items()}
@@ -0,0 +1,131 @@
+import json
+
+import numpy as np
+
+import config_para as cfg
+
+# Sparse stage deltas. Every stage key only moves z, and large regions of a key
+# barely move at all (radial decay outskirts, jitter on flat ground, smoothing
+# on steep slopes), so a key is stored as the indices of the vertices whose
+# |dz| exceeds epsilon plus dz quantized to multiples of step. Dropped vertices
+# are off by at most epsilon, kept ones by at most step / 2.
+
+INDEX_DTYPE = np.uint32
+DENSE_BYTES_PER_VERTEX = 3 * 4  # float3 co, what a shape key stores
+
+
+class SparseDelta:
+    """One key's z delta: vertex indices and integer multiples of step"""
+
+    def __init__(self, indices, values, step, vertex_count):
+        self.indices = indices
+        self.values = values
+        self.step = float(step)
+        self.vertex_count = int(vertex_count)
+
+    @property
+    def count(self):
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        return self.indices.nbytes + self.values.nbytes
+
+    @property
+    def dense_nbytes(self):
+        return self.vertex_count * DENSE_BYTES_PER_VERTEX
+
+    def dequantized(self):
+        """dz of the stored vertices as float32"""
+        return self.values.astype(np.float32) * np.float32(self.step)
+
+    def decode(self, out=None):
+        """Dense (vertex_count,) z delta"""
+        if out is None:
+            out = np.zeros(self.vertex_count, dtype=np.float32)
+        else:
+            out.fill(0.0)
+        out[self.indices] = self.dequantized()
+        return out
+
+    def add_to(self, out, weight=1.0):
+        """out += weight * delta, touching only the stored vertices"""
+        out[self.indices] += np.float32(weight) * self.dequantized()
+        return out
+
+
+def encode(delta, epsilon=cfg.SPARSE_EPSILON, step=cfg.SPARSE_QUANT_STEP):
+    """Sparse form of a (vertex_count,) z delta; int16 values unless the range needs int32"""
+    delta = np.asarray(delta, dtype=np.float64).ravel()
+    if step <= 0:
+        raise ValueError(f"Quantization step must be positive, got {step}")
+    quantized = np.rint(delta / step)
+    keep = (np.abs(delta) > epsilon) & (quantized != 0)
+    indices = np.flatnonzero(keep).astype(INDEX_DTYPE)
+    quantized = quantized[keep]
+    limit = np.iinfo(np.int16).max
+    dtype = np.int16 if np.abs(quantized).max(initial=0) <= limit else np.int32
+    return SparseDelta(indices, quantized.astype(dtype), step, len(delta))
+
+def encode_keys(names, deltas, epsilon=cfg.SPARSE_EPSILON, step=cfg.SPARSE_QUANT_STEP):
+    """{name: SparseDelta} for (key_count, vertex_count) z deltas"""
+    return {name: encode(delta, epsilon, step) for name, delta in zip(names, deltas)}
+
+
+# statistics
+
+def key_stats(sparse, delta):
+    """Stored entries, sizes, compression ratio and max reconstruction error of one key"""
+    error = np.abs(sparse.decode().astype(np.float64) - np.asarray(delta, dtype=np.float64).ravel())
+    return {
+        "entries": sparse.count,
+        "fill": sparse.count / max(sparse.vertex_count, 1),
+        "dense_bytes": sparse.dense_nbytes,
+        "sparse_bytes": sparse.nbytes,
+        "ratio": sparse.dense_nbytes / max(sparse.nbytes, 1),
+        "max_abs_error": float(error.max(initial=0.0)),
+        "rms_error": float(np.sqrt(np.mean(error ** 2))) if error.size else 0.0,
+    }
+
+def report(sparse_map, deltas, label="Sparse"):
+    """Print and return per-key and total stats; deltas are the dense originals in sparse_map order"""
+    stats = {name: key_stats(sparse, delta) for (name, sparse), delta in zip(sparse_map.items(), deltas)}
+    dense_total = sum(s["dense_bytes"] for s in stats.values())
+    sparse_total = sum(s["sparse_bytes"] for s in stats.values())
+    for name, s in stats.items():
+        print(f"[{label}] {name}: {s['fill']:.1%} kept, {s['ratio']:.1f}x, "
+              f"max err {s['max_abs_error']:.2e}")
+    total = {
+        "dense_bytes": dense_total,
+        "sparse_bytes": sparse_total,
+        "ratio": dense_total / max(sparse_total, 1),
+        "max_abs_error": max((s["max_abs_error"] for s in stats.values()), default=0.0),
+    }
+    print(f"[{label}] {len(stats)} keys: {dense_total / 2**20:.2f} MiB -> {sparse_total / 2**20:.2f} MiB "
+          f"({total['ratio']:.1f}x), max err {total['max_abs_error']:.2e}")
+    return {"keys": stats, "total": total}
+
+
+# storage
+
+def save(path, sparse_map, **meta):
+    """Write keys and meta into one .npz; meta must be JSON serializable"""
+    arrays = {}
+    header = {"keys": [], "meta": meta}
+    for k, (name, sparse) in enumerate(sparse_map.items()):
+        arrays[f"indices_{k}"] = sparse.indices
+        arrays[f"values_{k}"] = sparse.values
+        header["keys"].append({"name": name, "step": sparse.step, "vertex_count": sparse.vertex_count})
+    arrays["header"] = np.frombuffer(json.dumps(header).encode(), dtype=np.uint8)
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+def load(path):
+    """(sparse_map, meta) written by save"""
+    with np.load(path) as data:
+        header = json.loads(data["header"].tobytes().decode())
+        sparse_map = {}
+        for k, key in enumerate(header["keys"]):
+            sparse_map[key["name"]] = SparseDelta(data[f"indices_{k}"], data[f"values_{k}"],
+                                                  key["step"], key["vertex_count"])
+    return sparse_map, header["meta"]
@@ -0,0 +1,226 @@
+"""Per-stage terrain statistics: height, delta and slope distributions.
+
+    python stage_trace.py --resolution 256 --seed 1 --output terrain_trace
+    python stage_trace.py --params RANDOMNESS_FACTOR=0.8 --output trace_rf08
+
+After every shape key the tracer makes one pass over the heights in blocks of
+rows and keeps exact count / min / max / mean / std of the height, the key's
+delta and the slope (gradient magnitude, rise over run). Histograms and
+percentiles come from a fixed sample of vertices, drawn once per tracer, so
+every stage is measured on the same points and huge grids cost only
+sample-size work. Small grids (not larger than the sample) are exact. The
+trace is a compact .json summary plus an .npz of histograms. In Blender,
+main() traces the finished key stack when STAGE_TRACE is on; with it off
+nothing is imported or computed.
+"""
+import os
+import sys
+import ast
+import json
+import time
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+import numpy as np
+
+import config_para as cfg
+import terrain_core
+
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+class _Moments:
+    """Streaming count / min / max / mean / variance (Chan's parallel update)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        if values.size == 0:
+            return
+        count = values.size
+        mean = float(values.sum(dtype=np.float64)) / count
+        centered = (values - mean).ravel()
+        m2 = float(np.dot(centered, centered))
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def summary(self):
+        return {"count": self.count, "min": self.min, "max": self.max, "mean": self.mean,
+                "std": float(np.sqrt(self.m2 / self.count)) if self.count else 0.0}
+
+
+class StageTracer:
+    """Collects one statistics record per traced shape key"""
+
+    def __init__(self, side, cell, bins=cfg.STAGE_TRACE_BINS, sample_size=cfg.STAGE_TRACE_SAMPLE,
+                 block_rows=cfg.STAGE_TRACE_BLOCK_ROWS, seed=0):
+        self.side = side
+        self.cell = cell
+        self.bins = bins
+        self.block_rows = max(block_rows, 2)
+        count = side * side
+        if count <= sample_size:
+            self.sample = None  # exact: every vertex
+        else:
+            self.sample = np.sort(np.random.default_rng(seed).choice(count, sample_size, replace=False))
+        self.stages = {}
+        self.histograms = {}
+        self.seconds = 0.0
+
+    def _sampled(self, flat_block, start):
+        if self.sample is None:
+            return flat_block
+        lo, hi = np.searchsorted(self.sample, [start, start + flat_block.size])
+        return flat_block[self.sample[lo:hi] - start]
+
+    def record(self, name, heights, delta):
+        """Statistics of heights (after the key) and delta (the key itself), both (side, side)"""
+        start = time.perf_counter()
+        heights = np.reshape(heights, (self.side, self.side))
+        delta = np.reshape(delta, (self.side, self.side))
+        moments = {"height": _Moments(), "delta": _Moments(), "slope": _Moments()}
+        samples = {"height": [], "delta": [], "slope": []}
+        moved = 0
+        abs_delta_sum = 0.0
+
+        for row0 in range(0, self.side, self.block_rows):
+            row1 = min(row0 + self.block_rows, self.side)
+            block = heights[row0:row1]
+            block_delta = delta[row0:row1]
+            # Gradient with one halo row below; the last row and column reuse their neighbor's difference
+            halo = heights[row0:min(row1 + 1, self.side)]
+            dy = np.diff(halo, axis=0)
+            if len(dy) < len(block):
+                dy = np.concatenate([dy, dy[-1:]]) if len(dy) else np.zeros_like(block)
+            dx = np.diff(block, axis=1)
+            dx = np.concatenate([dx, dx[:, -1:]], axis=1)
+            slope = np.hypot(dx, dy) / self.cell
+
+            moments["height"].update(block)
+            moments["delta"].update(block_delta)
+            moments["slope"].update(slope)
+            magnitude = np.abs(block_delta)
+            abs_delta_sum += float(magnitude.sum(dtype=np.float64))
+            moved += int(np.count_nonzero(magnitude > 1e-6))
+
+            offset = row0 * self.side
+            samples["height"].append(self._sampled(block.ravel(), offset))
+            samples["delta"].append(self._sampled(block_delta.ravel(), offset))
+            samples["slope"].append(self._sampled(slope.ravel(), offset))
+
+        record = {}
+        for field, values in samples.items():
+            # One sort serves both the histogram and the percentiles
+            values = np.sort(np.concatenate(values))
+            summary = moments[field].summary()
+            lo, hi = summary["min"], summary["max"]
+            edges = np.linspace(lo, hi if hi > lo else lo + 1e-6, self.bins + 1)
+            positions = np.searchsorted(values, edges[1:-1], side="left")
+            counts = np.diff(np.concatenate([[0], positions, [len(values)]]))
+            self.histograms[f"{name}/{field}_counts"] = counts.astype(np.int32)
+            self.histograms[f"{name}/{field}_edges"] = edges.astype(np.float32)
+            rank = np.asarray(PERCENTILES) / 100 * (len(values) - 1)
+            below = np.floor(rank).astype(np.int64)
+            above = np.minimum(below + 1, len(values) - 1)
+            quantiles = values[below] + (values[above] - values[below]) * (rank - below)
+            summary["percentiles"] = dict(zip((f"p{p}" for p in PERCENTILES), quantiles.astype(float).tolist()))
+            record[field] = summary
+        record["delta"]["abs_mean"] = abs_delta_sum / heights.size
+        record["delta"]["moved_fraction"] = moved / heights.size
+        record["exact"] = self.sample is None
+
+        elapsed = time.perf_counter() - start
+        record["seconds"] = elapsed
+        self.seconds += elapsed
+        self.stages[name] = record
+        return record
+
+    def write(self, path, run_seconds=None):
+        """path.json (summary) and path.npz (histograms); returns the summary"""
+        summary = {
+            "grid_side": self.side,
+            "cell": self.cell,
+            "sample_size": None if self.sample is None else len(self.sample),
+            "trace_seconds": self.seconds,
+            "run_seconds": run_seconds,
+            "overhead": self.seconds / run_seconds if run_seconds else None,
+            "stages": self.stages,
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".json", "w") as f:
+            json.dump(summary, f, indent=1)
+        np.savez_compressed(path + ".npz", **self.histograms)
+
+        line = f"[Trace] {len(self.stages)} stages in {self.seconds * 1000:.1f} ms"
+        if run_seconds:
+            line += f" ({summary['overhead']:.1%} of {run_seconds:.2f}s)"
+        print(line + f" -> {path}.json/.npz")
+        for name, record in self.stages.items():
+            height, delta, slope = record["height"], record["delta"], record["slope"]
+            print(f"  {name:<18} h {height['min']:7.2f}..{height['max']:7.2f} p50 {height['percentiles']['p50']:7.2f}"
+                  f"  |dz| {delta['abs_mean']:.3f} ({delta['moved_fraction']:.0%} moved)"
+                  f"  slope p95 {slope['percentiles']['p95']:.2f}")
+        return summary
+
+
+def trace_deltas(deltas, size=None, path=cfg.STAGE_TRACE_PATH, run_seconds=None):
+    """Trace {key: (n, n) delta} in order, e.g. terrain_core.stage_deltas"""
+    size = cfg.TERRAIN_SIZE if size is None else size
+    first = next(iter(deltas.values()))
+    side = first.shape[0]
+    tracer = StageTracer(side, 2 * size / (side - 1))
+    heights = np.zeros((side, side), dtype=np.float64)
+    for name, delta in deltas.items():
+        heights += delta
+        tracer.record(name, heights, delta)
+    return tracer.write(path, run_seconds)
+
+def trace_object(obj, key_names, path=cfg.STAGE_TRACE_PATH, run_seconds=None):
+    """Trace every listed key of obj from its key_stack prefix sums"""
+    import bpy
+    import key_stack
+
+    stack = key_stack.get_stack(obj)
+    side = terrain_core.grid_side(stack.vert_count)
+    tracer = StageTracer(side, 2 * cfg.TERRAIN_SIZE / (side - 1))
+    for name in key_names:
+        if name == cfg.BASIS or name not in stack.names:
+            continue
+        tracer.record(name, stack.height_after(name), stack.key_delta(name))
+    return tracer.write(bpy.path.abspath(path), run_seconds)
+
+
+if __name__ == "__main__":
+    from terrain_worker import config_overrides
+
+    parser = argparse.ArgumentParser(description="Per-stage terrain statistics from the NumPy stages")
+    parser.add_argument("--resolution", type=int, default=cfg.TERRAIN_RESOLUTION)
+    parser.add_argument("--size", type=float, default=cfg.TERRAIN_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--params", nargs="*", default=[], help="config overrides NAME=value (Python literal)")
+    parser.add_argument("--output", default="terrain_trace")
+    args = parser.parse_args()
+
+    overrides = {}
+    for item in args.params:
+        name, _, value = item.partition("=")
+        overrides[name] = ast.literal_eval(value)
+    with config_overrides(overrides):
+        started = time.perf_counter()
+        stage_deltas = terrain_core.stage_deltas(args.size, args.resolution, args.seed)
+        trace_deltas(stage_deltas, args.size, args.output, run_seconds=time.perf_counter() - started)
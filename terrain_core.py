@@ -0,0 +1,442 @@
+import math
+import random
+from functools import lru_cache
+
+import numpy as np
+
+import config_para as cfg
+import dem_import
+import kernels
+
+# Pure NumPy terrain math on the (resolution+1, resolution+1) vertex grid of
+# create_flat_terrain: row j runs along y, column i along x, and vertex index
+# j * (resolution + 1) + i maps to heights[j, i]. Nothing here touches bpy.
+#
+# With cfg.PERIODIC the grid is one tile of a torus with period 2 * size: the
+# last row and column repeat the first, wave frequencies are snapped to whole
+# cycles per tile, and the neighbor stencils wrap around, so copies of the
+# tile placed side by side meet without seams.
+
+DTYPE = np.float32
+
+
+# grid helpers
+
+def grid_side(vertex_count):
+    """Vertices per side of a square grid mesh"""
+    side = math.isqrt(vertex_count)
+    if side * side != vertex_count:
+        raise ValueError(f"Expected a square vertex grid, got {vertex_count} vertices")
+    return side
+
+def grid_axis(size=cfg.TERRAIN_SIZE, resolution=cfg.TERRAIN_RESOLUTION, dtype=DTYPE):
+    """Vertex coordinates along one axis, matching create_flat_terrain"""
+    return ((np.arange(resolution + 1, dtype=np.float64) / resolution - 0.5) * (2 * size)).astype(dtype)
+
+def grid_xy(size=cfg.TERRAIN_SIZE, resolution=cfg.TERRAIN_RESOLUTION, dtype=DTYPE):
+    """Broadcastable x (1, n) and y (n, 1) coordinate arrays"""
+    axis = grid_axis(size, resolution, dtype)
+    return axis[np.newaxis, :], axis[:, np.newaxis]
+
+def tile_period(size=None):
+    """Length of one periodic tile: the grid spans -size..size"""
+    return 2 * (cfg.TERRAIN_SIZE if size is None else size)
+
+def periodic_frequency(frequency, period):
+    """Nearest angular frequency with a whole number (at least one) of cycles per period"""
+    cycles = max(round(abs(frequency) * period / (2 * math.pi)), 1)
+    return math.copysign(2 * math.pi * cycles / period, frequency)
+
+def _frequency(frequency, period):
+    return periodic_frequency(frequency, period) if cfg.PERIODIC else frequency
+
+def wrap_edges(values):
+    """Make the last row and column repeat the first (the shared tile border)"""
+    values[-1, :] = values[0, :]
+    values[:, -1] = values[:, 0]
+    return values
+
+def _wrapped_neighbor_sum(core, out):
+    """4-neighbor sums on the torus of the unique (side-1)^2 vertices"""
+    out[...] = np.roll(core, 1, axis=1)
+    out += np.roll(core, -1, axis=1)
+    out += np.roll(core, 1, axis=0)
+    out += np.roll(core, -1, axis=0)
+    return out
+
+def _divide_by_neighbor_count(values):
+    """Divide 4-neighbor sums by the number of grid edges at each vertex"""
+    values[1:-1, 1:-1] /= 4
+    values[0, 1:-1] /= 3
+    values[-1, 1:-1] /= 3
+    values[1:-1, 0] /= 3
+    values[1:-1, -1] /= 3
+    for j in (0, -1):
+        for i in (0, -1):
+            values[j, i] /= 2
+    return values
+
+def neighbor_mean(heights, out=None, periodic=None):
+    """Mean height of the edge-connected neighbors of every vertex"""
+    if out is None:
+        out = np.empty_like(heights)
+    if cfg.PERIODIC if periodic is None else periodic:
+        _wrapped_neighbor_sum(heights[:-1, :-1], out[:-1, :-1])
+        out[:-1, :-1] /= 4
+        return wrap_edges(out)
+    out.fill(0)
+    out[:, :-1] += heights[:, 1:]
+    out[:, 1:] += heights[:, :-1]
+    out[:-1, :] += heights[1:, :]
+    out[1:, :] += heights[:-1, :]
+    return _divide_by_neighbor_count(out)
+
+def upsample(heights, side):
+    """Bilinear resample of a vertex grid to side x side (exact on shared vertices)"""
+    rows, cols = heights.shape
+    fj = np.linspace(0, rows - 1, side)
+    fi = np.linspace(0, cols - 1, side)
+    j0 = np.minimum(fj.astype(np.int64), rows - 2)
+    i0 = np.minimum(fi.astype(np.int64), cols - 2)
+    tj = (fj - j0).astype(heights.dtype)[:, np.newaxis]
+    ti = (fi - i0).astype(heights.dtype)[np.newaxis, :]
+    top = heights[j0][:, i0] * (1 - ti) + heights[j0][:, i0 + 1] * ti
+    bottom = heights[j0 + 1][:, i0] * (1 - ti) + heights[j0 + 1][:, i0 + 1] * ti
+    return top * (1 - tj) + bottom * tj
+
+
+# analysis
+
+def _wrapped_slope(heights, out, scratch):
+    core, total = heights[:-1, :-1], out[:-1, :-1]
+    total.fill(0)
+    for axis in (0, 1):
+        diff = scratch[:-1, :-1]
+        np.subtract(np.roll(core, -1, axis=axis), core, out=diff)
+        np.abs(diff, out=diff)
+        total += diff
+        total += np.roll(diff, 1, axis=axis)
+    total /= 4
+    return wrap_edges(out)
+
+def slope(heights, out=None, scratch=None, periodic=None):
+    """Mean absolute height difference to grid neighbors, normalized to 0-1"""
+    if out is None:
+        out = np.empty_like(heights)
+    if scratch is None:
+        scratch = np.empty_like(heights)
+    if cfg.PERIODIC if periodic is None else periodic:
+        _wrapped_slope(heights, out, scratch)
+        slope_min, slope_max = out.min(), out.max()
+        out -= slope_min
+        out /= (slope_max - slope_min + 1e-6)
+        return out
+    out.fill(0)
+
+    diff = scratch[:, :-1]
+    np.subtract(heights[:, 1:], heights[:, :-1], out=diff)
+    np.abs(diff, out=diff)
+    out[:, :-1] += diff
+    out[:, 1:] += diff
+
+    diff = scratch[:-1, :]
+    np.subtract(heights[1:, :], heights[:-1, :], out=diff)
+    np.abs(diff, out=diff)
+    out[:-1, :] += diff
+    out[1:, :] += diff
+
+    _divide_by_neighbor_count(out)
+    slope_min, slope_max = out.min(), out.max()
+    out -= slope_min
+    out /= (slope_max - slope_min + 1e-6)
+    return out
+
+def normalize(values, out=None):
+    """Normalize values to the 0-1 range"""
+    if out is None:
+        out = np.empty_like(values)
+    z_min, z_max = values.min(), values.max()
+    np.subtract(values, z_min, out=out)
+    out /= max(z_max - z_min, 1e-6)
+    return out
+
+def jitter_weight(height_norms, slope_values, height_weight=0.6, slope_weight=0.4,
+                  height_exponent=1.0, slope_exponent=1.0, out=None, scratch=None):
+    """Mixed disturbance weight min(a*h^alpha + b*s^beta, 1)"""
+    if out is None:
+        out = np.empty_like(height_norms)
+    if scratch is None:
+        scratch = np.empty_like(height_norms)
+    np.power(height_norms, height_exponent, out=out)
+    out *= height_weight
+    np.power(slope_values, slope_exponent, out=scratch)
+    scratch *= slope_weight
+    out += scratch
+    np.minimum(out, 1.0, out=out)
+    return out
+
+def _smooth_pass(heights, slope_values, base_smoothing_factor, slope_exponent, out, scratch, periodic):
+    out = neighbor_mean(heights, out, periodic)
+    np.power(slope_values, slope_exponent, out=scratch)
+    np.subtract(1, scratch, out=scratch)
+    scratch *= base_smoothing_factor
+    out -= heights
+    out *= scratch
+    return out
+
+def smooth_delta(heights, slope_values, base_smoothing_factor=0.5, slope_exponent=2,
+                 out=None, scratch=None, periodic=None, iterations=1, backend=None):
+    """Offset that blends each vertex toward its neighbor mean, less on steep slopes.
+
+    The original per-vertex loop smoothed the unsmoothed heights on every
+    iteration, so repeating the pass never compounded; one pass is exact.
+    iterations > 1 compounds: each pass smooths the result of the previous
+    one with the same slope weights. backend (default cfg.TERRAIN_BACKEND)
+    runs the passes as one numba kernel when numba is available.
+    """
+    periodic = cfg.PERIODIC if periodic is None else periodic
+    if out is None:
+        out = np.empty_like(heights)
+    if kernels.active_backend(backend) == "numba":
+        return kernels.smooth(heights, slope_values, base_smoothing_factor, slope_exponent, iterations,
+                              periodic, out)
+    if scratch is None:
+        scratch = np.empty_like(heights)
+    if iterations == 1:
+        return _smooth_pass(heights, slope_values, base_smoothing_factor, slope_exponent, out, scratch, periodic)
+
+    current = heights.copy()
+    for _ in range(iterations):
+        current += _smooth_pass(current, slope_values, base_smoothing_factor, slope_exponent, out, scratch,
+                                periodic)
+    np.subtract(current, heights, out=out)
+    return out
+
+def asymmetric_jitter(x, y, intensity=None):
+    """Generate natural asymmetric Z disturbance for realistic terrain variation"""
+    if intensity is None:
+        intensity = cfg.RANDOMNESS_FACTOR
+    # Local random seed for consistent coordinates
+    random.seed(int(x * 11.17 + y * 5.31 + 11))
+    # Multi-layer noise overlay (fractal brownian motion style)
+    noise_1 = math.sin(0.05 * x) * math.cos(0.08 * y)
+    noise_2 = math.sin(0.15 * x + 0.3) * math.cos(0.1 * y + 1.2)
+    noise_3 = math.sin(0.4 * x - 0.7 * y)
+
+    # Local random variation
+    local_randomness = random.uniform(-1, 1) * 0.6
+    # Weighted combination of multiple frequencies and randomness
+    combined_value = (0.5 * noise_1 + 0.3 * noise_2 + 0.2 * noise_3 + local_randomness)
+    # Enhance asymmetry
+    return max(-1.0, min(1.0, combined_value)) * intensity
+
+@lru_cache(maxsize=8)
+def _jitter_frequencies(period):
+    return [periodic_frequency(value, period) for value in (0.05, 0.08, 0.15, 0.1, 0.4, 0.7)]
+
+def periodic_jitter(x, y, intensity=None, period=None):
+    """asymmetric_jitter on the torus: snapped noise frequencies, seed from the wrapped position"""
+    if intensity is None:
+        intensity = cfg.RANDOMNESS_FACTOR
+    period = tile_period() if period is None else period
+    half = period / 2
+    x = (x + half) % period - half
+    y = (y + half) % period - half
+    random.seed(int(x * 11.17 + y * 5.31 + 11))
+    f = _jitter_frequencies(period)
+    noise_1 = math.sin(f[0] * x) * math.cos(f[1] * y)
+    noise_2 = math.sin(f[2] * x + 0.3) * math.cos(f[3] * y + 1.2)
+    noise_3 = math.sin(f[4] * x - f[5] * y)
+
+    local_randomness = random.uniform(-1, 1) * 0.6
+    combined_value = (0.5 * noise_1 + 0.3 * noise_2 + 0.2 * noise_3 + local_randomness)
+    return max(-1.0, min(1.0, combined_value)) * intensity
+
+def jitter_delta(xs, ys, heights, weights, jitter_intensity=3, noise_strength=5,
+                 out=None, chunk_size=65536):
+    """Height/slope weighted jitter, clamped so no vertex drops below zero.
+
+    asymmetric_jitter reseeds the global RNG that the next vertex's random()
+    draws from, so this stays sequential; chunks keep the Python lists small.
+    In periodic mode pass only the unique tile vertices (core) and wrap_edges
+    the result, so the shared border gets one value.
+    """
+    if out is None:
+        out = np.empty(len(heights), dtype=DTYPE)
+    spatial_jitter_at = periodic_jitter if cfg.PERIODIC else asymmetric_jitter
+    for start in range(0, len(heights), chunk_size):
+        stop = min(start + chunk_size, len(heights))
+        chunk = []
+        for x, y, z, w in zip(xs[start:stop].tolist(), ys[start:stop].tolist(),
+                              heights[start:stop].tolist(), weights[start:stop].tolist()):
+            geometric_jitter = (random.random() - 0.5) * 2.0 * jitter_intensity * w
+            spatial_jitter = spatial_jitter_at(x, y)
+            combined_jitter = geometric_jitter * (1 + noise_strength * spatial_jitter)
+            if combined_jitter + z < 0:
+                combined_jitter = -z  # prevent going below zero height
+            chunk.append(combined_jitter)
+        out[start:stop] = chunk
+    return out
+
+def spatial_jitter_field(x, y, intensity=None, randomness=0.6, rng=None):
+    """Vectorized asymmetric_jitter: same noise layers, local randomness from rng.
+
+    Used by the Geometry Nodes backend, whose per-point random values cannot
+    reproduce the per-vertex reseeding; with randomness=0 it matches the
+    deterministic part of asymmetric_jitter exactly.
+    """
+    if intensity is None:
+        intensity = cfg.RANDOMNESS_FACTOR
+    combined = 0.5 * np.sin(0.05 * x) * np.cos(0.08 * y)
+    combined = combined + 0.3 * np.sin(0.15 * x + 0.3) * np.cos(0.1 * y + 1.2)
+    combined += 0.2 * np.sin(0.4 * x - 0.7 * y)
+    if randomness and rng is not None:
+        combined += rng.uniform(-1, 1, combined.shape) * randomness
+    np.clip(combined, -1.0, 1.0, out=combined)
+    combined *= intensity
+    return combined.astype(DTYPE)
+
+def periodic_jitter_delta(x, y, heights, weights, jitter_intensity=3, noise_strength=5, out=None,
+                          chunk_size=65536):
+    """jitter_delta over the unique vertices of a periodic (n, n) tile, border wrapped"""
+    side = grid_side(np.size(heights))
+    shape = (side, side)
+    core = (slice(0, -1), slice(0, -1))
+    if out is None:
+        out = np.empty(shape, dtype=DTYPE)
+    grid = out.reshape(shape)
+    grid[core] = jitter_delta(np.broadcast_to(x, shape)[core].ravel(), np.broadcast_to(y, shape)[core].ravel(),
+                              np.reshape(heights, shape)[core].ravel(), np.reshape(weights, shape)[core].ravel(),
+                              jitter_intensity, noise_strength, chunk_size=chunk_size).reshape(side - 1, side - 1)
+    wrap_edges(grid)
+    return out
+
+def jitter_delta_field(spatial, heights, weights, rng, jitter_intensity=3, noise_strength=5, out=None):
+    """jitter_delta with a precomputed spatial field and vectorized random draws"""
+    if out is None:
+        out = np.empty(len(heights), dtype=DTYPE)
+    out[:] = rng.random(len(heights)) - 0.5
+    out *= 2.0 * jitter_intensity
+    out *= weights
+    out *= 1 + noise_strength * np.ravel(spatial)
+    np.maximum(out, -heights, out=out)  # prevent going below zero height
+    return out
+
+
+# deform stages (each returns the z delta stored in its shape key)
+
+def stage1_base(x, y, out, period=None):
+    frequency = _frequency(cfg.FREQUENCY, tile_period() if period is None else period)
+    np.multiply(x, frequency, out=out)
+    out += cfg.PHASE_X
+    np.sin(out, out=out)
+    out *= 5 * np.cos(frequency * y + cfg.PHASE_Y)
+    return out
+
+def stage2_mix(x, y, out, period=None):
+    frequency = _frequency(cfg.MIX_FREQUENCY * cfg.FREQUENCY, tile_period() if period is None else period)
+    mix_value = 5 * cfg.MIX_WEIGHT * np.sin(frequency * y + cfg.PHASE_MIX)
+    out[...] = mix_value
+    return out
+
+def stage3_power(stage1, stage2, out, scratch=None):
+    """Delta that turns |stage1 + stage2| into HEIGHT_SCALE * |.|^POWER_VALUE"""
+    if scratch is None:
+        scratch = np.empty_like(out)
+    np.add(stage1, stage2, out=scratch)
+    np.abs(scratch, out=scratch)
+    np.power(scratch, cfg.POWER_VALUE, out=out)
+    out *= cfg.HEIGHT_SCALE
+    out -= scratch
+    return out
+
+def stage4_radial_decay(x, y, prev_h, out, period=None):
+    """Delta that scales prev_h by exp(-DECAY_RATE * r^2), never dipping below zero.
+
+    Periodic tiles skip the decay (zero delta) unless PERIODIC_RADIAL_DECAY,
+    which measures r as the chord distance on the torus so it wraps smoothly.
+    """
+    if cfg.PERIODIC:
+        if not cfg.PERIODIC_RADIAL_DECAY:
+            out.fill(0)
+            return out
+        period = tile_period() if period is None else period
+        scale = period / math.pi
+        np.multiply(np.sin(np.pi / period * x) ** 2 + np.sin(np.pi / period * y) ** 2, scale * scale, out=out)
+    else:
+        np.multiply(x, x, out=out)
+        out += y * y
+    out *= -cfg.DECAY_RATE
+    np.exp(out, out=out)
+    out *= prev_h
+    # decayed < 0 drops the column to zero height, i.e. delta = -prev_h
+    np.maximum(out, 0, out=out)
+    out -= prev_h
+    return out
+
+
+def deform_keys():
+    """Shape keys of the base deform: the DEM stage, or analytic stages 1-4"""
+    if cfg.DEM_PATH:
+        return [cfg.DEM_STAGE]
+    return [cfg.DEFORM_STAGE1, cfg.DEFORM_STAGE2, cfg.DEFORM_STAGE3, cfg.DEFORM_STAGE4]
+
+def key_order():
+    """SHAPE_KEY_ORDER with the analytic stages swapped for the DEM stage when one is set"""
+    analytic = [cfg.DEFORM_STAGE1, cfg.DEFORM_STAGE2, cfg.DEFORM_STAGE3, cfg.DEFORM_STAGE4]
+    order = [name for name in cfg.SHAPE_KEY_ORDER if name not in analytic]
+    order[1:1] = deform_keys()
+    return order
+
+def dem_heights(resolution=None):
+    """cfg.DEM_PATH resampled to the terrain grid"""
+    resolution = cfg.TERRAIN_RESOLUTION if resolution is None else resolution
+    return dem_import.load_dem(cfg.DEM_PATH, resolution, cfg.DEM_FORMAT, cfg.DEM_RAW_SHAPE,
+                               cfg.DEM_RAW_DTYPE, cfg.DEM_NODATA, cfg.DEM_HEIGHT_RANGE,
+                               cfg.DEM_Z_SCALE, cfg.DEM_CROP_SQUARE, cfg.DEM_BLOCK_ROWS)
+
+def stage_deltas(size=None, resolution=None, seed=None):
+    """Run stages 1-4, jitter and smoothing without Blender.
+
+    Returns {shape key name: (n, n) delta} in key_order(), using the same
+    parameters as the Blender path (ModifyTerrain needs a Blender texture and
+    is left out).
+    """
+    size = cfg.TERRAIN_SIZE if size is None else size
+    resolution = cfg.TERRAIN_RESOLUTION if resolution is None else resolution
+    if seed is not None:
+        random.seed(seed)
+
+    x, y = grid_xy(size, resolution)
+    shape = (resolution + 1, resolution + 1)
+    period = tile_period(size)
+    deltas = {}
+    if cfg.DEM_PATH:
+        deltas[cfg.DEM_STAGE] = dem_heights(resolution)
+        heights = deltas[cfg.DEM_STAGE].copy()
+    else:
+        deltas[cfg.DEFORM_STAGE1] = stage1_base(x, y, np.empty(shape, DTYPE), period)
+        deltas[cfg.DEFORM_STAGE2] = stage2_mix(x, y, np.empty(shape, DTYPE), period)
+        deltas[cfg.DEFORM_STAGE3] = stage3_power(deltas[cfg.DEFORM_STAGE1], deltas[cfg.DEFORM_STAGE2],
+                                                 np.empty(shape, DTYPE))
+        heights = deltas[cfg.DEFORM_STAGE1] + deltas[cfg.DEFORM_STAGE2] + deltas[cfg.DEFORM_STAGE3]
+        deltas[cfg.DEFORM_STAGE4] = stage4_radial_decay(x, y, heights, np.empty(shape, DTYPE), period)
+        heights += deltas[cfg.DEFORM_STAGE4]
+
+    # Same defaults as generate_terrian.apply_smart_jitter
+    flat = heights.ravel()
+    weights = jitter_weight(normalize(flat), slope(heights).ravel(), 0.6, 0.4, 1.2, 1.2)
+    if cfg.PERIODIC:
+        deltas[cfg.APPLY_JITTER] = periodic_jitter_delta(x, y, heights, weights)
+    else:
+        xs = np.broadcast_to(x, shape).ravel()
+        ys = np.broadcast_to(y, shape).ravel()
+        deltas[cfg.APPLY_JITTER] = jitter_delta(xs, ys, flat, weights).reshape(shape)
+    heights += deltas[cfg.APPLY_JITTER]
+
+    deltas[cfg.SMOOTH_TERRAIN] = smooth_delta(heights, slope(heights))
+    return deltas
+
+def accumulate(deltas):
+    """Final heightfield: sum of stage deltas over the flat Basis"""
+    return sum(deltas.values(), np.zeros_like(next(iter(deltas.values()))))
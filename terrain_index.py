@@ -0,0 +1,120 @@
+import numpy as np
+
+# Rectangles are half-open vertex ranges [row0, row1) x [col0, col1) on the
+# heights[j, i] grid used by terrain_core.
+
+
+class TerrainIndex:
+    """Constant-time rectangle statistics over one heightfield.
+
+    Summed-area tables of h and h^2 give mean and variance from four lookups.
+    Min/max use square sliding-window pyramids: level k holds the min/max of
+    every 2^k x 2^k window, built lazily from level k-1, so a square query is
+    four lookups and a w x h rectangle is about max(w, h) / min(w, h) of them.
+    """
+
+    def __init__(self, heights):
+        self.heights = np.asarray(heights)
+        rows, cols = self.heights.shape
+        self.shape = (rows, cols)
+
+        # float64 tables: float32 prefix sums lose precision on large grids
+        self.sat = np.zeros((rows + 1, cols + 1), dtype=np.float64)
+        self.sat_sq = np.zeros((rows + 1, cols + 1), dtype=np.float64)
+        h = self.heights.astype(np.float64)
+        np.cumsum(np.cumsum(h, axis=0), axis=1, out=self.sat[1:, 1:])
+        np.cumsum(np.cumsum(h * h, axis=0), axis=1, out=self.sat_sq[1:, 1:])
+
+        self.min_levels = [self.heights]
+        self.max_levels = [self.heights]
+
+    # summed-area queries
+
+    @staticmethod
+    def _box(table, row0, col0, row1, col1):
+        return table[row1, col1] - table[row0, col1] - table[row1, col0] + table[row0, col0]
+
+    def sum(self, row0, col0, row1, col1):
+        return self._box(self.sat, row0, col0, row1, col1)
+
+    def mean(self, row0, col0, row1, col1):
+        return self.sum(row0, col0, row1, col1) / ((row1 - row0) * (col1 - col0))
+
+    def variance(self, row0, col0, row1, col1):
+        count = (row1 - row0) * (col1 - col0)
+        mean = self._box(self.sat, row0, col0, row1, col1) / count
+        return np.maximum(self._box(self.sat_sq, row0, col0, row1, col1) / count - mean * mean, 0.0)
+
+    # min/max pyramids
+
+    def _level(self, k):
+        while len(self.min_levels) <= k:
+            half = 1 << (len(self.min_levels) - 1)
+            for levels, reduce in ((self.min_levels, np.minimum), (self.max_levels, np.maximum)):
+                prev = levels[-1]
+                a = reduce(prev[:-half, :-half], prev[half:, :-half])
+                b = reduce(prev[:-half, half:], prev[half:, half:])
+                levels.append(reduce(a, b))
+        return self.min_levels[k], self.max_levels[k]
+
+    def _cover(self, start, stop, side):
+        """Window starts of length side that cover [start, stop)"""
+        starts = list(range(start, stop - side, side))
+        starts.append(stop - side)
+        return starts
+
+    def min_max(self, row0, col0, row1, col1):
+        side = 1 << int(np.log2(min(row1 - row0, col1 - col0)))
+        level_min, level_max = self._level(side.bit_length() - 1)
+        rows = self._cover(row0, row1, side)
+        cols = self._cover(col0, col1, side)
+        block = np.ix_(rows, cols)
+        return float(level_min[block].min()), float(level_max[block].max())
+
+    # all windows of one size at once
+
+    def window_stats(self, rows, cols):
+        """Mean, variance, min and max of every rows x cols window (top-left indexed)"""
+        n_rows = self.shape[0] - rows + 1
+        n_cols = self.shape[1] - cols + 1
+        if n_rows <= 0 or n_cols <= 0:
+            raise ValueError(f"Window {rows}x{cols} does not fit in grid {self.shape}")
+
+        def boxes(table):
+            return (table[rows:, cols:] - table[:n_rows, cols:]
+                    - table[rows:, :n_cols] + table[:n_rows, :n_cols])
+
+        count = rows * cols
+        mean = boxes(self.sat) / count
+        variance = np.maximum(boxes(self.sat_sq) / count - mean * mean, 0.0)
+
+        # Cover each window with the four corner squares of the largest level
+        side = 1 << int(np.log2(min(rows, cols)))
+        level_min, level_max = self._level(side.bit_length() - 1)
+        window_min = np.full((n_rows, n_cols), np.inf, dtype=level_min.dtype)
+        window_max = np.full((n_rows, n_cols), -np.inf, dtype=level_max.dtype)
+        for dr in self._cover(0, rows, side):
+            for dc in self._cover(0, cols, side):
+                np.minimum(window_min, level_min[dr:dr + n_rows, dc:dc + n_cols], out=window_min)
+                np.maximum(window_max, level_max[dr:dr + n_rows, dc:dc + n_cols], out=window_max)
+        return mean, variance, window_min, window_max
+
+    def flattest_window(self, rows, cols, range_weight=0.5):
+        """Top-left (row, col) of the window with the lowest std + range_weight * (max - min)"""
+        mean, variance, window_min, window_max = self.window_stats(rows, cols)
+        score = np.sqrt(variance) + range_weight * (window_max - window_min)
+        row, col = np.unravel_index(np.argmin(score), score.shape)
+        return int(row), int(col), float(mean[row, col]), float(score[row, col])
+
+
+def flatten_delta(heights, row0, col0, row1, col1, target, margin):
+    """Delta that levels the window to target and blends back over margin vertices"""
+    rows, cols = heights.shape
+    j = np.arange(rows, dtype=np.float32)[:, np.newaxis]
+    i = np.arange(cols, dtype=np.float32)[np.newaxis, :]
+    # Distance (in vertices) outside the window along each axis, 0 inside
+    dist_j = np.maximum(np.maximum(row0 - j, j - (row1 - 1)), 0)
+    dist_i = np.maximum(np.maximum(col0 - i, i - (col1 - 1)), 0)
+    t = np.clip(1.0 - np.maximum(dist_j, dist_i) / max(margin, 1), 0.0, 1.0)
+    weight = t * t * (3.0 - 2.0 * t)  # smoothstep
+    return (weight * (target - heights)).astype(heights.dtype)
@@ -0,0 +1,110 @@
+"""Warm terrain worker driven by job_server.
+
+Reads one JSON job per stdin line and answers with one result line prefixed
+by RESULT_MARKER (everything else on stdout is pipeline logging). Run inside
+Blender with `blender -b --python terrain_worker.py`, or with plain Python
+and `--numpy-only` to exercise the NumPy core without bpy.
+"""
+import os
+import sys
+import json
+import time
+import contextlib
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+import numpy as np
+
+import config_para as cfg
+import terrain_core
+
+READY_MARKER = "@@TERRAIN_READY"
+RESULT_MARKER = "@@TERRAIN_RESULT "
+
+
+@contextlib.contextmanager
+def config_overrides(params):
+    """Temporarily set upper-case config_para values from a job payload"""
+    unknown = [name for name in params if not (name.isupper() and hasattr(cfg, name))]
+    if unknown:
+        raise KeyError(f"Unknown config parameter(s): {', '.join(sorted(unknown))}")
+    saved = {name: getattr(cfg, name) for name in params}
+    try:
+        for name, value in params.items():
+            setattr(cfg, name, value)
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(cfg, name, value)
+
+def run_numpy_job(job, output_dir):
+    """NumPy-core job: stage deltas and final heightmap, no Blender involved"""
+    timings = {}
+    start = time.perf_counter()
+    deltas = terrain_core.stage_deltas(seed=job.get("seed"))
+    heights = terrain_core.accumulate(deltas)
+    timings["compute"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    heightmap_path = os.path.join(output_dir, f"{job['id']}_heightmap.npy")
+    np.save(heightmap_path, heights)
+    timings["save"] = time.perf_counter() - start
+    return {"heightmap": heightmap_path}, timings
+
+def run_blender_job(job, output_dir):
+    """Full pipeline in this Blender session, then save .blend and heightmap"""
+    import bpy
+    import random
+    import main as terrain_main
+    import key_stack
+
+    timings = {}
+    if job.get("seed") is not None:
+        random.seed(job["seed"])
+    start = time.perf_counter()
+    terrain_main.main()
+    timings["compute"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    terrain = bpy.data.objects[cfg.TERRAIN_OBJECT_NAME]
+    heights = key_stack.get_stack(terrain).height_after()
+    side = terrain_core.grid_side(len(heights))
+    heightmap_path = os.path.join(output_dir, f"{job['id']}_heightmap.npy")
+    np.save(heightmap_path, heights.reshape(side, side))
+    blend_path = os.path.join(output_dir, f"{job['id']}.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=blend_path, copy=True)
+    timings["save"] = time.perf_counter() - start
+    return {"blend": blend_path, "heightmap": heightmap_path}, timings
+
+def handle(line, numpy_only):
+    job = json.loads(line)
+    output_dir = os.path.abspath(job.get("output_dir", "."))
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        with config_overrides(job.get("params", {})):
+            runner = run_numpy_job if numpy_only else run_blender_job
+            outputs, timings = runner(job, output_dir)
+        return {"id": job["id"], "ok": True, "outputs": outputs, "timings": timings}
+    except Exception as error:
+        return {"id": job["id"], "ok": False, "error": f"{type(error).__name__}: {error}"}
+
+def serve(numpy_only=False):
+    if not numpy_only:
+        # Warm-up: import the pipeline once so every job skips module loading
+        import main  # noqa: F401
+    if cfg.KERNEL_WARMUP:
+        import kernels
+        kernels.warm_up()
+    print(READY_MARKER, flush=True)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        result = handle(line, numpy_only)
+        print(RESULT_MARKER + json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    serve(numpy_only="--numpy-only" in argv)
@@ -0,0 +1,138 @@
+"""JobServer end to end over HTTP with the NumPy-only fake worker (no Blender)."""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import job_server
+
+SMALL_JOB = {"TERRAIN_RESOLUTION": 16}
+
+
+class JobServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.output_dir = tempfile.mkdtemp(prefix="terrain_jobs_")
+        cls.server = job_server.JobServer(job_server.fake_worker_command(), worker_count=2,
+                                          output_dir=cls.output_dir)
+        cls.server.start()
+        cls.httpd = ThreadingHTTPServer(("127.0.0.1", 0), job_server.make_handler(cls.server))
+        cls.base = f"http://127.0.0.1:{cls.httpd.server_address[1]}"
+        cls.http_thread = threading.Thread(target=cls.httpd.serve_forever, daemon=True)
+        cls.http_thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+        cls.server.stop()
+        shutil.rmtree(cls.output_dir, ignore_errors=True)
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode()
+        request = urllib.request.Request(self.base + path, data=data,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return response.status, json.loads(response.read())
+
+    def test_completed_job_has_outputs_and_timings(self):
+        status, job = self._request("/jobs?wait=1", {"params": SMALL_JOB, "seed": 3})
+        self.assertEqual(status, 200)
+        self.assertEqual(job["status"], "done", job.get("error"))
+        heights = np.load(job["outputs"]["heightmap"])
+        self.assertEqual(heights.shape, (17, 17))
+        for name in ("compute", "save", "queue_wait", "total"):
+            self.assertGreaterEqual(job["timings"][name], 0.0)
+
+    def test_queued_jobs_all_complete(self):
+        ids = []
+        for seed in range(4):
+            status, body = self._request("/jobs", {"params": SMALL_JOB, "seed": seed})
+            self.assertEqual(status, 202)
+            self.assertEqual(body["status"], "queued")
+            ids.append(body["id"])
+        for job_id in ids:
+            self.server.wait(job_id, timeout=120)
+            status, job = self._request(f"/jobs/{job_id}")
+            self.assertEqual(status, 200)
+            self.assertEqual(job["status"], "done", job.get("error"))
+            self.assertIn(job["worker"], ("worker-0", "worker-1"))
+
+    def test_same_seed_is_reproducible(self):
+        first = self._request("/jobs?wait=1", {"params": SMALL_JOB, "seed": 7})[1]
+        second = self._request("/jobs?wait=1", {"params": SMALL_JOB, "seed": 7})[1]
+        np.testing.assert_array_equal(np.load(first["outputs"]["heightmap"]),
+                                      np.load(second["outputs"]["heightmap"]))
+
+    def test_unknown_param_is_rejected(self):
+        status, job = self._request("/jobs?wait=1", {"params": {"NOT_A_SETTING": 1}})
+        self.assertEqual(status, 200)
+        self.assertEqual(job["status"], "failed")
+        self.assertTrue(job["error"].startswith("KeyError"), job["error"])
+        self.assertIn("NOT_A_SETTING", job["error"])
+        # The worker survives the rejection and takes the next job
+        self.assertEqual(self._request("/jobs?wait=1", {"params": SMALL_JOB})[1]["status"], "done")
+
+    def test_status_endpoint(self):
+        self._request("/jobs?wait=1", {"params": SMALL_JOB, "seed": 1})
+        status, body = self._request("/status")
+        self.assertEqual(status, 200)
+        self.assertEqual(body["queued"], 0)
+        self.assertGreaterEqual(body["jobs"].get("done", 0), 1)
+        self.assertEqual([w["name"] for w in body["workers"]], ["worker-0", "worker-1"])
+        self.assertTrue(all(w["alive"] for w in body["workers"]))
+
+    def test_unknown_job_and_path(self):
+        for path in ("/jobs/missing", "/nothing"):
+            with self.assertRaises(urllib.error.HTTPError) as raised:
+                self._request(path)
+            self.assertEqual(raised.exception.code, 404)
+
+
+# Answers seed 13 with a truncated result line, every other job with an empty success
+BROKEN_WORKER = f"""
+import json, sys
+print({job_server.READY_MARKER!r}, flush=True)
+for line in sys.stdin:
+    job = json.loads(line)
+    if job["seed"] == 13:
+        print({job_server.RESULT_MARKER!r} + '{{"id": "', flush=True)
+    else:
+        print({job_server.RESULT_MARKER!r} + json.dumps({{"id": job["id"], "ok": True}}), flush=True)
+"""
+
+
+class BrokenWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = job_server.JobServer([sys.executable, "-c", BROKEN_WORKER], worker_count=1,
+                                           output_dir=tempfile.gettempdir())
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_bad_result_fails_the_job_and_keeps_the_worker(self):
+        bad = self.server.submit({"seed": 13})
+        good = self.server.submit({"seed": 1})
+        job = self.server.wait(bad, timeout=30)
+        self.assertEqual(job["status"], "failed")
+        self.assertTrue(job["error"].startswith("JSONDecodeError"), job["error"])
+        self.assertIn("total", job["timings"])
+        # The only worker slot is still dispatching
+        self.assertEqual(self.server.wait(good, timeout=30)["status"], "done")
+
+
+if __name__ == "__main__":
+    unittest.main()
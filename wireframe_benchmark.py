@@ -0,0 +1,127 @@
+"""Compare the WIREFRAME modifier with shader grid lines on an animated grid.
+
+    blender -b --factory-startup --python wireframe_benchmark.py -- --resolution 512 --frames 60
+
+For each mode the same grid gets a few animated shape keys and the height
+gradient material. Playback cost is measured as frames per second of
+scene.frame_set over the animation (the depsgraph work behind viewport
+playback; in a UI session the viewport is redrawn too), plus the evaluated
+vertex count and the time of one still render.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+import bpy
+import numpy as np
+
+import animation
+import config_para as cfg
+import create
+import render_color as render
+import terrain_core
+
+BENCHMARK_COLLECTION = "WireframeBenchmark"
+MODES = ("none", "modifier", "shader")
+
+
+def _animated_grid(collection, resolution, key_count=4, stage_length=10):
+    mesh = create.create_grid_mesh("WireBenchMesh", cfg.TERRAIN_SIZE, resolution)
+    obj = bpy.data.objects.new("WireBench", mesh)
+    create.link_object_to_collection(collection, obj)
+    side = resolution + 1
+    x, y = terrain_core.grid_xy(cfg.TERRAIN_SIZE, resolution)
+    co = np.empty(side * side * 3, dtype=np.float32)
+    obj.shape_key_add(name=cfg.BASIS, from_mix=False)
+    mesh.vertices.foreach_get("co", co)
+    names = []
+    for k in range(key_count):
+        key = obj.shape_key_add(name=f"Wave{k}", from_mix=False)
+        co[2::3] = (2.0 * np.sin((k + 1) * 0.1 * x) * np.cos(0.07 * y)).ravel()
+        key.data.foreach_set("co", co)
+        names.append(key.name)
+    animation.animate_shape_keys_bulk(obj, names, 1, stage_length, stage_length // 2)
+    return obj, key_count * stage_length
+
+def _setup_mode(obj, mode):
+    create.add_material_color(obj, (0.1, 0.6, 0.1))
+    if mode == "modifier":
+        create.add_wireframe_modifier(obj, cfg.WIREFRAME_THICKNESS)
+    context = render.render_terrain_color(obj, height_range=(0.0, 2.0), material_key="WireBench_Material",
+                                          detail_maps=False)
+    if mode == "shader":
+        render.add_shader_wireframe(context["tree"], context["output"], obj)
+
+def _playback_fps(scene, frame_count):
+    start = time.perf_counter()
+    for frame in range(1, frame_count + 1):
+        scene.frame_set(frame)
+    return frame_count / (time.perf_counter() - start)
+
+def _evaluated_vertices(obj):
+    evaluated = obj.evaluated_get(bpy.context.evaluated_depsgraph_get())
+    mesh = evaluated.to_mesh()
+    count = len(mesh.vertices)
+    evaluated.to_mesh_clear()
+    return count
+
+def _render_seconds(scene, engine, size):
+    scene.render.engine = engine
+    scene.render.resolution_x = scene.render.resolution_y = size
+    if scene.camera is None:
+        camera = bpy.data.objects.new("WireBenchCamera", bpy.data.cameras.new("WireBenchCamera"))
+        create.link_object_to_collection(bpy.data.collections[BENCHMARK_COLLECTION], camera)
+        camera.location = (0.0, -2.2 * cfg.TERRAIN_SIZE, 1.6 * cfg.TERRAIN_SIZE)
+        camera.rotation_euler = (0.95, 0.0, 0.0)
+        scene.camera = camera
+    start = time.perf_counter()
+    bpy.ops.render.render(write_still=False)
+    return time.perf_counter() - start
+
+def run_benchmark(resolution=cfg.TERRAIN_RESOLUTION, frames=None, engine="BLENDER_EEVEE_NEXT",
+                  render_size=512, repeat=2):
+    scene = bpy.context.scene
+    report = {"resolution": resolution, "engine": engine, "modes": {}}
+    for mode in MODES:
+        collection = create.ensure_collection(BENCHMARK_COLLECTION)
+        create.purge_collection_objects(collection)
+        scene.camera = None
+        obj, frame_count = _animated_grid(collection, resolution)
+        frame_count = frames or frame_count
+        _setup_mode(obj, mode)
+        scene.frame_set(1)
+        fps = max(_playback_fps(scene, frame_count) for _ in range(repeat))
+        render_seconds = min(_render_seconds(scene, engine, render_size) for _ in range(repeat))
+        report["modes"][mode] = {"playback_fps": fps, "render_seconds": render_seconds,
+                                 "evaluated_vertices": _evaluated_vertices(obj)}
+        create.purge_collection_objects(collection)
+        bpy.data.collections.remove(collection)
+
+    print(f"[Wireframe Benchmark] {(resolution + 1) ** 2} vertices, {engine} {render_size}px")
+    for mode, result in report["modes"].items():
+        print(f"  {mode:<9} playback {result['playback_fps']:7.1f} fps  render {result['render_seconds']:.2f}s  "
+              f"evaluated vertices {result['evaluated_vertices']}")
+    return report
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="WIREFRAME modifier vs shader grid lines benchmark")
+    parser.add_argument("--resolution", type=int, default=cfg.TERRAIN_RESOLUTION)
+    parser.add_argument("--frames", type=int, default=None, help="playback frames (default: whole animation)")
+    parser.add_argument("--engine", default="BLENDER_EEVEE_NEXT", help="e.g. BLENDER_EEVEE_NEXT, CYCLES")
+    parser.add_argument("--render-size", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.resolution, args.frames, args.engine, args.render_size, args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)